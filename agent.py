@@ -1,67 +1,923 @@
+import contextlib
+import inspect
 import json
 import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from cache import make_key, normalize_query
+from config import (
+    AdaptiveSearchConfig, LLMConfig, ResearchConfig, RetrievalConfig, SessionConfig, SynthesisConfig, TavilyConfig
+)
+from context_packer import estimate_tokens, pack_context, truncate_tokens
 from llm_client import OllamaClient
+from plan_parser import PlanParser
+from query_dedup import dedupe_queries
+from retrieval import pack_chunks
+from search_policy import AdaptiveSearchPolicy
 from tavily_client import TavilyClient
+from tracing import Tracer
 
 class DeepResearchAgent:
-    def __init__(self, model_name=None):
-        self.llm = OllamaClient(model_name=model_name)
-        self.tavily = TavilyClient()
+    def __init__(self, model_name=None, llm=None, tavily=None, plan_cache=None, planner=None, synthesis_mode=None,
+                 adaptive_search=None):
+        self.llm = llm if llm else OllamaClient(model_name=model_name)
+        self.tavily = tavily if tavily else TavilyClient()
+        # Optional separate client (e.g. a small local model) for planning search queries
+        self.planner = planner if planner else self.llm
+        # Optional ResultCache of search queries per topic; a cached topic skips planning
+        self.plan_cache = plan_cache
+        # "single" or "map_reduce" (see SynthesisConfig)
+        self.synthesis_mode = synthesis_mode if synthesis_mode else SynthesisConfig.MODE
+        # Start queries as basic searches and escalate weak ones (see search_policy.py)
+        self.adaptive_search = AdaptiveSearchConfig.ENABLED if adaptive_search is None else adaptive_search
 
-    def run(self, user_query, search_depth=None):
+    def run(self, user_query, search_depth=None, on_token=None, tracer=None, max_rounds=None, report=None):
         """
         Executes the deep research process.
+        
+        Args:
+            user_query (str): The research topic.
+            search_depth (str, optional): Overrides TavilyConfig.SEARCH_DEPTH.
+            on_token (callable, optional): Called with each fragment of the final
+                answer as it is generated.
+            tracer (Tracer, optional): Receives per-stage timing spans. A new
+                tracer is created if not given; its data is returned under 'trace'.
+            max_rounds (int, optional): Search rounds to run. Overrides
+                ResearchConfig.MAX_ROUNDS; rounds after the first are follow-ups
+                chosen by the LLM from gaps in what has been found so far.
+            report (ReportWriter, optional): Receives the plan, search results and
+                final answer as soon as each stage finishes.
+        """
+        state = self.start_run(user_query, search_depth=search_depth, tracer=tracer, max_rounds=max_rounds)
+        if self.plan_stage(state, report=report):
+            self.search_stage(state, report=report)
+            self.synthesize_stage(state, on_token=on_token, report=report)
+        return self.finish_run(state)
+
+    def start_run(self, user_query, search_depth=None, tracer=None, max_rounds=None):
+        """
+        Starts a research run that is then driven stage by stage: plan_stage,
+        search_stage and synthesize_stage, then finish_run. run() does all of
+        this in sequence; a scheduler (see pipeline.py) can run the stages of
+        different topics on separate workers.
+
+        Returns:
+            dict: The run's state, passed to every stage.
         """
         print(f"--- Starting Research on: {user_query} ---")
-        
-        # Step 1: Plan and Generate Search Queries
-        search_queries = self._plan_research(user_query)
+        kwargs = {}
+        if search_depth:
+            # Otherwise TavilyClient uses the default from config
+            kwargs["search_depth"] = search_depth
+        return {
+            "query": user_query,
+            "tracer": tracer if tracer else Tracer(name=user_query),
+            "max_rounds": max_rounds if max_rounds else ResearchConfig.MAX_ROUNDS,
+            "search_kwargs": kwargs,
+            # Per-run search budget; None searches every query with search_kwargs
+            "search_policy": AdaptiveSearchPolicy() if self.adaptive_search else None,
+            "start": time.perf_counter(),
+        }
+
+    def plan_stage(self, state, report=None):
+        """
+        Step 1: plans the research and generates the search queries.
+
+        Returns:
+            bool: False if planning failed and the run has nothing to search.
+        """
+        user_query = state["query"]
+        tracer = state["tracer"]
+        with tracer.span("plan", round=1) as span:
+            search_queries = self._cached_plan(user_query, span)
+            if search_queries is None:
+                search_queries = self._plan_research(user_query, stats=span)
+                self._store_plan(user_query, search_queries)
+            else:
+                print(f"[Planning] reused the cached plan ({len(search_queries)} queries)")
+        if not search_queries:
+            state["final_answer"] = "Failed to generate search queries."
+            if report:
+                report.write_answer(state["final_answer"])
+            return False
+
+        state["search_queries"], state["merged"] = self._dedupe_queries(search_queries, tracer, 1)
+        return True
+
+    def search_stage(self, state, report=None):
+        """
+        Step 2: runs the planned searches and any follow-up rounds.
+        """
+        tracer = state["tracer"]
+        search_queries = state["search_queries"]
+        kwargs = state["search_kwargs"]
+        policy = state["search_policy"]
+        print(f"--- Executing {len(search_queries)} Search Queries ---")
+        with tracer.span("search_stage", round=1, num_queries=len(search_queries)):
+            search_results = self._execute_searches(search_queries, tracer=tracer, policy=policy, **kwargs)
+        if report:
+            with tracer.span("report", section="plan"):
+                report.write_plan(search_queries, merged=state["merged"])
+            with tracer.span("report", section="results", round=1):
+                report.write_search_results(search_results)
+        rounds = [self._round_summary(tracer, 1, search_queries, time.perf_counter() - state["start"])]
+
+        # Optional follow-up rounds
+        notes = ""
+        if state["max_rounds"] > 1:
+            notes = self._research_rounds(
+                state["query"], search_queries, search_results, rounds, state["max_rounds"], state["start"],
+                tracer, report, policy=policy, **kwargs
+            )
+        state["search_results"] = search_results
+        state["rounds"] = rounds
+        state["notes"] = notes
+
+        dedup = self._dedup_summary(tracer)
+        if dedup["search_calls_saved"]:
+            print(
+                f"[Dedup] saved {dedup['search_calls_saved']} search calls "
+                f"({dedup['merged_queries']} merged queries, {dedup['similar_cache_hits']} similar cached queries)"
+            )
+        state["dedup"] = dedup
+        if policy is not None:
+            print(self._policy_summary(policy))
+
+    def synthesize_stage(self, state, on_token=None, report=None):
+        """
+        Step 3: synthesizes the final answer from the search results.
+        """
+        tracer = state["tracer"]
+        print("--- Synthesizing Results ---")
+        with tracer.span("synthesize") as span:
+            state["final_answer"] = self._synthesize_answer(
+                state["query"], state["search_results"], on_token=on_token, stats=span, notes=state["notes"],
+                tracer=tracer
+            )
+        if report:
+            with tracer.span("report", section="answer"):
+                report.write_answer(state["final_answer"])
+
+    def refresh(self, session, max_age=None, search_depth=None, on_token=None, tracer=None, report=None):
+        """
+        Re-runs a stored session (see session_store.SessionStore) without
+        planning again: only its searches older than max_age (and failed ones)
+        are executed again, the others are reused, and the answer is
+        synthesized anew from the combined results.
+
+        Args:
+            session (dict): A stored session, e.g. SessionStore.latest(topic).
+            max_age (float, optional): Seconds after which a stored search is
+                stale. Defaults to SessionConfig.REFRESH_MAX_AGE.
+            search_depth, on_token, tracer, report: See run().
+
+        Returns:
+            dict: The same result as run(), plus 'fetched_at' (when each search
+                result was fetched) and 'refreshed' (counts of 'searched' and
+                'reused' queries).
+        """
+        state = self.start_refresh(session, search_depth=search_depth, tracer=tracer)
+        self.refresh_stage(state, max_age=max_age, report=report)
+        self.synthesize_stage(state, on_token=on_token, report=report)
+        return self.finish_run(state)
+
+    def start_refresh(self, session, search_depth=None, tracer=None):
+        """
+        Starts a refresh of a stored session; the state then goes through
+        refresh_stage and synthesize_stage (see refresh()).
+        """
+        state = self.start_run(session["topic"], search_depth=search_depth, tracer=tracer, max_rounds=1)
+        state["session"] = session
+        state["search_queries"] = [search["query"] for search in session["searches"]]
+        state["merged"] = {}
+        return state
+
+    def refresh_stage(self, state, max_age=None, report=None):
+        """
+        Searches the stale queries of the session being refreshed again and
+        reuses the stored results of the others.
+        """
+        max_age = SessionConfig.REFRESH_MAX_AGE if max_age is None else max_age
+        tracer = state["tracer"]
+        searches = state["session"]["searches"]
+        now = time.time()
+        stale = [i for i, search in enumerate(searches) if search["error"] or now - search["fetched_at"] > max_age]
+        print(f"--- Refreshing {len(stale)} of {len(searches)} Search Queries ---")
+        with tracer.span("search_stage", round=1, num_queries=len(stale), reused=len(searches) - len(stale)):
+            fresh = self._execute_searches(
+                [searches[i]["query"] for i in stale], tracer=tracer, policy=state["search_policy"],
+                **state["search_kwargs"]
+            )
+        search_results = [search["result"] for search in searches]
+        fetched_at = [search["fetched_at"] for search in searches]
+        for i, result in zip(stale, fresh):
+            search_results[i] = result
+            fetched_at[i] = now
+        if report:
+            with tracer.span("report", section="plan"):
+                report.write_plan(state["search_queries"])
+            with tracer.span("report", section="results", round=1):
+                report.write_search_results(search_results)
+
+        # The stored notes summarize the old results, so they are not reused
+        state["search_results"] = search_results
+        state["fetched_at"] = fetched_at
+        state["refreshed"] = {"searched": len(stale), "reused": len(searches) - len(stale)}
+        state["rounds"] = [self._round_summary(tracer, 1, state["search_queries"], time.perf_counter() - state["start"])]
+        state["notes"] = ""
+        state["dedup"] = self._dedup_summary(tracer)
+
+    def finish_run(self, state):
+        """
+        Returns the result dict of a run whose stages are done (see run()).
+        """
+        if "search_results" not in state:
+            # Planning failed
+            return {
+                "query": state["query"],
+                "search_results": [],
+                "final_answer": state["final_answer"],
+                "trace": state["tracer"].to_dict()
+            }
+        result = {
+            "query": state["query"],
+            "search_results": state["search_results"],
+            "final_answer": state["final_answer"],
+            "dedup": state["dedup"],
+            "trace": state["tracer"].to_dict()
+        }
+        if state["max_rounds"] > 1:
+            result["rounds"] = state["rounds"]
+            result["notes"] = state["notes"]
+        if "refreshed" in state:
+            result["fetched_at"] = state["fetched_at"]
+            result["refreshed"] = state["refreshed"]
+        if state["search_policy"] is not None:
+            result["search_policy"] = state["search_policy"].summary()
+        return result
+
+    async def arun(self, user_query, search_depth=None, max_rounds=None, timeout=None, on_event=None):
+        """
+        asyncio version of run(), for embedding the agent in an async service.
+
+        Needs the async clients (AsyncOllamaClient and AsyncTavilyClient). Nothing
+        is printed; progress is reported as events (see astream). An agent
+        holds no per-run state, so one agent and its clients can serve many
+        concurrent runs on the same event loop. Cancelling the awaiting task
+        cancels the run, including in-flight searches and generation.
+
+        Args:
+            user_query (str): The research topic.
+            search_depth (str, optional): Overrides TavilyConfig.SEARCH_DEPTH.
+            max_rounds (int, optional): Overrides ResearchConfig.MAX_ROUNDS.
+            timeout (float, optional): Deadline in seconds for the whole run;
+                asyncio.TimeoutError is raised once it passes.
+            on_event (callable, optional): Called with each progress event.
+
+        Returns:
+            dict: The same result as run().
+        """
+        async for event in self.astream(user_query, search_depth=search_depth, max_rounds=max_rounds, timeout=timeout):
+            if on_event:
+                on_event(event)
+            if event["type"] == "done":
+                return event["result"]
+
+    async def astream(self, user_query, search_depth=None, max_rounds=None, timeout=None):
+        """
+        Runs the research like arun() and yields its progress events.
+
+        Each event is a dict with a 'type':
+            plan: 'queries' to search in round 1 and 'merged' near-duplicates.
+            search: one query finished; 'query', 'round', 'num_results',
+                'cache_hit', 'error' (None on success) and 'escalated' (searched
+                again at advanced depth by the adaptive search policy).
+            round: a follow-up 'round' starts with 'queries'.
+            status: a 'message', e.g. why follow-up rounds stopped.
+            summary: map-reduce synthesis summarized the results of one
+                'query'; 'error' is None on success.
+            context: packing 'stats' and 'token_budget' of the synthesis prompt.
+            token: 'text', a fragment of the final answer.
+            done: 'result', the dict run() returns. Always the last event.
+
+        Leaving the loop early (or closing the generator) cancels the run.
+
+        Raises:
+            asyncio.TimeoutError: If the run takes longer than timeout.
+        """
+        import asyncio
+
+        clients_async = (
+            inspect.isasyncgenfunction(self.llm.generate_stream)
+            and inspect.isasyncgenfunction(self.planner.generate_stream)
+            and inspect.iscoroutinefunction(self.tavily.search)
+        )
+        if not clients_async:
+            raise TypeError("astream and arun need AsyncOllamaClient and AsyncTavilyClient")
+        events = asyncio.Queue()
+
+        def emit(event_type, **fields):
+            events.put_nowait(dict(fields, type=event_type))
+
+        async def produce():
+            try:
+                result = await asyncio.wait_for(self._apipeline(user_query, emit, search_depth, max_rounds), timeout)
+            except Exception as e:
+                events.put_nowait(e)
+            else:
+                emit("done", result=result)
+
+        task = asyncio.ensure_future(produce())
+        try:
+            while True:
+                event = await events.get()
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+                if event["type"] == "done":
+                    return
+        finally:
+            if not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+    async def _apipeline(self, user_query, emit, search_depth=None, max_rounds=None):
+        import asyncio
+
+        tracer = Tracer(name=user_query)
+        max_rounds = max_rounds if max_rounds else ResearchConfig.MAX_ROUNDS
+        start = time.perf_counter()
+
+        with tracer.span("plan", round=1) as span:
+            search_queries = await asyncio.to_thread(self._cached_plan, user_query, span)
+            if search_queries is None:
+                search_queries = await self._aplan_research(user_query, stats=span)
+                await asyncio.to_thread(self._store_plan, user_query, search_queries)
         if not search_queries:
             return {
                 "query": user_query,
                 "search_results": [],
-                "final_answer": "Failed to generate search queries."
+                "final_answer": "Failed to generate search queries.",
+                "trace": tracer.to_dict()
             }
 
-        # Step 2: Execute Search
-        print(f"--- Executing {len(search_queries)} Search Queries ---")
-        search_results = []
-        for query in search_queries:
-            print(f"Searching for: {query}")
-            # Pass search_depth if provided, otherwise TavilyClient uses default from config
-            kwargs = {}
-            if search_depth:
-                kwargs["search_depth"] = search_depth
-            
-            result = self.tavily.search(query, **kwargs)
-            search_results.append(result)
+        search_queries, merged = self._dedupe_queries(search_queries, tracer, 1, verbose=False)
+        emit("plan", queries=search_queries, merged=merged)
+        kwargs = {}
+        if search_depth:
+            kwargs["search_depth"] = search_depth
+        policy = AdaptiveSearchPolicy() if self.adaptive_search else None
+        with tracer.span("search_stage", round=1, num_queries=len(search_queries)):
+            search_results = await self._aexecute_searches(search_queries, tracer, emit, 1, policy=policy, **kwargs)
+        rounds = [self._round_summary(tracer, 1, search_queries, time.perf_counter() - start)]
 
-        # Step 3: Synthesize Results
-        print("--- Synthesizing Results ---")
-        final_answer = self._synthesize_answer(user_query, search_results)
-        
-        return {
+        notes = ""
+        if max_rounds > 1:
+            notes = await self._aresearch_rounds(
+                user_query, search_queries, search_results, rounds, max_rounds, start, tracer, emit, policy=policy,
+                **kwargs
+            )
+
+        dedup = self._dedup_summary(tracer)
+        with tracer.span("synthesize") as span:
+            final_answer = await self._asynthesize_answer(
+                user_query, search_results, emit, stats=span, notes=notes, tracer=tracer
+            )
+
+        result = {
             "query": user_query,
             "search_results": search_results,
-            "final_answer": final_answer
+            "final_answer": final_answer,
+            "dedup": dedup,
+            "trace": tracer.to_dict()
         }
+        if max_rounds > 1:
+            result["rounds"] = rounds
+            result["notes"] = notes
+        if policy is not None:
+            result["search_policy"] = policy.summary()
+        return result
 
-    def _plan_research(self, query):
+    async def _aresearch_rounds(self, user_query, asked_queries, search_results, rounds, max_rounds, start, tracer,
+                                emit, policy=None, **kwargs):
         """
-        Asks the LLM to plan the research and generate search queries.
+        asyncio version of _research_rounds.
+        """
+        import asyncio
+
+        notes = ""
+        asked = {normalize_query(q) for q in asked_queries if isinstance(q, str)}
+        searched = [q for q in asked_queries if isinstance(q, str)]
+        new_results = list(search_results)
+
+        for round_number in range(2, max_rounds + 1):
+            round_start = time.perf_counter()
+            stop_reason = self._round_limit(search_results, round_start - start)
+            if stop_reason:
+                emit("status", message=f"{stop_reason}; stopping follow-up rounds")
+                break
+
+            with tracer.span("review", round=round_number) as span:
+                # Packing is CPU-bound; keep it off the event loop
+                system_prompt, user_prompt = await asyncio.to_thread(
+                    self._review_prompts, user_query, notes, new_results, sorted(asked)
+                )
+                response = await self.llm.generate(user_prompt, system_prompt=system_prompt, stats=span)
+            review = self._parse_review(response, notes)
+            if review is None:
+                emit("status", message="Could not parse the round review; keeping previous notes")
+                break
+            notes, follow_ups = review
+
+            queries = self._follow_up_queries(
+                follow_ups, asked, searched, len(search_results), tracer, round_number, verbose=False
+            )
+            if not queries:
+                emit("status", message="No further gaps identified")
+                break
+
+            emit("round", round=round_number, queries=queries)
+            with tracer.span("search_stage", round=round_number, num_queries=len(queries)):
+                new_results = await self._aexecute_searches(queries, tracer, emit, round_number, policy=policy, **kwargs)
+            search_results.extend(new_results)
+            rounds.append(self._round_summary(tracer, round_number, queries, time.perf_counter() - round_start))
+
+        self._add_cumulative_tokens(rounds)
+        return notes
+
+    async def _aexecute_searches(self, queries, tracer, emit, round_number, policy=None, **kwargs):
+        """
+        Runs the search queries concurrently, bounded by TavilyConfig.MAX_CONCURRENT_SEARCHES
+        per run, and emits a 'search' event as each one finishes. See
+        _execute_searches for the policy and the per-search deadline.
+
+        Returns:
+            list: One search result dict per query, in the original query order.
+        """
+        import asyncio
+
+        slots = asyncio.Semaphore(max(1, TavilyConfig.MAX_CONCURRENT_SEARCHES))
+
+        async def search_call(query, search_kwargs, **fields):
+            with tracer.span("search", query=query, **fields) as span:
+                try:
+                    # Retries and slow responses included, like _execute_searches
+                    result = await asyncio.wait_for(
+                        self.tavily.search(query, stats=span, **search_kwargs), TavilyConfig.SEARCH_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    span["error"] = f"Search timed out after {TavilyConfig.SEARCH_TIMEOUT}s"
+                    result = {"results": [], "error": span["error"]}
+                except Exception as e:
+                    span["error"] = str(e)
+                    result = {"results": [], "error": str(e)}
+            return result, span
+
+        async def search_one(query):
+            escalated = False
+            async with slots:
+                if policy is None:
+                    result, span = await search_call(query, kwargs)
+                else:
+                    result, span = await search_call(query, dict(kwargs, **policy.basic_kwargs()), depth="basic")
+                    span["decision"] = decision = policy.assess(query, result, span)
+                    if decision["escalated"]:
+                        escalated = True
+                        advanced, span = await search_call(
+                            query, dict(kwargs, **policy.advanced_kwargs()), depth="advanced"
+                        )
+                        result = policy.settle(decision, result, advanced, span)
+            result.setdefault("query", query)
+            emit(
+                "search",
+                query=query,
+                round=round_number,
+                num_results=len(result.get("results", [])),
+                cache_hit=span.get("cache_hit", False),
+                error=result.get("error"),
+                escalated=escalated,
+            )
+            return result
+
+        return list(await asyncio.gather(*(search_one(query) for query in queries)))
+
+    async def _aplan_research(self, query, stats=None):
+        """
+        asyncio version of _plan_research; generation also stops as soon as a
+        complete JSON list of queries has been received.
+        """
+        system_prompt, user_prompt = self._plan_prompts(query)
+        if stats is None:
+            stats = {}
+        parser = PlanParser()
+        stream = self.planner.generate_stream(user_prompt, system_prompt=system_prompt, stats=stats)
+        try:
+            async for token in stream:
+                if parser.feed(token) is not None:
+                    stats["stopped_early"] = True
+                    break
+        finally:
+            await stream.aclose()
+        self._estimate_plan_counts(stats, system_prompt, user_prompt, parser.text)
+        return parser.finish() or []
+
+    async def _asynthesize_answer(self, query, search_results, emit, stats=None, notes=None, tracer=None):
+        """
+        asyncio version of _synthesize_answer; each fragment of the answer is
+        emitted as a 'token' event.
+        """
+        import asyncio
+
+        if self.synthesis_mode == "map_reduce":
+            summaries = await self._amap_summaries(query, search_results, emit, tracer=tracer, stats=stats)
+            system_prompt, user_prompt, pack_stats, token_budget = self._reduce_prompts(query, summaries, notes)
+        else:
+            # Indexing full pages is CPU-bound; keep it off the event loop
+            system_prompt, user_prompt, pack_stats, token_budget = await asyncio.to_thread(
+                self._synthesis_prompts, query, search_results, notes
+            )
+        emit("context", stats=pack_stats, token_budget=token_budget)
+
+        if stats is None:
+            stats = {}
+        stats["context"] = pack_stats
+        parts = []
+        async for token in self.llm.generate_stream(user_prompt, system_prompt=system_prompt, stats=stats):
+            parts.append(token)
+            emit("token", text=token)
+        return "".join(parts)
+
+    async def _amap_summaries(self, query, search_results, emit, tracer=None, stats=None):
+        """
+        asyncio version of _map_summaries; each finished summary is emitted as
+        a 'summary' event.
+        """
+        import asyncio
+
+        if tracer is None:
+            tracer = Tracer()
+        entries = [result for result in search_results if result.get("results")]
+        slots = asyncio.Semaphore(max(1, SynthesisConfig.MAP_WORKERS))
+
+        async def summarize(result):
+            search_query = result.get("query", "")
+            async with slots:
+                system_prompt, user_prompt, pack_stats = await asyncio.to_thread(self._map_prompts, query, result)
+                with tracer.span("summarize", query=search_query, context=pack_stats) as span:
+                    response = await self.llm.generate(user_prompt, system_prompt=system_prompt, stats=span)
+            emit("summary", query=search_query, error=span.get("error"))
+            return search_query, self._summary_text(response, span)
+
+        start = time.perf_counter()
+        summaries = await asyncio.gather(*(summarize(result) for result in entries))
+        return self._collect_summaries(summaries, start, stats)
+
+    def _research_rounds(self, user_query, asked_queries, search_results, rounds, max_rounds, start, tracer,
+                         report=None, policy=None, **kwargs):
+        """
+        Runs follow-up search rounds until the LLM finds no gaps or a limit is hit.
+        
+        Each review only sends the results of the latest round together with the
+        running notes, so prompt size stays flat instead of growing with every
+        round. search_results and rounds are extended in place.
+        
+        Returns:
+            str: The research notes accumulated over all rounds.
+        """
+        notes = ""
+        asked = {normalize_query(q) for q in asked_queries if isinstance(q, str)}
+        searched = [q for q in asked_queries if isinstance(q, str)]
+        new_results = list(search_results)
+        
+        for round_number in range(2, max_rounds + 1):
+            round_start = time.perf_counter()
+            stop_reason = self._round_limit(search_results, round_start - start)
+            if stop_reason:
+                print(f"--- {stop_reason}; stopping follow-up rounds ---")
+                break
+
+            with tracer.span("review", round=round_number) as span:
+                notes, follow_ups = self._review_round(user_query, notes, new_results, sorted(asked), stats=span)
+            
+            queries = self._follow_up_queries(follow_ups, asked, searched, len(search_results), tracer, round_number)
+            if not queries:
+                print("--- No further gaps identified ---")
+                break
+
+            print(f"--- Round {round_number}: Executing {len(queries)} Follow-up Queries ---")
+            with tracer.span("search_stage", round=round_number, num_queries=len(queries)):
+                new_results = self._execute_searches(queries, tracer=tracer, policy=policy, **kwargs)
+            search_results.extend(new_results)
+            if report:
+                with tracer.span("report", section="results", round=round_number):
+                    report.write_search_results(new_results)
+            rounds.append(self._round_summary(tracer, round_number, queries, time.perf_counter() - round_start))
+
+        self._add_cumulative_tokens(rounds)
+        for entry in rounds:
+            print(
+                f"[Round {entry['round']}] {len(entry['queries'])} queries, {entry['latency']:.2f}s, "
+                f"{entry['tokens']} LLM tokens ({entry['cumulative_tokens']} cumulative)"
+            )
+        return notes
+
+    def _round_limit(self, search_results, elapsed):
+        """
+        Returns why no further round may start, or None.
+        """
+        if len(search_results) >= ResearchConfig.MAX_TOTAL_QUERIES:
+            return "Query limit reached"
+        if elapsed > ResearchConfig.TIME_BUDGET:
+            return "Time budget exhausted"
+        return None
+
+    def _follow_up_queries(self, follow_ups, asked, searched, num_searched, tracer, round_number, verbose=True):
+        """
+        Picks the follow-up queries to search: new ones only, near-duplicates
+        of earlier queries merged, capped per round and by the total query
+        limit. asked (normalized queries) and searched are updated in place.
+        """
+        queries = []
+        for query in follow_ups:
+            key = normalize_query(query)
+            if key and key not in asked:
+                asked.add(key)
+                queries.append(query)
+        queries, _ = self._dedupe_queries(queries, tracer, round_number, existing=searched, verbose=verbose)
+        remaining = ResearchConfig.MAX_TOTAL_QUERIES - num_searched
+        queries = queries[:min(ResearchConfig.MAX_FOLLOWUP_QUERIES, remaining)]
+        searched.extend(queries)
+        return queries
+
+    def _add_cumulative_tokens(self, rounds):
+        cumulative = 0
+        for entry in rounds:
+            cumulative += entry["tokens"]
+            entry["cumulative_tokens"] = cumulative
+
+    def _dedupe_queries(self, queries, tracer, round_number, existing=None, verbose=True):
+        """
+        Merges near-duplicate queries (see query_dedup.dedupe_queries) before they are searched.
+
+        Returns:
+            tuple: (queries to search, dict mapping merged queries to the query kept).
+        """
+        with tracer.span("dedup", round=round_number) as span:
+            kept, merged = dedupe_queries(queries, existing=existing)
+            span["merged"] = len(merged)
+        if verbose:
+            for query, kept_query in merged.items():
+                print(f"[Dedup] '{query}' is covered by '{kept_query}'")
+        return kept, merged
+
+    def _dedup_summary(self, tracer):
+        """
+        Counts the search calls avoided by merging queries and by reusing
+        cached results of similar queries.
+        """
+        merged = 0
+        similar_hits = 0
+        for span in tracer.to_dict()["spans"]:
+            if span["name"] == "dedup":
+                merged += span.get("merged", 0)
+            elif span["name"] == "search" and span.get("similar_hit"):
+                similar_hits += 1
+        return {
+            "merged_queries": merged,
+            "similar_cache_hits": similar_hits,
+            "search_calls_saved": merged + similar_hits,
+        }
+
+    def _round_summary(self, tracer, round_number, queries, latency):
+        tokens = 0
+        for span in tracer.to_dict()["spans"]:
+            if span.get("round") == round_number:
+                tokens += span.get("prompt_eval_count", 0) + span.get("eval_count", 0)
+        return {"round": round_number, "queries": list(queries), "latency": round(latency, 3), "tokens": tokens}
+
+    def _review_round(self, query, notes, new_results, asked_queries, stats=None):
+        """
+        Folds the latest search results into the research notes and asks the LLM
+        for follow-up queries that would close remaining gaps.
+        
+        Returns:
+            tuple: (updated notes, list of follow-up queries).
+        """
+        system_prompt, user_prompt = self._review_prompts(query, notes, new_results, asked_queries)
+        response = self.llm.generate(user_prompt, system_prompt=system_prompt, stats=stats)
+        review = self._parse_review(response, notes)
+        if review is None:
+            print("Could not parse the round review; keeping previous notes.")
+            return notes, []
+        return review
+
+    def _review_prompts(self, query, notes, new_results, asked_queries):
+        """
+        Builds the review prompt, packing the latest results into what is left
+        of the context window after the notes (at most
+        ResearchConfig.NOTES_TOKEN_BUDGET) and LLMConfig.ANSWER_TOKEN_RESERVE
+        for the review itself.
+
+        Returns:
+            tuple: (system prompt, user prompt).
         """
         system_prompt = (
-            "You are a Deep Research Agent powered by DeepSeek-R1. "
-            "Your goal is to create a comprehensive research plan for a given user query. "
-            "You MUST first think about the problem in a <think> block, analyzing what information is missing and what needs to be searched. "
-            "After thinking, you MUST output a list of search queries in a strict JSON format. "
-            "The JSON should be a list of strings, e.g., [\"query 1\", \"query 2\"]. "
-            "Do not output any text outside of the <think> block and the JSON block."
+            "You are a Deep Research Agent reviewing search results. "
+            "Update the research notes with the important new facts from the latest results, keeping them concise and citing URLs. "
+            "Then decide which information is still missing to fully answer the user query. "
+            "Think in a <think> block first, then output a single JSON object of the form "
+            "{\"notes\": \"updated notes\", \"follow_up_queries\": [\"query 1\", \"query 2\"]}. "
+            "Use an empty follow_up_queries list if nothing important is missing. "
+            "Do not repeat queries that were already searched."
         )
+        prompt_template = (
+            "User Query: {query}\n\n"
+            "Research Notes So Far:\n{notes}\n\n"
+            "Already Searched:\n{asked}\n\n"
+            "Latest Search Results:\n{context}\n\n"
+            "Return the JSON object."
+        )
+        asked = "\n".join(f"- {q}" for q in asked_queries)
+        notes_text = truncate_tokens(notes, ResearchConfig.NOTES_TOKEN_BUDGET) if notes else "(none yet)"
+        # The overhead already holds the notes; the reserve leaves room for the updated notes and follow-ups
+        overhead = estimate_tokens(system_prompt) + estimate_tokens(
+            prompt_template.format(query=query, notes=notes_text, asked=asked, context="")
+        )
+        token_budget = max(0, self.llm.context_window - LLMConfig.ANSWER_TOKEN_RESERVE - overhead)
+        context, _ = pack_context(query, new_results, token_budget)
+        return system_prompt, prompt_template.format(query=query, notes=notes_text, asked=asked, context=context)
+
+    def _parse_review(self, response, notes):
+        """
+        Returns (updated notes, follow-up queries) from a review response, or
+        None if it holds no JSON object. The notes are cut to
+        ResearchConfig.NOTES_TOKEN_BUDGET.
+        """
+        data = self._extract_json_object(response)
+        if data is None:
+            return None
+        updated_notes = data.get("notes")
+        if not isinstance(updated_notes, str) or not updated_notes.strip():
+            updated_notes = notes
+        follow_ups = data.get("follow_up_queries")
+        if not isinstance(follow_ups, list):
+            # null, a bare string or a number: no usable queries
+            follow_ups = []
+        follow_ups = [q for q in follow_ups if isinstance(q, str) and q.strip()]
+        return truncate_tokens(updated_notes.strip(), ResearchConfig.NOTES_TOKEN_BUDGET), follow_ups
+
+    def _extract_json_object(self, response):
+        """
+        Returns the first JSON object in the response outside <think> blocks, or None.
+        """
+        cleaned_response = re.sub(r"<think>.*?</think>", "", response, flags=re.DOTALL)
+        decoder = json.JSONDecoder()
+        for match in re.finditer(r"\{", cleaned_response):
+            try:
+                data, _ = decoder.raw_decode(cleaned_response, match.start())
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, dict):
+                return data
+        return None
+
+    def _execute_searches(self, queries, tracer=None, policy=None, **kwargs):
+        """
+        Runs the search queries concurrently, bounded by TavilyConfig.MAX_CONCURRENT_SEARCHES.
         
-        user_prompt = f"User Query: {query}\n\nGenerate the research plan and search queries."
+        Each search call has a wall-clock deadline of TavilyConfig.SEARCH_TIMEOUT,
+        retries and slow-dripping responses included. A query that misses it
+        yields an error entry (or its basic results, if its advanced search is
+        the one that is late) and frees its slot for the next query; the
+        request itself is abandoned to a background thread. With an
+        AdaptiveSearchPolicy, queries start as basic searches and the policy
+        picks the ones searched again at advanced depth.
+        
+        Returns:
+            list: One search result dict per query, in the original query order.
+        """
+        if tracer is None:
+            tracer = Tracer()
+        if not queries:
+            return []
+        timeout = TavilyConfig.SEARCH_TIMEOUT
+        max_running = max(1, TavilyConfig.MAX_CONCURRENT_SEARCHES)
+        # One thread per query, so abandoned requests never hold up the queries after them
+        executor = ThreadPoolExecutor(max_workers=len(queries))
+        results = [None] * len(queries)
+        waiting = list(range(len(queries)))
+        running = {}  # future -> (query index, progress dict shared with _search_one)
+        try:
+            while waiting or running:
+                while waiting and len(running) < max_running:
+                    index = waiting.pop(0)
+                    progress = {"deadline": time.perf_counter() + timeout, "result": None,
+                                "abandoned": threading.Event()}
+                    future = executor.submit(self._search_one, queries[index], tracer, policy, progress, **kwargs)
+                    running[future] = (index, progress)
+                next_deadline = min(progress["deadline"] for _, progress in running.values())
+                done, _ = wait(running, timeout=max(0.0, next_deadline - time.perf_counter()),
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, _ = running.pop(future)
+                    results[index] = future.result()
+                now = time.perf_counter()
+                for future, (index, progress) in list(running.items()):
+                    if progress["deadline"] <= now:
+                        del running[future]
+                        results[index] = self._late_search(queries[index], timeout, progress)
+        finally:
+            executor.shutdown(wait=False)
+        return results
+
+    def _search_one(self, query, tracer, policy=None, progress=None, **kwargs):
+        print(f"Searching for: {query}")
+        abandoned = progress["abandoned"] if progress is not None else None
+        if policy is None:
+            result, _ = self._search_call(query, tracer, kwargs, abandoned)
+        else:
+            result, span = self._search_call(
+                query, tracer, dict(kwargs, **policy.basic_kwargs()), abandoned, depth="basic"
+            )
+            if abandoned is not None and abandoned.is_set():
+                # The round has already returned without this query; leave the credits alone
+                result.setdefault("query", query)
+                return result
+            # Kept on the span so traces and stored sessions record every decision
+            span["decision"] = decision = policy.assess(query, result, span)
+            if decision["escalated"]:
+                print(f"Escalating '{query}' to an advanced search ({', '.join(decision['reasons'])})")
+                if progress is not None:
+                    # The advanced search gets its own deadline; the basic results are kept if it misses it
+                    progress.update(result=dict(result, query=query),
+                                    deadline=time.perf_counter() + TavilyConfig.SEARCH_TIMEOUT)
+                advanced, span = self._search_call(
+                    query, tracer, dict(kwargs, **policy.advanced_kwargs()), abandoned, depth="advanced"
+                )
+                if abandoned is None or not abandoned.is_set():
+                    result = policy.settle(decision, result, advanced, span)
+        # Error entries carry no query; keep it so the run can be stored and refreshed
+        result.setdefault("query", query)
+        return result
+
+    def _late_search(self, query, timeout, progress):
+        """
+        Returns what a query that missed its deadline contributes to the round.
+
+        The query is marked abandoned so its worker neither sends further
+        requests nor touches the policy's credits.
+        """
+        progress["abandoned"].set()
+        if progress["result"] is not None:
+            print(f"Advanced search for '{query}' timed out after {timeout}s; keeping the basic results")
+            return progress["result"]
+        print(f"Search for '{query}' timed out after {timeout}s")
+        return {"results": [], "error": f"Search timed out after {timeout}s", "query": query}
+
+    def _search_call(self, query, tracer, kwargs, cancelled=None, **fields):
+        if cancelled is not None:
+            kwargs = dict(kwargs, cancelled=cancelled)
+        with tracer.span("search", query=query, **fields) as span:
+            try:
+                result = self.tavily.search(query, stats=span, **kwargs)
+            except Exception as e:
+                print(f"Search failed for '{query}': {e}")
+                span["error"] = str(e)
+                result = {"results": [], "error": str(e)}
+        return result, span
+
+    def _policy_summary(self, policy):
+        summary = policy.summary()
+        skipped = f", {summary['skipped']} not escalated for lack of budget" if summary["skipped"] else ""
+        return (
+            f"[Search policy] escalated {summary['escalated']} of {summary['searched']} queries to advanced search"
+            f"{skipped}, {summary['credits_used']} of {summary['credit_budget']} credits used"
+        )
+
+    def _plan_research(self, query, stats=None):
+        """
+        Asks the LLM to plan the research and generate search queries.
         
-        response = self.llm.generate(user_prompt, system_prompt=system_prompt)
+        The response is streamed through a PlanParser and generation stops as
+        soon as a complete list of queries has been received.
+        """
+        system_prompt, user_prompt = self._plan_prompts(query)
+        if stats is None:
+            stats = {}
+        parser = PlanParser()
+        stream = self.planner.generate_stream(user_prompt, system_prompt=system_prompt, stats=stats)
+        try:
+            for token in stream:
+                if parser.feed(token) is not None:
+                    stats["stopped_early"] = True
+                    break
+        finally:
+            stream.close()
+        response = parser.text
+        self._estimate_plan_counts(stats, system_prompt, user_prompt, response)
+        self._report_llm_stats("Planning", stats)
         
         # Extract thinking process for display (optional)
         think_match = re.search(r"<think>(.*?)</think>", response, re.DOTALL)
@@ -70,46 +926,96 @@ class DeepResearchAgent:
             print(think_match.group(1).strip())
             print("-" * 30)
         
-        # Clean response for JSON extraction: remove <think> blocks
-        cleaned_response = re.sub(r"<think>.*?</think>", "", response, flags=re.DOTALL).strip()
-        
-        # Try to find JSON content
-        # Priority 1: Look for JSON code block
-        json_match = re.search(r"```(?:json)?\s*(\[.*?\])\s*```", cleaned_response, re.DOTALL)
-        
-        # Priority 2: Look for list structure directly
-        if not json_match:
-             json_match = re.search(r"(\[.*\])", cleaned_response, re.DOTALL)
-             
-        if json_match:
-            json_str = json_match.group(1)
-            try:
-                queries = json.loads(json_str)
-                return queries
-            except json.JSONDecodeError:
-                print("Error decoding JSON from LLM response.")
-                print(f"Raw response: {response}")
-                return []
-        else:
-            print("No JSON found in LLM response.")
+        queries = parser.finish()
+        if queries is None:
+            print("No search queries found in LLM response.")
             print(f"Raw response: {response}")
-            return []
+        return queries or []
 
-    def _synthesize_answer(self, query, search_results):
+    def _cached_plan(self, query, stats):
+        """
+        Returns the search queries cached for this topic, or None.
+        """
+        if self.plan_cache is None:
+            return None
+        queries = self.plan_cache.get(self._plan_key(query))
+        stats["plan_cache_hit"] = queries is not None
+        return queries
+
+    def _store_plan(self, query, queries):
+        if self.plan_cache is not None and queries:
+            self.plan_cache.set(self._plan_key(query), queries, label=normalize_query(query))
+
+    def _plan_key(self, query):
+        # A new model or planning prompt invalidates the cached plans
+        system_prompt, _ = self._plan_prompts(query)
+        return make_key("agent.plan", self.planner.model, system_prompt, normalize_query(query))
+
+    def _plan_prompts(self, query):
+        system_prompt = (
+            "You are a Deep Research Agent powered by DeepSeek-R1. "
+            "Your goal is to create a comprehensive research plan for a given user query. "
+            "You MUST first think about the problem in a <think> block, analyzing what information is missing and what needs to be searched. "
+            "After thinking, you MUST output a list of search queries in a strict JSON format. "
+            "The JSON should be a list of strings, e.g., [\"query 1\", \"query 2\"]. "
+            "Do not output any text outside of the <think> block and the JSON block."
+        )
+        user_prompt = f"User Query: {query}\n\nGenerate the research plan and search queries."
+        return system_prompt, user_prompt
+
+    def _estimate_plan_counts(self, stats, system_prompt, user_prompt, response):
+        if "eval_count" not in stats and not stats.get("cache_hit"):
+            # Stopping early skips Ollama's final counters; estimate them instead
+            stats["prompt_eval_count"] = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+            stats["eval_count"] = estimate_tokens(response)
+            stats["estimated_counts"] = True
+
+    def _report_llm_stats(self, stage, stats):
+        ttft = stats.get("time_to_first_token")
+        ttft_str = f"{ttft:.2f}s" if ttft is not None else "n/a"
+        tokens_str = ""
+        if "eval_count" in stats:
+            tokens_str = f", {stats.get('prompt_eval_count', 0)} prompt / {stats['eval_count']} generated tokens"
+        print(f"[{stage}] time to first token: {ttft_str}, total: {stats.get('total_time', 0):.2f}s{tokens_str}")
+
+    def _synthesize_answer(self, query, search_results, on_token=None, stats=None, notes=None, tracer=None):
         """
         Synthesizes the final answer from search results.
+        
+        The answer is streamed from the LLM; on_token, if given, receives each
+        fragment as soon as it arrives. Research notes from earlier rounds, if
+        any, are included ahead of the packed search results.
+
+        In "map_reduce" mode the results of each search query are summarized
+        first (see _map_summaries) and the answer is written from the summaries.
+        """
+        if self.synthesis_mode == "map_reduce":
+            summaries = self._map_summaries(query, search_results, tracer=tracer, stats=stats)
+            system_prompt, user_prompt, pack_stats, token_budget = self._reduce_prompts(query, summaries, notes)
+        else:
+            system_prompt, user_prompt, pack_stats, token_budget = self._synthesis_prompts(query, search_results, notes)
+        print(self._context_summary(pack_stats, token_budget))
+        
+        if stats is None:
+            stats = {}
+        stats["context"] = pack_stats
+        parts = []
+        for token in self.llm.generate_stream(user_prompt, system_prompt=system_prompt, stats=stats):
+            parts.append(token)
+            if on_token:
+                on_token(token)
+        self._report_llm_stats("Synthesis", stats)
+        return "".join(parts)
+
+    def _synthesis_prompts(self, query, search_results, notes=None):
         """
-        # Format search results for the LLM
-        context = ""
-        for i, res in enumerate(search_results):
-            context += f"Source {i+1}:\n"
-            if "results" in res:
-                for item in res["results"]:
-                    context += f"- Title: {item.get('title')}\n"
-                    context += f"  Content: {item.get('content')}\n"
-                    context += f"  URL: {item.get('url')}\n"
-            context += "\n"
+        Builds the synthesis prompt, packing the most relevant sources into what
+        is left of the context window after the prompt itself and the room
+        reserved for the answer.
 
+        Returns:
+            tuple: (system prompt, user prompt, packing stats, token budget).
+        """
         system_prompt = (
             "You are a Deep Research Agent. "
             "You have performed a search to answer the user's query. "
@@ -118,14 +1024,162 @@ class DeepResearchAgent:
             "Cite your sources where appropriate."
         )
         
-        user_prompt = (
-            f"User Query: {query}\n\n"
-            f"Search Results:\n{context}\n\n"
-            "Provide the final answer."
-        )
+        prompt_template = "User Query: {query}\n\n{notes}Search Results:\n{context}\n\nProvide the final answer."
+        notes = f"Research Notes:\n{notes}\n\n" if notes else ""
         
-        response = self.llm.generate(user_prompt, system_prompt=system_prompt)
-        return response
+        overhead = estimate_tokens(system_prompt) + estimate_tokens(prompt_template.format(query=query, notes=notes, context=""))
+        token_budget = max(0, self.llm.context_window - LLMConfig.ANSWER_TOKEN_RESERVE - overhead)
+        if RetrievalConfig.ENABLED:
+            context, pack_stats = pack_chunks(query, search_results, token_budget)
+        else:
+            context, pack_stats = pack_context(query, search_results, token_budget)
+        user_prompt = prompt_template.format(query=query, notes=notes, context=context)
+        return system_prompt, user_prompt, pack_stats, token_budget
+
+    def _map_summaries(self, query, search_results, tracer=None, stats=None):
+        """
+        Map step of map-reduce synthesis: the results of each search query are
+        summarized in their own short LLM call, SynthesisConfig.MAP_WORKERS at
+        a time. Each call only holds one query's sources, so it fits the
+        context window however many queries were searched, and the calls can
+        run on several Ollama slots or hosts at once.
+
+        Returns:
+            list: (search query, summary) pairs in search order. Queries without
+                results or whose summary failed are left out.
+        """
+        if tracer is None:
+            tracer = Tracer()
+        entries = [result for result in search_results if result.get("results")]
+        start = time.perf_counter()
+        summaries = []
+        if entries:
+            max_workers = max(1, min(SynthesisConfig.MAP_WORKERS, len(entries)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(self._summarize_one, query, result, tracer) for result in entries]
+                summaries = [future.result() for future in futures]
+        summaries = self._collect_summaries(summaries, start, stats)
+        failed = len(entries) - len(summaries)
+        print(
+            f"[Map] summarized the results of {len(summaries)} queries in {time.perf_counter() - start:.2f}s"
+            + (f", {failed} failed" if failed else "")
+        )
+        return summaries
+
+    def _summarize_one(self, query, result, tracer):
+        search_query = result.get("query", "")
+        system_prompt, user_prompt, pack_stats = self._map_prompts(query, result)
+        with tracer.span("summarize", query=search_query, context=pack_stats) as span:
+            response = self.llm.generate(user_prompt, system_prompt=system_prompt, stats=span)
+        if span.get("error"):
+            print(f"Summary failed for '{search_query}': {span['error']}")
+        return search_query, self._summary_text(response, span)
+
+    def _summary_text(self, response, span):
+        """
+        Returns the summary without its <think> block, or None if the call failed.
+        """
+        if span.get("error"):
+            return None
+        summary = re.sub(r"<think>.*?</think>", "", response, flags=re.DOTALL).strip()
+        return summary if summary else None
+
+    def _collect_summaries(self, summaries, start, stats=None):
+        kept = [(search_query, summary) for search_query, summary in summaries if summary]
+        if stats is not None:
+            stats["map"] = {
+                "summaries": len(kept),
+                "failed": len(summaries) - len(kept),
+                "workers": SynthesisConfig.MAP_WORKERS,
+                "time": round(time.perf_counter() - start, 3),
+            }
+        return kept
+
+    def _map_prompts(self, query, result):
+        """
+        Builds the prompt summarizing one search query's results, packing its
+        most relevant sources into the context window minus
+        SynthesisConfig.MAP_TOKEN_RESERVE.
+
+        Returns:
+            tuple: (system prompt, user prompt, packing stats).
+        """
+        system_prompt = (
+            "You are a Deep Research Agent. "
+            "Summarize the facts in the provided search results that help answer the user's query, "
+            f"as concise bullet points of at most {SynthesisConfig.SUMMARY_WORDS} words in total. "
+            "End every bullet point with the URL of its source in square brackets. "
+            "Leave out anything the search results do not say."
+        )
+
+        prompt_template = "User Query: {query}\nSearch Query: {search_query}\n\nSearch Results:\n{context}\n\nProvide the summary."
+        search_query = result.get("query", "")
+
+        overhead = estimate_tokens(system_prompt) + estimate_tokens(
+            prompt_template.format(query=query, search_query=search_query, context="")
+        )
+        token_budget = max(0, self.llm.context_window - SynthesisConfig.MAP_TOKEN_RESERVE - overhead)
+        if RetrievalConfig.ENABLED:
+            context, pack_stats = pack_chunks(query, [result], token_budget)
+        else:
+            context, pack_stats = pack_context(query, [result], token_budget)
+        user_prompt = prompt_template.format(query=query, search_query=search_query, context=context)
+        return system_prompt, user_prompt, pack_stats
+
+    def _reduce_prompts(self, query, summaries, notes=None):
+        """
+        Builds the prompt writing the answer from the per-query summaries (the
+        reduce step), keeping summaries in search order while they fit.
+
+        Returns:
+            tuple: (system prompt, user prompt, packing stats, token budget).
+        """
+        system_prompt = (
+            "You are a Deep Research Agent. "
+            "You have performed a search to answer the user's query, and the results of each search query have been summarized. "
+            "Synthesize the summaries into a comprehensive, well-structured answer. "
+            "Use the <think> block to structure your response and verify the information before writing the final answer. "
+            "Cite your sources with the URLs given in square brackets in the summaries."
+        )
+
+        prompt_template = "User Query: {query}\n\n{notes}Summaries of the Search Results:\n{context}\n\nProvide the final answer."
+        notes = f"Research Notes:\n{notes}\n\n" if notes else ""
+
+        overhead = estimate_tokens(system_prompt) + estimate_tokens(prompt_template.format(query=query, notes=notes, context=""))
+        token_budget = max(0, self.llm.context_window - LLMConfig.ANSWER_TOKEN_RESERVE - overhead)
+        blocks = []
+        pack_stats = {"summaries": 0, "used_tokens": 0, "dropped": 0, "dropped_tokens": 0}
+        for search_query, summary in summaries:
+            block = f"Search Query: {search_query}\n{summary}\n\n"
+            tokens = estimate_tokens(block)
+            if pack_stats["used_tokens"] + tokens > token_budget:
+                pack_stats["dropped"] += 1
+                pack_stats["dropped_tokens"] += tokens
+                continue
+            blocks.append(block)
+            pack_stats["summaries"] += 1
+            pack_stats["used_tokens"] += tokens
+        user_prompt = prompt_template.format(query=query, notes=notes, context="".join(blocks))
+        return system_prompt, user_prompt, pack_stats, token_budget
+
+    def _context_summary(self, pack_stats, token_budget):
+        if "summaries" in pack_stats:
+            return (
+                f"[Context] packed {pack_stats['summaries']} summaries (~{pack_stats['used_tokens']} tokens of {token_budget}), "
+                f"dropped {pack_stats['dropped']} summaries (~{pack_stats['dropped_tokens']} tokens) over budget"
+            )
+        if "indexed_chunks" in pack_stats:
+            return (
+                f"[Context] indexed {pack_stats['indexed_chunks']} chunks from {pack_stats['indexed_pages']} pages "
+                f"in {pack_stats['index_time']:.2f}s, packed {pack_stats['chunks']} chunks from {pack_stats['packed']} sources "
+                f"(~{pack_stats['used_tokens']} tokens of {token_budget}), collapsed {pack_stats['duplicates']} duplicate results, "
+                f"dropped {pack_stats['dropped']} chunks (~{pack_stats['dropped_tokens']} tokens) over budget"
+            )
+        return (
+            f"[Context] packed {pack_stats['packed']} sources (~{pack_stats['used_tokens']} tokens of {token_budget}), "
+            f"collapsed {pack_stats['duplicates']} duplicate results, "
+            f"dropped {pack_stats['dropped']} sources (~{pack_stats['dropped_tokens']} tokens) over budget"
+        )
 
 if __name__ == "__main__":
     # Test run (requires valid API key in .env)
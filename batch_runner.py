@@ -0,0 +1,373 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from agent import DeepResearchAgent
+from config import BatchConfig, LLMConfig, ReportConfig
+from llm_router import create_llm
+from pipeline import Stage, StagedPipeline
+from report_generator import generate_html_report
+from report_index import index_report, refresh_index_page
+from tavily_client import TavilyClient
+from tracing import Tracer, aggregate_traces
+
+INDEX_FILENAME = "index.json"
+TRACE_SUMMARY_FILENAME = "trace_summary.json"
+
+def load_topics(path):
+    """
+    Reads research topics from a JSONL or plain text file.
+
+    JSONL lines may be a JSON string or an object with a 'query' (or 'topic')
+    field. Text files contain one topic per line; blank lines and lines starting
+    with '#' are ignored.
+
+    Returns:
+        list: Topic strings in file order, without duplicates.
+    """
+    topics = []
+    is_jsonl = path.endswith((".jsonl", ".json"))
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if is_jsonl:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON ({e})")
+                if isinstance(entry, str):
+                    topic = entry
+                elif isinstance(entry, dict):
+                    topic = entry.get("query") or entry.get("topic")
+                else:
+                    raise ValueError(f"{path}:{line_number}: expected a string or object")
+                if not topic or not isinstance(topic, str):
+                    raise ValueError(f"{path}:{line_number}: expected a 'query' field")
+            else:
+                topic = line
+            topic = topic.strip()
+            if topic not in topics:
+                topics.append(topic)
+    return topics
+
+def topic_slug(topic):
+    """
+    Returns a filesystem-safe, stable file stem for a topic.
+    """
+    slug = re.sub(r"[^\w]+", "-", topic.lower(), flags=re.UNICODE).strip("-")[:60]
+    digest = hashlib.sha1(topic.encode("utf-8")).hexdigest()[:8]
+    return f"{slug}-{digest}" if slug else digest
+
+class BatchRunner:
+    """
+    Researches many topics over a bounded worker pool with shared clients.
+
+    One Ollama client and one Tavily client are shared by all workers, each with
+    its own concurrency cap, so LLM calls and searches are limited separately.
+    Topics whose report already exists in the output directory are skipped,
+    which makes an interrupted batch resumable.
+
+    With `pipeline`, each topic moves through planning, searching and
+    synthesis on separate worker pools with bounded queues between them
+    (see pipeline.StagedPipeline), so later topics are planned and searched
+    while earlier ones are being synthesized.
+
+    Args:
+        output_dir (str): Directory for per-topic reports and the summary index.
+        model_name (str, optional): Ollama model to use.
+        search_depth (str, optional): Overrides TavilyConfig.SEARCH_DEPTH.
+        topic_workers (int): Topics researched at the same time.
+        llm_concurrency (int): Max concurrent Ollama requests.
+        search_concurrency (int): Max concurrent Tavily requests.
+        search_cache (ResultCache, optional): Shared search result cache.
+        llm_cache (ResultCache, optional): Shared LLM response cache.
+        plan_cache (ResultCache, optional): Cached search queries per topic; cached topics skip planning.
+        resume (bool): Skip topics that already have a report.
+        max_rounds (int, optional): Search rounds per topic (see DeepResearchAgent.run).
+        llm (OllamaClient or OllamaRouter, optional): Pre-built LLM client; overrides the model,
+            LLM cache and LLM cap. Defaults to llm_router.create_llm().
+        tavily (TavilyClient, optional): Pre-built search client; overrides the cache and search cap.
+        pipeline (bool, optional): Run the stages as a pipeline. Defaults to BatchConfig.PIPELINE.
+        stage_workers (dict, optional): Workers per stage ('plan', 'search', 'synthesize');
+            missing stages default to BatchConfig.PLAN_WORKERS, SEARCH_WORKERS and SYNTHESIS_WORKERS.
+        sessions (SessionStore, optional): Stores every researched topic.
+        refresh (bool): Refresh topics that have a stored session instead of
+            researching them from scratch (see DeepResearchAgent.refresh); their
+            reports are rewritten even when resuming.
+        synthesis_mode (str, optional): "single" or "map_reduce"; defaults to SynthesisConfig.MODE.
+        adaptive_search (bool, optional): Escalate only weak basic searches (see
+            search_policy.AdaptiveSearchPolicy); defaults to AdaptiveSearchConfig.ENABLED.
+    """
+
+    def __init__(self, output_dir=None, model_name=None, search_depth=None,
+                 topic_workers=None, llm_concurrency=None, search_concurrency=None,
+                 search_cache=None, resume=True, max_rounds=None, llm=None, tavily=None,
+                 llm_cache=None, plan_cache=None, pipeline=None, stage_workers=None, sessions=None, refresh=False,
+                 synthesis_mode=None, adaptive_search=None):
+        self.output_dir = output_dir or BatchConfig.OUTPUT_DIR
+        self.search_depth = search_depth
+        self.topic_workers = topic_workers or BatchConfig.TOPIC_WORKERS
+        self.pipeline = BatchConfig.PIPELINE if pipeline is None else pipeline
+        self.stage_workers = {
+            "plan": BatchConfig.PLAN_WORKERS,
+            "search": BatchConfig.SEARCH_WORKERS,
+            "synthesize": BatchConfig.SYNTHESIS_WORKERS,
+        }
+        self.stage_workers.update(stage_workers or {})
+        self.resume = resume
+        self.max_rounds = max_rounds
+        self.sessions = sessions
+        self.refresh = refresh and sessions is not None
+
+        if llm is None:
+            llm = create_llm(
+                model_name=model_name,
+                max_concurrency=llm_concurrency or BatchConfig.LLM_CONCURRENCY,
+                cache=llm_cache
+            )
+        if tavily is None:
+            tavily = TavilyClient(
+                cache=search_cache,
+                max_concurrency=search_concurrency or BatchConfig.SEARCH_CONCURRENCY
+            )
+        planner = llm.with_model(LLMConfig.PLANNING_MODEL) if LLMConfig.PLANNING_MODEL else None
+        self.agent = DeepResearchAgent(
+            llm=llm, tavily=tavily, plan_cache=plan_cache, planner=planner, synthesis_mode=synthesis_mode,
+            adaptive_search=adaptive_search
+        )
+
+        self._lock = threading.Lock()
+        self._index = {}
+        self._completed = 0
+        self._finished = 0
+        self._start_time = None
+        self._traces = []
+
+    def report_path(self, topic):
+        return os.path.join(self.output_dir, f"{topic_slug(topic)}.html")
+
+    def run(self, topics):
+        """
+        Researches every topic and writes one report per topic plus index.json.
+
+        Returns:
+            dict: Summary with counts per status, elapsed seconds and topics/hour.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._index = self._load_index()
+        self._completed = 0
+        self._finished = 0
+        self._traces = []
+        self._start_time = time.perf_counter()
+
+        pending = []
+        for topic in topics:
+            if self.resume and not self.refresh and os.path.exists(self.report_path(topic)):
+                entry = self._index.get(topic) or {"topic": topic, "report": os.path.basename(self.report_path(topic))}
+                entry["status"] = "skipped"
+                self._index[topic] = entry
+            else:
+                pending.append(topic)
+
+        print(f"--- Batch: {len(topics)} topics, {len(topics) - len(pending)} already done, {len(pending)} to run ---")
+        stages = None
+        if self.pipeline:
+            stages = self._run_pipeline(pending)
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, self.topic_workers)) as executor:
+                list(executor.map(lambda topic: self._run_topic(topic, len(pending)), pending))
+
+        elapsed = time.perf_counter() - self._start_time
+        self._write_index()
+        refresh_index_page()
+        if self._traces:
+            self._write_json(TRACE_SUMMARY_FILENAME, {
+                "runs": len(self._traces),
+                "stages": aggregate_traces(self._traces),
+            })
+
+        requested = set(topics)
+        statuses = [entry.get("status") for topic, entry in self._index.items() if topic in requested]
+        summary = {
+            "topics": len(topics),
+            "completed": statuses.count("completed"),
+            "failed": statuses.count("failed"),
+            "skipped": statuses.count("skipped"),
+            "elapsed_seconds": round(elapsed, 2),
+            "topics_per_hour": round(self._completed / elapsed * 3600, 2) if elapsed > 0 else 0.0,
+            "index": os.path.join(self.output_dir, INDEX_FILENAME),
+        }
+        if stages is not None:
+            summary["stages"] = stages
+            for stage in stages:
+                print(
+                    f"[Stage {stage['name']}] {stage['processed']} done, {stage['failed']} failed, "
+                    f"queue depth max {stage['max_queue_depth']} / avg {stage['avg_queue_depth']}, "
+                    f"utilization {stage['utilization']:.0%}"
+                )
+        if hasattr(self.agent.llm, "endpoints"):
+            summary["endpoints"] = self.agent.llm.stats()
+            for endpoint in summary["endpoints"]:
+                print(f"[Router] {endpoint['url']}: {endpoint['requests']} requests, {endpoint['failures']} failures")
+        print(
+            f"--- Batch finished: {summary['completed']} completed, {summary['failed']} failed, "
+            f"{summary['skipped']} skipped in {elapsed:.1f}s ({summary['topics_per_hour']} topics/hour) ---"
+        )
+        return summary
+
+    def _run_topic(self, topic, total):
+        job = self._start_job(topic)
+        try:
+            if job["session"] is not None:
+                result = self.agent.refresh(job["session"], search_depth=self.search_depth, tracer=job["tracer"])
+            else:
+                result = self.agent.run(
+                    topic, search_depth=self.search_depth, tracer=job["tracer"], max_rounds=self.max_rounds
+                )
+            self._write_report(job, result)
+        except Exception as e:
+            job["error"] = e
+        return self._finish_job(job, total)
+
+    def _run_pipeline(self, topics):
+        """
+        Researches the topics with one worker pool per agent stage.
+
+        Returns:
+            list: Per-stage metrics (see StagedPipeline.metrics).
+        """
+        total = len(topics)
+
+        def plan(job):
+            job["started"] = time.perf_counter()
+            if job["session"] is not None:
+                # A refreshed topic reuses its stored plan
+                job["state"] = self.agent.start_refresh(
+                    job["session"], search_depth=self.search_depth, tracer=job["tracer"]
+                )
+                return job
+            job["state"] = self.agent.start_run(
+                job["topic"], search_depth=self.search_depth, tracer=job["tracer"], max_rounds=self.max_rounds
+            )
+            if not self.agent.plan_stage(job["state"]):
+                raise RuntimeError(job["state"]["final_answer"])
+            return job
+
+        def search(job):
+            if job["session"] is not None:
+                self.agent.refresh_stage(job["state"])
+            else:
+                self.agent.search_stage(job["state"])
+            return job
+
+        def synthesize(job):
+            self.agent.synthesize_stage(job["state"])
+            self._write_report(job, self.agent.finish_run(job["state"]))
+            return self._finish_job(job, total)
+
+        def on_error(stage, job, error):
+            job["error"] = error
+            self._finish_job(job, total)
+
+        queue_size = BatchConfig.STAGE_QUEUE_SIZE
+        pipeline = StagedPipeline([
+            Stage("plan", plan, self.stage_workers["plan"], queue_size),
+            Stage("search", search, self.stage_workers["search"], queue_size),
+            Stage("synthesize", synthesize, self.stage_workers["synthesize"], queue_size),
+        ], on_error=on_error)
+        pipeline.run(self._start_job(topic) for topic in topics)
+        return pipeline.metrics()
+
+    def _start_job(self, topic):
+        session = self.sessions.latest(topic) if self.refresh else None
+        return {"topic": topic, "started": time.perf_counter(), "tracer": Tracer(name=topic), "session": session}
+
+    def _write_report(self, job, result):
+        if not result.get("search_results"):
+            # Planning failed; leave no report so the topic is retried on resume
+            raise RuntimeError(result.get("final_answer", "No search results"))
+        report_path = self.report_path(job["topic"])
+        tracer = job["tracer"]
+        # Write to a temporary file first so an interrupted run never leaves
+        # a partial report that would be skipped on resume
+        tmp_path = report_path + ".tmp"
+        with tracer.span("report"):
+            generate_html_report(result, filepath=tmp_path, index=False)
+        os.replace(tmp_path, report_path)
+        with tracer.span("report_index"):
+            # Replaced reports are rewritten into the index page once, at the end of the run
+            index_report(report_path, result, refresh_page=False)
+        if ReportConfig.SAVE_TRACE:
+            tracer.write(os.path.splitext(report_path)[0] + ".trace.json")
+        job["num_queries"] = len(result.get("search_results", []))
+        if "refreshed" in result:
+            job["refreshed"] = result["refreshed"]
+        if "search_policy" in result:
+            # Per-query decisions stay in the trace; the index only keeps the totals
+            job["search_policy"] = {
+                key: result["search_policy"][key] for key in ("searched", "escalated", "skipped", "credits_used")
+            }
+        if self.sessions is not None:
+            session = job["session"]
+            job["session_id"] = self.sessions.save(
+                result, model=self.agent.llm.model, report=report_path, parent_id=session["id"] if session else None
+            )
+
+    def _finish_job(self, job, total):
+        topic = job["topic"]
+        entry = {"topic": topic, "report": os.path.basename(self.report_path(topic))}
+        if "error" in job:
+            entry["status"] = "failed"
+            entry["error"] = str(job["error"])
+        else:
+            entry["status"] = "completed"
+            entry["num_queries"] = job["num_queries"]
+            for field in ("session_id", "refreshed", "search_policy"):
+                if field in job:
+                    entry[field] = job[field]
+        entry["duration_seconds"] = round(time.perf_counter() - job["started"], 2)
+        entry["finished_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+
+        with self._lock:
+            self._index[topic] = entry
+            if entry["status"] == "completed":
+                self._completed += 1
+                self._traces.append(job["tracer"].to_dict())
+            self._finished += 1
+            elapsed = time.perf_counter() - self._start_time
+            rate = self._completed / elapsed * 3600 if elapsed > 0 else 0.0
+            print(
+                f"[Batch {self._finished}/{total}] {entry['status']}: {topic} "
+                f"({entry['duration_seconds']}s) - {rate:.1f} topics/hour"
+            )
+            self._write_index()
+        return entry
+
+    def _load_index(self):
+        path = os.path.join(self.output_dir, INDEX_FILENAME)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return {entry["topic"]: entry for entry in json.load(f).get("topics", [])}
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _write_index(self):
+        self._write_json(INDEX_FILENAME, {
+            "updated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "topics": list(self._index.values()),
+        })
+
+    def _write_json(self, filename, data):
+        path = os.path.join(self.output_dir, filename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
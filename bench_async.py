@@ -0,0 +1,95 @@
+"""
+Load test for concurrent research sessions: DeepResearchAgent.arun on one
+event loop versus run() on a thread per session, against local stub servers.
+
+Every session plans, searches and streams an answer with the given stub
+latencies, so throughput shows how well sessions overlap their waiting.
+
+Usage:
+    python bench_async.py [--sessions 10 50 200] [--search-latency 0.2] [--token-delay 0.005]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from agent import DeepResearchAgent
+from http_session import create_session
+from llm_client import AsyncOllamaClient, OllamaClient
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import AsyncTavilyClient, TavilyClient
+
+def _client_threads():
+    # Threads of the agent and clients, not those serving the stub servers
+    return sum(1 for thread in threading.enumerate() if "process_request_thread" not in thread.name)
+
+def _run_threads(ollama, tavily, sessions):
+    # One pooled connection per session, so the pool is not the bottleneck
+    session = create_session(pool_size=sessions)
+    agent = DeepResearchAgent(
+        llm=OllamaClient(base_url=ollama.generate_url, session=session),
+        tavily=TavilyClient(api_key="tvly-bench", base_url=tavily.search_url, session=session),
+    )
+    peak_threads = _client_threads()
+    start = time.perf_counter()
+    # run() prints its progress; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=sessions) as executor:
+        futures = [executor.submit(agent.run, f"topic {i}") for i in range(sessions)]
+        while not all(future.done() for future in futures):
+            peak_threads = max(peak_threads, _client_threads())
+            time.sleep(0.01)
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - start, peak_threads
+
+def _run_async(ollama, tavily, sessions):
+    peak_threads = _client_threads()
+
+    async def watch():
+        nonlocal peak_threads
+        while True:
+            peak_threads = max(peak_threads, _client_threads())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        async with AsyncOllamaClient(base_url=ollama.generate_url) as llm, \
+                AsyncTavilyClient(api_key="tvly-bench", base_url=tavily.search_url) as search:
+            agent = DeepResearchAgent(llm=llm, tavily=search)
+            watcher = asyncio.ensure_future(watch())
+            start = time.perf_counter()
+            results = await asyncio.gather(*(agent.arun(f"topic {i}") for i in range(sessions)))
+            elapsed = time.perf_counter() - start
+            watcher.cancel()
+            return results, elapsed
+
+    results, elapsed = asyncio.run(main())
+    return results, elapsed, peak_threads
+
+def _line(name, sessions, results, elapsed, peak_threads):
+    failed = sum(1 for result in results if "synthesized answer" not in result["final_answer"])
+    return (
+        f"{name:<8} {sessions:>5} sessions  {elapsed:7.2f}s  {sessions / elapsed:8.1f} sessions/s  "
+        f"peak threads {peak_threads:>4}  failed {failed}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent research session load test")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 200], help="Concurrent sessions per step")
+    parser.add_argument("--search-latency", type=float, default=0.2, help="Stub Tavily latency in seconds")
+    parser.add_argument("--first-token-delay", type=float, default=0.1, help="Stub Ollama prefill in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Stub Ollama per-token delay in seconds")
+    args = parser.parse_args()
+
+    with FakeOllamaServer(first_token_delay=args.first_token_delay, token_delay=args.token_delay) as ollama, \
+            FakeTavilyServer(latency=args.search_latency, raw_content_size=3000) as tavily:
+        print(
+            f"Stub latencies: search {args.search_latency}s, first token {args.first_token_delay}s, "
+            f"{args.token_delay}s per token"
+        )
+        for sessions in args.sessions:
+            print(_line("threads", sessions, *_run_threads(ollama, tavily, sessions)))
+            print(_line("asyncio", sessions, *_run_async(ollama, tavily, sessions)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Compares per-call latency of pooled keep-alive sessions against one-off
+requests.post calls, using a local stub Tavily server.
+
+Usage:
+    python bench_http_pool.py [--calls 200]
+"""
+import argparse
+import statistics
+import time
+import requests
+from http_session import create_session
+from stub_servers import FakeTavilyServer
+
+def _measure(post, url, calls):
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        response = post(url, json={"query": f"bench {i}", "max_results": 1}, timeout=5)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def _summary(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return f"{name:<10} mean {statistics.mean(latencies):7.3f} ms   p50 {statistics.median(latencies):7.3f} ms   p95 {p95:7.3f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP connection pool benchmark")
+    parser.add_argument("--calls", type=int, default=200, help="Requests per variant")
+    args = parser.parse_args()
+
+    with FakeTavilyServer(results_per_query=1) as server:
+        url = server.search_url
+        unpooled = _measure(requests.post, url, args.calls)
+        session = create_session()
+        pooled = _measure(session.post, url, args.calls)
+
+    print(f"{args.calls} calls per variant against {url}")
+    print(_summary("unpooled", unpooled))
+    print(_summary("pooled", pooled))
+    print(f"Speedup (mean): {statistics.mean(unpooled) / statistics.mean(pooled):.2f}x")
+
+if __name__ == "__main__":
+    main()
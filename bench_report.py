@@ -0,0 +1,123 @@
+"""
+Measures HTML report generation time and peak memory on a large synthetic
+report, comparing the streaming ReportWriter with the previous
+string-concatenation implementation.
+
+Usage:
+    python bench_report.py [--results 10000] [--raw-size 2000]
+"""
+import argparse
+import datetime
+import html
+import os
+import tempfile
+import time
+import tracemalloc
+from report_generator import generate_html_report
+from stub_servers import _synthetic_text
+
+def legacy_generate_html_report(data, filepath):
+    """
+    The pre-streaming report body: one string grown with += per result row.
+    Answer rendering is omitted as it is identical in both versions; fields are
+    escaped like the streaming writer does so only the write strategy differs.
+    """
+    escape = html.escape
+    query = data.get("query", "Unknown Query")
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head><title>Research Report: {query}</title></head>
+    <body>
+        <h1>Deep Research Report</h1>
+        <div class="section">
+            <h2>Raw Search Results</h2>
+            <table>
+                <tbody>
+    """
+    for res in data.get("search_results", []):
+        if "results" in res:
+            for item in res["results"]:
+                title = escape(item.get("title", "No Title"))
+                url = escape(item.get("url", "#"))
+                content = escape(item.get("content", "No Content"))
+                raw_content = escape(item.get("raw_content", ""))
+
+                html_content += f"""
+                    <tr>
+                        <td>
+                            <strong>{title}</strong><br>
+                            <a href="{url}" class="source-url" target="_blank">{url}</a>
+                        </td>
+                        <td>{content}<pre>{raw_content}</pre></td>
+                    </tr>
+                """
+    html_content += """
+                </tbody>
+            </table>
+        </div>
+        <div class="footer">
+            <p>Generated by Deep Research Agent on """ + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + """</p>
+        </div>
+    </body>
+    </html>
+    """
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(html_content)
+    return filepath
+
+def synthetic_report(num_results, raw_size, per_query=10):
+    filler = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+    search_results = []
+    for q in range(num_results // per_query):
+        search_results.append({
+            "query": f"query {q}",
+            "results": [
+                {
+                    "title": f"Result {q}-{i}",
+                    "url": f"https://example.com/{q}/{i}",
+                    "content": f"Snippet for result {q}-{i}. " + filler,
+                    # Distinct pages, so the report's duplicate collapsing keeps every row
+                    "raw_content": _synthetic_text(f"{q}|{i}", raw_size),
+                }
+                for i in range(per_query)
+            ],
+        })
+    return {"query": "Synthetic benchmark report", "search_results": search_results, "final_answer": "**Answer**"}
+
+def measure(fn, data, filepath, repeat=3):
+    """
+    Returns (best time, peak traced memory, file size). Memory is measured in a
+    separate run since tracemalloc slows allocation-heavy code down.
+    """
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data, filepath=filepath)
+        elapsed.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(data, filepath=filepath)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(elapsed), peak, os.path.getsize(filepath)
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML report generation benchmark")
+    parser.add_argument("--results", type=int, default=10000, help="Number of search results in the report")
+    parser.add_argument("--raw-size", type=int, default=2000, help="Characters of raw content per result")
+    args = parser.parse_args()
+
+    data = synthetic_report(args.results, args.raw_size)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rows = [
+            ("legacy (+=)", measure(legacy_generate_html_report, data, os.path.join(tmp_dir, "legacy.html"))),
+            ("streaming", measure(generate_html_report, data, os.path.join(tmp_dir, "streaming.html"))),
+        ]
+
+    print(f"{args.results} results, {args.raw_size} chars of raw content each")
+    print(f"{'writer':<12} {'time (s)':>9} {'peak MB':>9} {'file MB':>9}")
+    for name, (elapsed, peak, size) in rows:
+        print(f"{name:<12} {elapsed:>9.3f} {peak / 2**20:>9.1f} {size / 2**20:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measures the report index (report_index.ReportIndex): the cost of adding
+one report as the index grows, and full-text search latency over all of
+them. Synthetic sidecars are indexed into a temporary directory.
+
+Usage:
+    python bench_report_index.py [--reports 20000] [--answer-words 400]
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+from report_index import ReportIndex
+from stub_servers import _synthetic_text
+
+# Common words of the synthetic answers, a rare topic, a term in every source list and a missing one
+SEARCHES = ["energy policy", "forecast signal sample", "topic 123", "example.com", "nonexistentterm"]
+
+def synthetic_sidecar(i, answer_words):
+    topic = f"topic {i}"
+    return {
+        "report": f"research_report_{i}.html",
+        "query": f"Research on {topic}",
+        "created_at": datetime.datetime(2026, 1, 1).isoformat(),
+        "answer": _synthetic_text(f"{topic}|answer", answer_words * 6),
+        "sources": [
+            {"title": f"{topic} source {n}", "url": f"https://example.com/{i}/{n}", "queries": [topic]}
+            for n in range(10)
+        ],
+        "timings": {"total_time": random.uniform(20, 120), "stages": {}},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Report index benchmark")
+    parser.add_argument("--reports", type=int, default=20000, help="Reports to index")
+    parser.add_argument("--answer-words", type=int, default=400, help="Approximate answer length")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = ReportIndex(os.path.join(directory, "index.sqlite3"), os.path.join(directory, "index.html"))
+        add_ms = []
+        start = time.perf_counter()
+        for i in range(args.reports):
+            sidecar = synthetic_sidecar(i, args.answer_words)
+            added = time.perf_counter()
+            index.add(os.path.join(directory, sidecar["report"]), sidecar)
+            add_ms.append((time.perf_counter() - added) * 1000)
+        elapsed = time.perf_counter() - start
+
+        tail = add_ms[-min(1000, len(add_ms)):]
+        print(f"Indexed {args.reports} reports in {elapsed:.1f}s")
+        print(
+            f"Add one report: median {statistics.median(add_ms):.2f} ms overall, "
+            f"{statistics.median(tail):.2f} ms for the last {len(tail)}"
+        )
+        print(
+            f"Index {os.path.getsize(index.path) / 2**20:.1f} MB, "
+            f"index page {os.path.getsize(index.page_path) / 2**20:.1f} MB"
+        )
+        for text in SEARCHES:
+            times = []
+            for _ in range(5):
+                searched = time.perf_counter()
+                matches = index.search(text)
+                times.append((time.perf_counter() - searched) * 1000)
+            print(f"Search {text!r:<26} {len(matches):>3} matches  median {statistics.median(times):7.2f} ms")
+        index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Measures how fast the retrieval index (retrieval.ChunkIndex) cleans, chunks
+and indexes full-page content, and how much memory it holds.
+
+Usage:
+    python bench_retrieval.py [--pages 2000] [--page-size 20000]
+"""
+import argparse
+import time
+import tracemalloc
+from retrieval import ChunkIndex
+from stub_servers import FakeTavilyServer
+
+def synthetic_pages(num_pages, page_size):
+    server = FakeTavilyServer(raw_content_size=page_size)
+    pages = []
+    for i in range(num_pages):
+        query = f"topic {i % 50}"
+        raw = server._raw_content(query, i)
+        pages.append({
+            "title": f"{query} page {i}",
+            "url": f"https://example.com/{i}",
+            "raw_content": f"<html><body><nav>Home | About</nav><p>{raw}</p><script>track({i})</script></body></html>",
+        })
+    return pages
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval index benchmark")
+    parser.add_argument("--pages", type=int, default=2000, help="Pages to index")
+    parser.add_argument("--page-size", type=int, default=20000, help="Characters of page text per page")
+    parser.add_argument("--queries", type=int, default=10, help="Queries to run against the index")
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages, args.page_size)
+    total_mb = sum(len(page["raw_content"]) for page in pages) / 2**20
+
+    index = ChunkIndex()
+    start = time.perf_counter()
+    for page in pages:
+        index.add_page(page)
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.queries):
+        index.retrieve([f"topic {i} background figures", f"sources for topic {i % 7}"], 5)
+    query_time = (time.perf_counter() - start) / args.queries
+
+    # Memory is measured in a separate pass since tracemalloc slows indexing down
+    tracemalloc.start()
+    index = ChunkIndex()
+    for page in pages:
+        index.add_page(page)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{args.pages} pages, {total_mb:.1f} MB of raw content")
+    print(f"indexed {len(index.chunks)} chunks in {index_time:.2f}s ({args.pages / index_time:.0f} pages/s)")
+    print(f"retrieval: {query_time * 1000:.1f} ms per query set")
+    print(f"index memory: {current / 2**20:.1f} MB (peak {peak / 2**20:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+CLI startup benchmark based on `python -X importtime`.
+
+Measures the modules `main.py --help` imports on top of a bare interpreter,
+how long importing them takes and the wall time of the whole command
+(median over several runs). For comparison it also measures importing
+everything a research run needs.
+
+Exits with status 1 when the median import time of `--help` exceeds
+--max-ms, or when `--help` loads any module from HEAVY_MODULES, so it can
+guard CI against startup regressions.
+
+Usage:
+    python bench_startup.py [--runs 5] [--max-ms 25]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules only a research run needs; `main.py --help` must not load them
+HEAVY_MODULES = (
+    "agent", "batch_runner", "report_generator", "llm_client", "tavily_client",
+    "requests", "markdown", "asyncio", "sqlite3",
+)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def parse_importtime(stderr):
+    """
+    Returns the top-level imports in `python -X importtime` output.
+
+    Returns:
+        dict: Module name -> cumulative import time in microseconds,
+            including the modules it imported.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # The header line
+        # Nested imports are indented by two spaces per level
+        if len(name) - len(name.lstrip()) == 1:
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+def profile(python_args):
+    """
+    Runs the interpreter once with -X importtime.
+
+    Returns:
+        tuple: (dict of top-level imports, see parse_importtime, wall seconds).
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", *python_args],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    return parse_importtime(completed.stderr), time.perf_counter() - start
+
+def measure(python_args, runs=5):
+    """
+    Measures the imports of a command beyond those of a bare interpreter.
+
+    Returns:
+        dict: 'import_ms' and 'wall_ms' (medians), 'modules' (the extra
+            top-level modules with their median import ms, slowest first)
+            and 'heavy' (the HEAVY_MODULES among them).
+    """
+    baseline, _ = profile(["-c", "pass"])
+    import_times = []
+    wall_times = []
+    per_module = {}
+    for _ in range(max(1, runs)):
+        modules, wall = profile(python_args)
+        extra = {name: us for name, us in modules.items() if name not in baseline}
+        import_times.append(sum(extra.values()) / 1000)
+        wall_times.append(wall * 1000)
+        for name, us in extra.items():
+            per_module.setdefault(name, []).append(us / 1000)
+    modules = sorted(
+        ((name, statistics.median(times)) for name, times in per_module.items()), key=lambda m: m[1], reverse=True
+    )
+    # A nested import of a heavy module still shows up at the top level once
+    heavy = [name for name in per_module if name.split(".")[0] in HEAVY_MODULES]
+    return {
+        "import_ms": round(statistics.median(import_times), 2),
+        "wall_ms": round(statistics.median(wall_times), 2),
+        "modules": [(name, round(ms, 2)) for name, ms in modules],
+        "heavy": sorted(heavy),
+    }
+
+def _print(label, result, top=5):
+    print(f"{label:<12} imports {result['import_ms']:8.2f} ms  wall {result['wall_ms']:8.2f} ms")
+    for name, ms in result["modules"][:top]:
+        print(f"    {name:<28} {ms:8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement; medians are reported")
+    parser.add_argument("--max-ms", type=float, default=25.0, help="Fail if `main.py --help` imports take longer")
+    args = parser.parse_args()
+
+    help_result = measure(["main.py", "--help"], runs=args.runs)
+    full_result = measure(["-c", "import main, agent, batch_runner, report_generator"], runs=args.runs)
+    _print("--help", help_result)
+    _print("full run", full_result)
+
+    failed = False
+    if help_result["heavy"]:
+        print(f"FAIL: --help imports {', '.join(help_result['heavy'])}")
+        failed = True
+    if help_result["import_ms"] > args.max_ms:
+        print(f"FAIL: --help imports take {help_result['import_ms']} ms (threshold {args.max_ms} ms)")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+End-to-end latency of single-shot versus map-reduce synthesis (see
+SynthesisConfig) against local stub servers, for a growing number of search
+queries.
+
+The stub Ollama server charges prefill per prompt token and decoding per
+generated token, and serves up to --slots requests at once, like Ollama with
+OLLAMA_NUM_PARALLEL (or several hosts behind llm_router). Besides latency,
+each row shows how many sources reached the LLM: single-shot packs what fits
+one context window, map-reduce packs up to a context window per query.
+
+Usage:
+    python bench_synthesis.py [--queries 2 4 8 16] [--slots 4] [--map-workers 4] [--prefill-ms 0.5] [--decode-ms 5]
+"""
+import argparse
+import contextlib
+import io
+import json
+import re
+import time
+from agent import DeepResearchAgent
+from config import SynthesisConfig
+from llm_client import OllamaClient
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+# Distinct enough that query dedup merges none of them
+TOPICS = [
+    "bleaching", "acidification", "fisheries", "tourism", "mangroves", "sediment", "algae", "temperature",
+    "restoration", "genetics", "pollution", "storms", "economics", "policy", "monitoring", "microbiome",
+]
+
+def make_responder(num_queries, answer_words):
+    queries = [f"coral reef {TOPICS[i % len(TOPICS)]} {i // len(TOPICS) or ''}".strip() for i in range(num_queries)]
+
+    def responder(payload):
+        system = payload.get("system", "")
+        if "search queries" in system:
+            return json.dumps(queries)
+        if "Summarize the facts" in system:
+            url = re.search(r"URL: (\S+)", payload["prompt"]).group(1)
+            return " ".join(["fact"] * SynthesisConfig.SUMMARY_WORDS) + f" [{url}]"
+        return "<think>\nCombining.\n</think>\n" + " ".join(["answer"] * answer_words)
+
+    return responder
+
+def run_once(ollama, tavily, mode, slots):
+    agent = DeepResearchAgent(
+        llm=OllamaClient(base_url=ollama.generate_url, max_concurrency=slots),
+        tavily=TavilyClient(api_key="tvly-bench", base_url=tavily.search_url),
+        synthesis_mode=mode,
+    )
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = agent.run("coral reefs")
+    elapsed = time.perf_counter() - start
+
+    spans = result["trace"]["spans"]
+    synthesize = next(span for span in spans if span["name"] == "synthesize")
+    if mode == "map_reduce":
+        sources = sum(span["context"]["packed"] for span in spans if span["name"] == "summarize")
+    else:
+        sources = synthesize["context"]["packed"]
+    return {
+        "total": elapsed,
+        "synthesize": synthesize["duration"],
+        "prompt_tokens": synthesize.get("prompt_eval_count", 0),
+        "sources": sources,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-shot vs map-reduce synthesis benchmark")
+    parser.add_argument("--queries", type=int, nargs="+", default=[2, 4, 8, 16], help="Search queries per run")
+    parser.add_argument("--results", type=int, default=5, help="Results per search query")
+    parser.add_argument("--slots", type=int, default=4, help="Requests the stub LLM serves at once")
+    parser.add_argument("--prefill-ms", type=float, default=0.5, help="Stub prefill milliseconds per prompt token")
+    parser.add_argument("--decode-ms", type=float, default=5.0, help="Stub milliseconds per generated token")
+    parser.add_argument("--map-workers", type=int, default=None, help="Overrides SynthesisConfig.MAP_WORKERS")
+    parser.add_argument("--answer-words", type=int, default=300, help="Length of the final answer")
+    args = parser.parse_args()
+    if args.map_workers:
+        SynthesisConfig.MAP_WORKERS = args.map_workers
+
+    print(
+        f"Stub LLM: {args.prefill_ms} ms per prompt token, {args.decode_ms} ms per generated token, "
+        f"{args.slots} slots; {args.results} results per query, map workers {SynthesisConfig.MAP_WORKERS}"
+    )
+    print(f"{'queries':>7}  {'mode':<10} {'total':>8} {'synthesize':>11} {'final prompt':>13} {'sources':>8}")
+    for num_queries in args.queries:
+        with FakeOllamaServer(
+            responder=make_responder(num_queries, args.answer_words),
+            prompt_token_delay=args.prefill_ms / 1000,
+            token_delay=args.decode_ms / 1000,
+        ) as ollama, FakeTavilyServer(raw_content_size=3000, results_per_query=args.results) as tavily:
+            for mode in ("single", "map_reduce"):
+                row = run_once(ollama, tavily, mode, args.slots)
+                print(
+                    f"{num_queries:>7}  {mode:<10} {row['total']:7.2f}s {row['synthesize']:10.2f}s "
+                    f"{row['prompt_tokens']:>13} {row['sources']:>8}"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Offline end-to-end benchmark for the research pipeline.
+
+Runs DeepResearchAgent.run and generate_html_report against local stub
+Ollama and Tavily servers with configurable latency, so performance can be
+measured without network access or API quota. Each scenario is repeated and
+reported as throughput, p50/p95 latency and peak Python memory. Results are
+appended to a JSONL history file and compared with the previous run.
+
+Usage:
+    python benchmark.py                          # all synthetic scenarios
+    python benchmark.py --scenario small --repeat 10
+    python benchmark.py --fixture fixtures/benchmark_sample.json
+    python benchmark.py --record my_fixture.json "Some topic"   # needs live services
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from agent import DeepResearchAgent
+from http_session import create_session
+from llm_client import OllamaClient
+from report_generator import generate_html_report
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+from tracing import percentile
+
+DEFAULT_HISTORY = os.path.join("bench_results", "history.jsonl")
+
+# Latencies are in seconds and model a fast local network and a mid-size GPU
+SCENARIOS = {
+    "small": {
+        "queries": 3, "results_per_query": 5, "content_size": 300, "raw_content_size": 3000,
+        "search_latency": 0.05, "first_token_delay": 0.05, "token_delay": 0.001, "answer_words": 200,
+    },
+    "medium": {
+        "queries": 6, "results_per_query": 10, "content_size": 800, "raw_content_size": 10000,
+        "search_latency": 0.1, "first_token_delay": 0.1, "token_delay": 0.001, "answer_words": 600,
+    },
+    "large": {
+        "queries": 10, "results_per_query": 10, "content_size": 3000, "raw_content_size": 30000,
+        "search_latency": 0.2, "first_token_delay": 0.2, "token_delay": 0.001, "answer_words": 1500,
+    },
+}
+
+def _synthetic_responder(scenario):
+    queries = [f"benchmark query {i + 1}" for i in range(scenario["queries"])]
+    plan = "<think>\nBreaking the topic down.\n</think>\n" + json.dumps(queries)
+    answer = "<think>\nWeighing the sources.\n</think>\n" + " ".join(
+        f"word{i}" + (" [1]." if i % 25 == 24 else "") for i in range(scenario["answer_words"])
+    )
+    return _responder(plan, answer)
+
+def _responder(plan, answer):
+    def respond(payload):
+        if "search queries" in payload.get("system", ""):
+            return plan
+        return answer
+    return respond
+
+def load_fixture(path):
+    """
+    Loads a recorded run: {"plan": str, "answer": str, "search_responses": {query: response}}.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        fixture = json.load(f)
+    for key in ("plan", "answer", "search_responses"):
+        if key not in fixture:
+            raise ValueError(f"{path}: missing '{key}'")
+    return fixture
+
+def run_scenario(name, scenario, repeat, fixture=None):
+    """
+    Runs one scenario `repeat` times and returns its metrics.
+    """
+    if fixture:
+        responder = _responder(fixture["plan"], fixture["answer"])
+        tavily_server = FakeTavilyServer(latency=scenario["search_latency"], responses=fixture["search_responses"])
+    else:
+        responder = _synthetic_responder(scenario)
+        tavily_server = FakeTavilyServer(
+            latency=scenario["search_latency"],
+            results_per_query=scenario["results_per_query"],
+            content_size=scenario["content_size"],
+            raw_content_size=scenario.get("raw_content_size"),
+        )
+    ollama_server = FakeOllamaServer(
+        responder=responder,
+        first_token_delay=scenario["first_token_delay"],
+        token_delay=scenario["token_delay"],
+    )
+
+    latencies = []
+    report_times = []
+    peak_memory = 0
+    with ollama_server, tavily_server, tempfile.TemporaryDirectory() as tmp_dir:
+        session = create_session()
+        agent = DeepResearchAgent(
+            llm=OllamaClient(base_url=ollama_server.generate_url, session=session),
+            tavily=TavilyClient(api_key="tvly-benchmark", base_url=tavily_server.search_url, session=session),
+        )
+        # Warm-up run so one-off costs (lazy imports, first connections) are not measured
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_html_report(agent.run("warm-up topic"), filepath=os.path.join(tmp_dir, "warmup.html"))
+
+        started = time.perf_counter()
+        for i in range(repeat):
+            tracemalloc.start()
+            run_start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = agent.run(f"benchmark topic {i}")
+                report_start = time.perf_counter()
+                generate_html_report(result, filepath=os.path.join(tmp_dir, f"report_{i}.html"))
+            run_end = time.perf_counter()
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            latencies.append(run_end - run_start)
+            report_times.append(run_end - report_start)
+        total = time.perf_counter() - started
+
+    return {
+        "scenario": name,
+        "fixture": bool(fixture),
+        "repeat": repeat,
+        "params": scenario,
+        "runs_per_minute": round(repeat / total * 60, 2),
+        "p50": round(percentile(latencies, 50), 4),
+        "p95": round(percentile(latencies, 95), 4),
+        "report_p50": round(percentile(report_times, 50), 4),
+        "peak_memory_mb": round(peak_memory / (1024 * 1024), 2),
+    }
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def append_history(path, entries):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+def _delta(current, previous):
+    if not previous:
+        return ""
+    return f" ({(current - previous) / previous * 100:+.1f}%)"
+
+def print_results(results, history):
+    previous = {}
+    for entry in history:
+        previous[(entry["scenario"], entry.get("fixture", False))] = entry
+
+    width = max([len("scenario")] + [len(result["scenario"]) for result in results])
+    print(f"{'scenario':<{width}} {'runs/min':>10} {'p50 (s)':>16} {'p95 (s)':>16} {'report p50':>11} {'peak MB':>16}")
+    for result in results:
+        prev = previous.get((result["scenario"], result["fixture"]), {})
+        print(
+            f"{result['scenario']:<{width}} {result['runs_per_minute']:>10.1f} "
+            f"{result['p50']:>7.3f}{_delta(result['p50'], prev.get('p50')):>9} "
+            f"{result['p95']:>7.3f}{_delta(result['p95'], prev.get('p95')):>9} "
+            f"{result['report_p50']:>11.4f} "
+            f"{result['peak_memory_mb']:>7.2f}{_delta(result['peak_memory_mb'], prev.get('peak_memory_mb')):>9}"
+        )
+    if previous:
+        print("Percentages compare against the previous run of each scenario in the history file.")
+
+def record_fixture(path, topic):
+    """
+    Runs a topic against the live Ollama and Tavily services and saves the
+    responses as a replayable fixture.
+    """
+    result = DeepResearchAgent().run(topic)
+    responses = {res.get("query"): res for res in result["search_results"] if res.get("query")}
+    fixture = {
+        "topic": topic,
+        "plan": json.dumps(list(responses)),
+        "answer": result["final_answer"],
+        "search_responses": responses,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, ensure_ascii=False, indent=2)
+    print(f"Fixture recorded: {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the Deep Research Agent pipeline")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS) + ["all"], default="all", help="Synthetic scenario to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per scenario")
+    parser.add_argument("--fixture", help="Replay a recorded fixture instead of synthetic responses")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSONL file that stores results across runs")
+    parser.add_argument("--no-save", action="store_true", help="Do not append results to the history file")
+    parser.add_argument("--record", metavar="FILE", help="Record a fixture from live services for TOPIC")
+    parser.add_argument("topic", nargs="?", help="Topic to record (with --record)")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.topic:
+            parser.error("--record needs a topic")
+        record_fixture(args.record, args.topic)
+        return
+
+    if args.fixture:
+        scenarios = {os.path.basename(args.fixture): dict(SCENARIOS["medium"])}
+        fixture = load_fixture(args.fixture)
+    else:
+        names = sorted(SCENARIOS) if args.scenario == "all" else [args.scenario]
+        scenarios = {name: SCENARIOS[name] for name in names}
+        fixture = None
+
+    results = [run_scenario(name, scenario, args.repeat, fixture) for name, scenario in scenarios.items()]
+
+    history = load_history(args.history)
+    print_results(results, history)
+
+    if not args.no_save:
+        meta = {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "revision": _git_revision()}
+        append_history(args.history, [dict(meta, **result) for result in results])
+        print(f"Results appended to {args.history}")
+
+if __name__ == "__main__":
+    main()
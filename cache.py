@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from config import CacheConfig
+
+def normalize_query(query):
+    """
+    Normalizes a search query so trivially different spellings share a cache entry.
+    """
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = re.sub(r"\s+", " ", query)
+    return query.strip(" \t\n?!.")
+
+def make_key(*parts):
+    """
+    Builds a stable cache key from JSON-serializable parts.
+    """
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    A persistent key/value cache backed by SQLite.
+
+    Values are stored as JSON. Entries expire after `ttl` seconds and the least
+    recently used entries are evicted once the cache holds more than `max_entries`
+    or its stored values take more than `max_bytes`.
+    The cache is safe to share between threads.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        ttl (float): Seconds before an entry expires. None disables expiry.
+        max_entries (int): Upper bound on the number of stored entries.
+        refresh (bool): Ignore existing entries on lookup but still store new ones.
+        max_bytes (int, optional): Upper bound on the total size of the stored
+            values (UTF-8 JSON). None leaves only the entry count bound.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=1000, refresh=False, max_bytes=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(entries)")}
+        if "label" not in columns:
+            # Caches created before labels existed
+            self._conn.execute("ALTER TABLE entries ADD COLUMN label TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_label ON entries (label)")
+        if "size" not in columns:
+            # Caches created before the byte bound existed
+            self._conn.execute("ALTER TABLE entries ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE entries SET size = length(CAST(value AS BLOB))")
+        # Covers the LRU order and the sizes, so the byte total never reads the values
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (accessed_at, size)")
+        self._conn.commit()
+
+    def get(self, key):
+        """
+        Returns the cached value for `key`, or None on a miss or expired entry.
+        """
+        with self._lock:
+            if self.refresh:
+                self.misses += 1
+                return None
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value, label=None):
+        """
+        Stores `value` under `key` and evicts least recently used entries if needed.
+        An optional human-readable label (e.g. the query) can be listed with labels().
+        """
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at, label, size)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, data, now, now, label, len(data.encode("utf-8"))),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY accessed_at ASC LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            if self.max_bytes is not None:
+                self._evict_bytes()
+            self._conn.commit()
+
+    def _evict_bytes(self):
+        excess = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC"):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def labels(self):
+        """
+        Returns the distinct labels of all unexpired, labelled entries.
+        """
+        with self._lock:
+            if self.refresh:
+                return []
+            rows = self._conn.execute(
+                "SELECT DISTINCT label FROM entries WHERE label IS NOT NULL AND created_at >= ?",
+                (self._min_created(),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def has_label(self, label):
+        """
+        Returns whether an unexpired entry still carries the label (entries
+        are removed when they expire or are evicted).
+        """
+        with self._lock:
+            if self.refresh:
+                return False
+            row = self._conn.execute(
+                "SELECT 1 FROM entries WHERE label = ? AND created_at >= ? LIMIT 1", (label, self._min_created())
+            ).fetchone()
+        return row is not None
+
+    def _min_created(self):
+        return time.time() - self.ttl if self.ttl is not None else 0
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss/eviction counters for this process.
+        """
+        with self._lock:
+            size, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": size,
+                "bytes": total}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def create_search_cache(refresh=False):
+    """
+    Creates the Tavily search cache configured in CacheConfig.
+    """
+    return ResultCache(
+        CacheConfig.SEARCH_CACHE_PATH,
+        ttl=CacheConfig.SEARCH_CACHE_TTL,
+        max_entries=CacheConfig.SEARCH_CACHE_MAX_ENTRIES,
+        refresh=refresh,
+        max_bytes=CacheConfig.SEARCH_CACHE_MAX_BYTES,
+    )
+
+def create_llm_cache(refresh=False):
+    """
+    Creates the LLM response and plan cache configured in CacheConfig.
+    """
+    return ResultCache(
+        CacheConfig.LLM_CACHE_PATH,
+        ttl=CacheConfig.LLM_CACHE_TTL,
+        max_entries=CacheConfig.LLM_CACHE_MAX_ENTRIES,
+        refresh=refresh,
+    )
@@ -16,9 +16,27 @@ class TavilyConfig:
     
     # Advanced parameters
     INCLUDE_ANSWER = True
-    INCLUDE_RAW_CONTENT = False
+    INCLUDE_RAW_CONTENT = True  # Full page text, only indexed locally (see RetrievalConfig); never rendered or stored in sessions
     INCLUDE_IMAGES = False
 
+    # Concurrency
+    MAX_CONCURRENT_SEARCHES = 5  # Parallel Tavily requests per research run
+    SEARCH_TIMEOUT = 30  # Wall-clock deadline per search call in seconds, retries and slow responses included
+
+class AdaptiveSearchConfig:
+    # Adaptive search (main.py --adaptive): every query starts as a basic search
+    # with few results; only queries whose results score low on relevance or
+    # coverage are searched again at advanced depth with more results, while
+    # the run's credit and latency budgets allow (search_policy.py)
+    ENABLED = False
+    BASIC_MAX_RESULTS = 5
+    ADVANCED_MAX_RESULTS = 10
+    MIN_TOP_SCORE = 0.5  # Escalate when the best Tavily relevance score (0-1) is lower
+    MIN_RESULTS = 3  # Escalate when fewer results come back
+    MIN_COVERAGE = 0.6  # Escalate when the results mention a smaller share of the query's terms
+    CREDIT_BUDGET = 20  # Tavily API credits per run (basic search = 1, advanced = 2)
+    LATENCY_BUDGET = 30  # Seconds after the first search; no query is escalated later
+
 class LLMConfig:
     # Available Models
     MODEL_LOCAL = "deepseek-r1:8b"
@@ -30,6 +48,122 @@ class LLMConfig:
     BASE_URL = "http://localhost:11434/api/generate"
     TEMPERATURE = 0.6
     CONTEXT_WINDOW = 8192
+    ANSWER_TOKEN_RESERVE = 3072  # Context window tokens kept free for the <think> block and answer
+    REQUEST_TIMEOUT = 600  # Read timeout in seconds for a single generation
+    SEED = None  # Fixed sampling seed; with a seed or TEMPERATURE 0 generations are reproducible
+    PLANNING_MODEL = None  # Model used to plan search queries, e.g. a small local one; None = MODEL_NAME
+
+    # Several Ollama hosts (llm_router.OllamaRouter). Empty = BASE_URL only.
+    # Each entry: {"url": ".../api/generate", "weight": 1, "max_concurrency": None, "models": []}
+    # where "models" lists the models a host serves ([] = any).
+    ENDPOINTS = []
+    ROUTING_POLICY = "least_outstanding"  # "least_outstanding", "weighted" or "affinity"
+    ENDPOINT_COOLDOWN = 30  # Seconds a failed host is skipped before it is tried again
+
+class ResearchConfig:
+    # Iterative deep research: after each search round the LLM reviews the new
+    # results, updates its notes and may ask follow-up queries
+    MAX_ROUNDS = 1  # 1 = a single plan -> search -> synthesize pass
+    MAX_TOTAL_QUERIES = 30  # Across all rounds
+    MAX_FOLLOWUP_QUERIES = 5  # Per round
+    TIME_BUDGET = 600  # Seconds; no new round starts once this is exceeded
+    NOTES_TOKEN_BUDGET = 1500  # Max size of the running research notes
+    # Planned queries this similar to an earlier one (character n-gram Jaccard,
+    # 0-1) are merged before searching, unless one adds words to the other.
+    # None disables merging.
+    QUERY_DEDUP_THRESHOLD = 0.65
+    # Search results with the same canonical URL, or whose content SimHash
+    # fingerprints differ in at most this many of 64 bits, are collapsed into one
+    NEAR_DUPLICATE_DISTANCE = 8
+
+class RetrievalConfig:
+    # Full page text is cleaned, split into overlapping chunks and indexed with
+    # BM25; only the best chunks for the query and each search query are sent
+    # to the LLM. Disabled = only Tavily's short snippets are used.
+    ENABLED = True
+    CHUNK_WORDS = 150
+    CHUNK_OVERLAP = 30  # Words shared by consecutive chunks
+    TOP_K = 5  # Chunks retrieved per query
+    MAX_PAGE_CHARS = 50000  # Longer pages are truncated before indexing
+    MAX_CHUNKS_PER_PAGE = 30
+    MAX_INDEX_CHUNKS = 50000  # Per research run, bounds index memory
+
+class SynthesisConfig:
+    # "single": one LLM call writes the answer from all packed sources.
+    # "map_reduce" (main.py --map-reduce): the results of each search query are
+    # summarized in their own short call, MAP_WORKERS at a time, and a final
+    # call writes the answer from the summaries. Spreads prefill over several
+    # Ollama slots or hosts (see LLMConfig.ENDPOINTS).
+    MODE = "single"
+    MAP_WORKERS = 4  # Summaries generated at the same time per research run
+    MAP_TOKEN_RESERVE = 1024  # Context window tokens kept free for each summary
+    SUMMARY_WORDS = 120  # Requested length of each summary
+
+class HTTPConfig:
+    # Connection pool shared by the Ollama and Tavily clients
+    POOL_SIZE = 10  # Max keep-alive connections per host
+    CONNECT_TIMEOUT = 5  # Seconds
+
+    # Retry with exponential backoff on rate limiting and server errors
+    MAX_RETRIES = 3
+    BACKOFF_FACTOR = 0.5
+    MAX_RETRY_WAIT = 5  # Longest wait before a retry in seconds, Retry-After headers included
+    RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+class CacheConfig:
+    # Persistent Tavily search result cache
+    SEARCH_CACHE_ENABLED = True
+    SEARCH_CACHE_PATH = os.path.join(".cache", "search_cache.sqlite3")
+    SEARCH_CACHE_TTL = 24 * 60 * 60  # Seconds before a cached result expires
+    SEARCH_CACHE_MAX_ENTRIES = 5000  # Least recently used entries are evicted beyond this
+    # ... or once the cached results take more than this many bytes (raw page
+    # text makes entries large). None bounds the entry count only.
+    SEARCH_CACHE_MAX_BYTES = 200 * 1024 * 1024
+    # A cache miss is served from the cached results of a query at least this
+    # similar (same search parameters). None disables similar-query reuse.
+    SIMILAR_QUERY_THRESHOLD = 0.8
+
+    # LLM response cache (opt-in, main.py --llm-cache): identical requests
+    # (model, system prompt, prompt, temperature, num_ctx, seed) reuse the
+    # stored response instead of generating again
+    LLM_CACHE_ENABLED = False
+    LLM_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite3")
+    LLM_CACHE_TTL = 7 * 24 * 60 * 60  # Seconds before a cached response expires
+    LLM_CACHE_MAX_ENTRIES = 2000  # Least recently used entries are evicted beyond this
+    LLM_CACHE_DETERMINISTIC_ONLY = False  # Only cache when TEMPERATURE is 0 or SEED is set
+    # Plan cache (opt-in, main.py --plan-cache): a repeated topic reuses its
+    # cached search queries and skips planning. Stored in the LLM cache file.
+    PLAN_CACHE_ENABLED = False
+
+class SessionConfig:
+    # Every run's plan, search results, answer and trace are stored in SQLite
+    # (session_store.py). main.py --refresh re-runs a stored topic, searching
+    # again only the queries whose results are older than REFRESH_MAX_AGE.
+    ENABLED = True
+    PATH = os.path.join(".cache", "sessions.sqlite3")
+    REFRESH_MAX_AGE = 24 * 60 * 60  # Seconds
+
+class BatchConfig:
+    # Batch research mode (main.py --batch FILE)
+    TOPIC_WORKERS = 4  # Topics researched at the same time
+    LLM_CONCURRENCY = 2  # Concurrent Ollama requests across all topics
+    SEARCH_CONCURRENCY = 8  # Concurrent Tavily requests across all topics
+    OUTPUT_DIR = os.path.join("results", "batch")
+    # Pipelined batches (main.py --pipeline): one worker pool per stage instead of per topic
+    PIPELINE = False
+    PLAN_WORKERS = 2
+    SEARCH_WORKERS = 4  # Also runs follow-up rounds (see ResearchConfig.MAX_ROUNDS)
+    SYNTHESIS_WORKERS = 2  # Keep >= LLM_CONCURRENCY so the LLM always has an answer to write
+    STAGE_QUEUE_SIZE = 2  # Topics that may wait between stages; a full queue pauses the stage before it
 
 class ReportConfig:
     RESULTS_DIR = "results"
+    INCLUDE_TIMINGS = True  # Add a timing breakdown section to HTML reports
+    SAVE_TRACE = True  # Write a JSON trace next to each report
+    # Each report gets a JSON sidecar (query, answer, sources, timings). Reports
+    # in RESULTS_DIR are also added to a full-text index and an HTML index page
+    # as they are written (report_index.py, main.py --search-reports)
+    INDEX_ENABLED = True
+    INDEX_PATH = os.path.join(RESULTS_DIR, "report_index.sqlite3")
+    INDEX_PAGE = os.path.join(RESULTS_DIR, "index.html")
+    INDEX_PREVIEW_CHARS = 300  # Answer text shown per report on the index page
@@ -0,0 +1,102 @@
+import math
+from ranking import BM25, tokenize
+from result_dedup import collapse_results
+
+def estimate_tokens(text):
+    """
+    Roughly estimates the number of LLM tokens in text.
+
+    ASCII text averages about four characters per token; other scripts
+    (Korean, Chinese, ...) are closer to one token per character.
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return math.ceil((len(text) - non_ascii) / 4) + non_ascii
+
+def truncate_tokens(text, max_tokens):
+    """
+    Returns the longest prefix of text, cut at a word boundary where possible,
+    whose estimated size (see estimate_tokens) fits in max_tokens.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    boundary = cut.rfind(" ")
+    return (cut[:boundary] if boundary > 0 else cut).rstrip()
+
+def unique_results(search_results):
+    """
+    Flattens Tavily responses into one list of results, collapsing results
+    with the same canonical URL or near-duplicate content (see
+    result_dedup.ResultCollapser).
+
+    Returns:
+        tuple: (list of result dicts, number of duplicates skipped).
+    """
+    items, stats = collapse_results(search_results)
+    return items, stats["url_duplicates"] + stats["content_duplicates"]
+
+def format_source(number, item):
+    """
+    Formats a single search result as a numbered source block for the prompt.
+    """
+    return (
+        f"Source {number}:\n"
+        f"- Title: {item.get('title')}\n"
+        f"  Content: {item.get('content')}\n"
+        f"  URL: {item.get('url')}\n\n"
+    )
+
+def pack_context(query, search_results, token_budget):
+    """
+    Selects the most relevant search results that fit into a token budget.
+
+    Duplicate results across queries are collapsed, the rest ranked against the user
+    query with BM25 and packed greedily (best first, skipping sources that no
+    longer fit) until the budget is used up.
+
+    Args:
+        query (str): The user query to rank against.
+        search_results (list): Tavily responses, one per search query.
+        token_budget (int): Maximum estimated tokens for the packed context.
+
+    Returns:
+        tuple: (context string, stats dict with 'packed', 'dropped', 'duplicates',
+            'used_tokens' and 'dropped_tokens').
+    """
+    items, duplicates = unique_results(search_results)
+    documents = [tokenize(f"{item.get('title') or ''} {item.get('content') or ''}") for item in items]
+    scores = BM25(documents).scores(tokenize(query))
+    ranked = sorted(range(len(items)), key=lambda i: (-scores[i], i))
+
+    blocks = []
+    used_tokens = 0
+    dropped = 0
+    dropped_tokens = 0
+    for i in ranked:
+        block = format_source(len(blocks) + 1, items[i])
+        cost = estimate_tokens(block)
+        if used_tokens + cost > token_budget:
+            dropped += 1
+            dropped_tokens += cost
+            continue
+        blocks.append(block)
+        used_tokens += cost
+
+    stats = {
+        "packed": len(blocks),
+        "dropped": dropped,
+        "duplicates": duplicates,
+        "used_tokens": used_tokens,
+        "dropped_tokens": dropped_tokens,
+        "token_budget": token_budget,
+    }
+    return "".join(blocks), stats
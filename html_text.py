@@ -0,0 +1,40 @@
+import html
+import re
+
+_HTML_RE = re.compile(r"<(?:[a-zA-Z][a-zA-Z0-9]*|/[a-zA-Z]|!)")
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+# Elements whose content is never useful as page text
+_DROP_RE = re.compile(
+    r"<(script|style|noscript|svg|template|head|nav|header|footer|aside|form)\b[^>]*>.*?</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+_BLOCK_TAG_RE = re.compile(
+    r"</?(?:p|div|br|hr|li|ul|ol|h[1-6]|tr|td|th|table|section|article|main|blockquote|pre|dd|dt)\b[^>]*>",
+    re.IGNORECASE,
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+_MD_LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+# Single spaces are by far the most common match and need no rewriting
+_SPACE_RE = re.compile(r"[\t\r\f\v\xa0][ \t\r\f\v\xa0]*| [ \t\r\f\v\xa0]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n\s*")
+
+def clean_text(raw):
+    """
+    Turns raw page content (HTML or the markdown-like text Tavily returns)
+    into plain text: scripts, styles and navigation are dropped, tags and
+    markdown links are reduced to their text and whitespace is collapsed.
+    """
+    if not raw:
+        return ""
+    text = raw
+    if _HTML_RE.search(text):
+        text = _COMMENT_RE.sub(" ", text)
+        text = _DROP_RE.sub(" ", text)
+        text = _BLOCK_TAG_RE.sub("\n", text)
+        text = _TAG_RE.sub(" ", text)
+        text = html.unescape(text)
+    if "](" in text:
+        text = _MD_LINK_RE.sub(r"\1", text)
+    text = _SPACE_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n", text)
+    return text.strip()
@@ -0,0 +1,138 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import HTTPConfig
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+class _BoundedRetry(Retry):
+    """
+    Retry policy whose waits, Retry-After headers included, never exceed
+    HTTPConfig.MAX_RETRY_WAIT, so retries cannot outlast a request deadline.
+    """
+
+    def get_backoff_time(self):
+        # Capped here rather than with backoff_max, which urllib3 1.x lacks
+        return min(super().get_backoff_time(), HTTPConfig.MAX_RETRY_WAIT)
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, HTTPConfig.MAX_RETRY_WAIT)
+
+def create_session(pool_size=None, max_retries=None, backoff_factor=None):
+    """
+    Creates a requests session with a keep-alive connection pool and retry policy.
+
+    Args:
+        pool_size (int, optional): Max pooled connections per host. Defaults to HTTPConfig.POOL_SIZE.
+        max_retries (int, optional): Retries on connection errors and HTTPConfig.RETRY_STATUS_CODES.
+        backoff_factor (float, optional): Exponential backoff factor between retries.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    pool_size = pool_size if pool_size is not None else HTTPConfig.POOL_SIZE
+    max_retries = max_retries if max_retries is not None else HTTPConfig.MAX_RETRIES
+    backoff_factor = backoff_factor if backoff_factor is not None else HTTPConfig.BACKOFF_FACTOR
+
+    retry = _BoundedRetry(
+        total=max_retries,
+        connect=max_retries,
+        # Never retry read timeouts: they would stretch the per-request deadline
+        read=0,
+        status=max_retries,
+        status_forcelist=HTTPConfig.RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "POST"]),
+        backoff_factor=backoff_factor,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+def get_shared_session():
+    """
+    Returns the process-wide session, creating it on first use.
+
+    Every client that is not given an explicit session shares this pool, so
+    connections stay warm across research runs.
+    """
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = create_session()
+    return _shared_session
+
+def create_async_session(pool_size=None):
+    """
+    Creates an aiohttp session with a keep-alive connection pool, for the async clients.
+
+    aiohttp is only needed for the async API and is imported on first use.
+    The session belongs to the running event loop and must be closed with
+    `await session.close()`.
+
+    Args:
+        pool_size (int, optional): Max connections per host; further requests
+            wait for a free connection. Unlike HTTPConfig.POOL_SIZE for
+            create_session(), this caps concurrency, so by default there is no
+            limit (use the clients' max_concurrency to cap requests instead).
+
+    Returns:
+        aiohttp.ClientSession: The configured session.
+    """
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError("The async API requires aiohttp: pip install aiohttp") from e
+    connector = aiohttp.TCPConnector(limit=0, limit_per_host=pool_size or 0)
+    return aiohttp.ClientSession(connector=connector)
+
+async def post_with_retry(session, url, body, timeout, max_retries=None, backoff_factor=None):
+    """
+    POSTs a JSON body with an aiohttp session, retrying connection errors and
+    HTTPConfig.RETRY_STATUS_CODES with exponential backoff like create_session().
+    No wait exceeds HTTPConfig.MAX_RETRY_WAIT.
+
+    Read timeouts are never retried. The caller must release the returned
+    response (e.g. `async with response:`).
+
+    Args:
+        session (aiohttp.ClientSession): The session to send the request with.
+        url (str): The endpoint.
+        body (bytes): The encoded JSON body.
+        timeout (aiohttp.ClientTimeout): Timeouts for each attempt.
+
+    Returns:
+        aiohttp.ClientResponse: The last response received.
+    """
+    import asyncio
+    import aiohttp
+
+    max_retries = max_retries if max_retries is not None else HTTPConfig.MAX_RETRIES
+    backoff_factor = backoff_factor if backoff_factor is not None else HTTPConfig.BACKOFF_FACTOR
+    for attempt in range(max_retries + 1):
+        try:
+            response = await session.post(
+                url, data=body, headers={"Content-Type": "application/json"}, timeout=timeout
+            )
+        except aiohttp.ClientConnectorError:
+            if attempt == max_retries:
+                raise
+            delay = backoff_factor * (2 ** attempt)
+        else:
+            if response.status not in HTTPConfig.RETRY_STATUS_CODES or attempt == max_retries:
+                return response
+            retry_after = response.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.isdigit() else backoff_factor * (2 ** attempt)
+            response.release()
+        await asyncio.sleep(min(delay, HTTPConfig.MAX_RETRY_WAIT))
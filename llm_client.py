@@ -1,46 +1,358 @@
 import requests
+import contextlib
+import copy
 import json
-from config import LLMConfig
+import threading
+import time
+from cache import make_key
+from config import CacheConfig, HTTPConfig, LLMConfig
+from http_session import create_async_session, get_shared_session, post_with_retry
+
+# Timing and token counters reported by Ollama with every completed generation
+OLLAMA_STAT_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+def _record_ollama_stats(stats, data):
+    for field in OLLAMA_STAT_FIELDS:
+        if field in data:
+            stats[field] = data[field]
+    if data.get("eval_count") and data.get("eval_duration"):
+        stats["tokens_per_second"] = round(data["eval_count"] / (data["eval_duration"] / 1e9), 2)
 
 class OllamaClient:
-    def __init__(self, model_name=None):
-        self.base_url = LLMConfig.BASE_URL
+    def __init__(self, model_name=None, base_url=None, session=None, max_concurrency=None, cache=None,
+                 deterministic_only=None):
+        self.base_url = base_url if base_url else LLMConfig.BASE_URL
         self.model = model_name if model_name else LLMConfig.MODEL_NAME
+        self.session = session if session else self._default_session()
         self.temperature = LLMConfig.TEMPERATURE
         self.context_window = LLMConfig.CONTEXT_WINDOW
+        self.seed = LLMConfig.SEED
+        # Optional ResultCache; identical requests reuse the stored response
+        self.cache = cache
+        # Only cache reproducible requests (temperature 0 or a fixed seed)
+        self.deterministic_only = (
+            CacheConfig.LLM_CACHE_DETERMINISTIC_ONLY if deterministic_only is None else deterministic_only
+        )
+        # Optional cap on in-flight requests when the client is shared between threads
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+
+    def _default_session(self):
+        return get_shared_session()
 
-    def generate(self, prompt, system_prompt=None):
+    def with_model(self, model_name):
         """
-        Generate a response from the Ollama model.
-        
-        Args:
-            prompt (str): The user prompt.
-            system_prompt (str, optional): The system prompt.
-            
-        Returns:
-            str: The generated text.
+        Returns a client for another model that shares this client's session,
+        cache and concurrency cap (e.g. a small model for planning).
         """
+        client = copy.copy(self)
+        client.model = model_name
+        return client
+
+    def _slot(self):
+        return self._slots if self._slots else contextlib.nullcontext()
+
+    def _build_payload(self, prompt, system_prompt, stream):
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": self.temperature,
                 "num_ctx": self.context_window
             }
         }
-        
+        if self.seed is not None:
+            payload["options"]["seed"] = self.seed
+
         if system_prompt:
             payload["system"] = system_prompt
+        return payload
+
+    def _lookup(self, payload, stats):
+        """
+        Looks a request up in the response cache. Sets stats['cache_hit'] when
+        the request is cacheable.
+
+        Returns:
+            tuple: (cache key or None if the request is not cached, cached
+                response text or None).
+        """
+        if self.cache is None:
+            return None, None
+        options = payload["options"]
+        if self.deterministic_only and options.get("temperature") != 0 and "seed" not in options:
+            return None, None
+        cache_key = make_key("ollama.generate", payload["model"], payload.get("system", ""), payload["prompt"], options)
+        cached = self.cache.get(cache_key)
+        stats["cache_hit"] = cached is not None
+        return cache_key, cached["response"] if cached is not None else None
+
+    def _store(self, cache_key, text):
+        if cache_key is not None:
+            self.cache.set(cache_key, {"response": text})
+
+    def _post(self, payload, stream):
+        body = json.dumps(payload).encode("utf-8")
+        response = self.session.post(
+            self.base_url,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            stream=stream,
+            timeout=(HTTPConfig.CONNECT_TIMEOUT, LLMConfig.REQUEST_TIMEOUT)
+        )
+        return response, len(body)
+
+    def generate(self, prompt, system_prompt=None, stats=None):
+        """
+        Generate a response from the Ollama model.
+
+        Args:
+            prompt (str): The user prompt.
+            system_prompt (str, optional): The system prompt.
+            stats (dict, optional): Filled with 'total_time', bytes sent and
+                received, and Ollama's own counters (see OLLAMA_STAT_FIELDS).
+                'cache_hit' tells whether the response came from the cache.
+
+        Returns:
+            str: The generated text.
+        """
+        payload = self._build_payload(prompt, system_prompt, stream=False)
+        if stats is None:
+            stats = {}
+        stats["model"] = self.model
+        start = time.perf_counter()
 
         try:
-            response = requests.post(self.base_url, json=payload)
+            cache_key, cached = self._lookup(payload, stats)
+            if cached is not None:
+                return cached
+            with self._slot():
+                response, stats["bytes_sent"] = self._post(payload, stream=False)
+            stats["bytes_received"] = len(response.content)
             response.raise_for_status()
             data = response.json()
-            return data.get("response", "")
+            _record_ollama_stats(stats, data)
+            text = data.get("response", "")
+            self._store(cache_key, text)
+            return text
         except requests.exceptions.RequestException as e:
             print(f"Error calling Ollama: {e}")
+            stats["error"] = str(e)
             return f"Error: {str(e)}"
+        finally:
+            stats["total_time"] = time.perf_counter() - start
+
+    def generate_stream(self, prompt, system_prompt=None, stats=None):
+        """
+        Generate a response from the Ollama model, yielding text as it is produced.
+
+        Closing the generator early (e.g. breaking out of the loop and calling
+        close()) drops the connection, which makes Ollama stop generating.
+        Only complete responses are cached; a cached response is yielded as
+        a single fragment.
+
+        Args:
+            prompt (str): The user prompt.
+            system_prompt (str, optional): The system prompt.
+            stats (dict, optional): Filled with 'time_to_first_token' and
+                'total_time' (seconds), bytes sent and received, and Ollama's
+                own counters once the stream finishes or is closed.
+
+        Yields:
+            str: Response fragments in generation order.
+        """
+        payload = self._build_payload(prompt, system_prompt, stream=True)
+        if stats is None:
+            stats = {}
+        stats["model"] = self.model
+        stats["bytes_received"] = 0
+        start = time.perf_counter()
+
+        try:
+            cache_key, cached = self._lookup(payload, stats)
+            if cached is not None:
+                stats["time_to_first_token"] = time.perf_counter() - start
+                if cached:
+                    yield cached
+                return
+            parts = []
+            with self._slot():
+                response, stats["bytes_sent"] = self._post(payload, stream=True)
+                with response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        stats["bytes_received"] += len(line) + 1
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        token = chunk.get("response", "")
+                        if token:
+                            if "time_to_first_token" not in stats:
+                                stats["time_to_first_token"] = time.perf_counter() - start
+                            parts.append(token)
+                            yield token
+                        if chunk.get("done"):
+                            _record_ollama_stats(stats, chunk)
+                            self._store(cache_key, "".join(parts))
+                            break
+        except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+            print(f"Error calling Ollama: {e}")
+            stats["error"] = str(e)
+            yield f"Error: {str(e)}"
+        finally:
+            stats["total_time"] = time.perf_counter() - start
+
+class AsyncOllamaClient(OllamaClient):
+    """
+    asyncio version of OllamaClient, backed by aiohttp (an optional dependency).
+
+    Generation is cancelled by cancelling the awaiting task: the connection is
+    dropped, which makes Ollama stop generating. Errors are recorded in stats
+    and returned as text like OllamaClient does, but nothing is printed.
+    A client belongs to the event loop it is first used on.
+
+    Args:
+        session (aiohttp.ClientSession, optional): Shared session. If not given,
+            one is created on first use and closed by aclose().
+        max_concurrency (int, optional): Cap on in-flight requests across all
+            tasks using this client.
+    """
+
+    def __init__(self, model_name=None, base_url=None, session=None, max_concurrency=None, cache=None,
+                 deterministic_only=None):
+        super().__init__(
+            model_name=model_name, base_url=base_url, session=session, cache=cache,
+            deterministic_only=deterministic_only
+        )
+        import asyncio
+
+        self._owns_session = session is None
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    def _default_session(self):
+        # Created on first use, inside the running event loop
+        return None
+
+    def _slot(self):
+        return self._slots if self._slots else contextlib.nullcontext()
+
+    async def _post(self, payload, stream):
+        import aiohttp
+
+        if self.session is None:
+            self.session = create_async_session()
+        body = json.dumps(payload).encode("utf-8")
+        timeout = aiohttp.ClientTimeout(connect=HTTPConfig.CONNECT_TIMEOUT, sock_read=LLMConfig.REQUEST_TIMEOUT)
+        response = await post_with_retry(self.session, self.base_url, body, timeout)
+        return response, len(body)
+
+    async def generate(self, prompt, system_prompt=None, stats=None):
+        """
+        Generate a response from the Ollama model. See OllamaClient.generate.
+        """
+        import asyncio
+        import aiohttp
+
+        payload = self._build_payload(prompt, system_prompt, stream=False)
+        if stats is None:
+            stats = {}
+        stats["model"] = self.model
+        start = time.perf_counter()
+
+        try:
+            cache_key, cached = await asyncio.to_thread(self._lookup, payload, stats)
+            if cached is not None:
+                return cached
+            async with self._slot():
+                response, stats["bytes_sent"] = await self._post(payload, stream=False)
+                async with response:
+                    content = await response.read()
+            stats["bytes_received"] = len(content)
+            response.raise_for_status()
+            data = json.loads(content)
+            _record_ollama_stats(stats, data)
+            text = data.get("response", "")
+            if cache_key is not None:
+                await asyncio.to_thread(self._store, cache_key, text)
+            return text
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+            stats["error"] = str(e) or type(e).__name__
+            return f"Error: {stats['error']}"
+        finally:
+            stats["total_time"] = time.perf_counter() - start
+
+    async def generate_stream(self, prompt, system_prompt=None, stats=None):
+        """
+        Async generator of response fragments. See OllamaClient.generate_stream.
+
+        Closing the generator early (aclose()) drops the connection, which
+        makes Ollama stop generating.
+        """
+        import asyncio
+        import aiohttp
+
+        payload = self._build_payload(prompt, system_prompt, stream=True)
+        if stats is None:
+            stats = {}
+        stats["model"] = self.model
+        stats["bytes_received"] = 0
+        start = time.perf_counter()
+
+        try:
+            cache_key, cached = await asyncio.to_thread(self._lookup, payload, stats)
+            if cached is not None:
+                stats["time_to_first_token"] = time.perf_counter() - start
+                if cached:
+                    yield cached
+                return
+            parts = []
+            async with self._slot():
+                response, stats["bytes_sent"] = await self._post(payload, stream=True)
+                async with response:
+                    response.raise_for_status()
+                    async for line in response.content:
+                        stats["bytes_received"] += len(line)
+                        line = line.strip()
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        token = chunk.get("response", "")
+                        if token:
+                            if "time_to_first_token" not in stats:
+                                stats["time_to_first_token"] = time.perf_counter() - start
+                            parts.append(token)
+                            yield token
+                        if chunk.get("done"):
+                            _record_ollama_stats(stats, chunk)
+                            if cache_key is not None:
+                                await asyncio.to_thread(self._store, cache_key, "".join(parts))
+                            break
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+            stats["error"] = str(e) or type(e).__name__
+            yield f"Error: {stats['error']}"
+        finally:
+            stats["total_time"] = time.perf_counter() - start
+
+    async def aclose(self):
+        """
+        Closes the session if this client created it.
+        """
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
 
 if __name__ == "__main__":
     client = OllamaClient()
@@ -0,0 +1,312 @@
+import contextlib
+import copy
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+from config import HTTPConfig, LLMConfig
+from http_session import create_session, get_shared_session
+from llm_client import OllamaClient
+
+ROUTING_POLICIES = ("least_outstanding", "weighted", "affinity")
+
+class Endpoint:
+    """
+    One Ollama host and its routing state.
+
+    Args:
+        url (str): The host's /api/generate URL.
+        weight (int): Share of requests under the 'weighted' policy.
+        max_concurrency (int, optional): Cap on in-flight requests to this host.
+        models (list, optional): Models the host serves; empty means any.
+    """
+
+    def __init__(self, url, weight=1, max_concurrency=None, models=None):
+        self.url = url
+        self.weight = max(1, weight)
+        self.max_concurrency = max_concurrency
+        self.models = set(models or [])
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.down_until = 0.0  # Skipped until then after a failure
+        self.loaded_models = set()  # Models known to be warm on this host
+        self.current_weight = 0  # Smooth weighted round-robin state
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+
+    def serves(self, model):
+        return not self.models or model in self.models
+
+    def full(self):
+        return bool(self.max_concurrency) and self.outstanding >= self.max_concurrency
+
+    def healthy(self, now=None):
+        return (now if now is not None else time.monotonic()) >= self.down_until
+
+    def slot(self):
+        return self._slots if self._slots else contextlib.nullcontext()
+
+    def ps_url(self):
+        parts = urlsplit(self.url)
+        return urlunsplit((parts.scheme, parts.netloc, "/api/ps", "", ""))
+
+    def to_dict(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy(),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "loaded_models": sorted(self.loaded_models),
+        }
+
+class OllamaRouter:
+    """
+    Spreads generation requests over several Ollama hosts.
+
+    A drop-in replacement for OllamaClient (generate, generate_stream, model,
+    context_window). Each request goes to a healthy host that serves the
+    model, chosen by the routing policy:
+
+        least_outstanding: the host with the fewest in-flight requests
+            relative to its weight.
+        weighted: smooth weighted round-robin by each host's weight.
+        affinity: a host that already has the model loaded (learned from
+            check_health() and from earlier requests) while it has free
+            capacity, so models stay warm; otherwise least outstanding.
+
+    Hosts at their concurrency cap are only chosen when every host is full.
+    A host that fails a request is skipped for `cooldown` seconds and the
+    request fails over to the next host, as long as nothing has been yielded
+    yet. With more than one host, failover replaces HTTP retries.
+
+    Args:
+        endpoints (list, optional): Endpoint objects or dicts of their arguments.
+            Defaults to LLMConfig.ENDPOINTS, or LLMConfig.BASE_URL alone.
+        model_name (str, optional): Model to request. Defaults to LLMConfig.MODEL_NAME.
+        policy (str, optional): One of ROUTING_POLICIES. Defaults to LLMConfig.ROUTING_POLICY.
+        session (requests.Session, optional): Session shared by all hosts.
+        cache (ResultCache, optional): LLM response cache (see OllamaClient).
+        max_concurrency (int, optional): Cap on in-flight requests over all hosts.
+        cooldown (float, optional): Defaults to LLMConfig.ENDPOINT_COOLDOWN.
+        deterministic_only (bool, optional): See OllamaClient.
+    """
+
+    def __init__(self, endpoints=None, model_name=None, policy=None, session=None, cache=None,
+                 max_concurrency=None, cooldown=None, deterministic_only=None):
+        if endpoints is None:
+            endpoints = LLMConfig.ENDPOINTS or [{"url": LLMConfig.BASE_URL}]
+        self.endpoints = [e if isinstance(e, Endpoint) else Endpoint(**e) for e in endpoints]
+        if not self.endpoints:
+            raise ValueError("OllamaRouter needs at least one endpoint.")
+        self.model = model_name if model_name else LLMConfig.MODEL_NAME
+        self.policy = policy if policy else LLMConfig.ROUTING_POLICY
+        if self.policy not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy '{self.policy}'; expected one of {ROUTING_POLICIES}.")
+        if session is None:
+            session = get_shared_session() if len(self.endpoints) == 1 else create_session(max_retries=0)
+        self.session = session
+        self.cache = cache
+        self.deterministic_only = deterministic_only
+        self.cooldown = LLMConfig.ENDPOINT_COOLDOWN if cooldown is None else cooldown
+        self.context_window = LLMConfig.CONTEXT_WINDOW
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._lock = threading.Lock()
+        self._clients = {}  # (url, model) -> OllamaClient
+
+    def with_model(self, model_name):
+        """
+        Returns a router for another model that shares these hosts and their
+        state (e.g. a small model for planning).
+        """
+        router = copy.copy(self)
+        router.model = model_name
+        return router
+
+    def _client(self, endpoint):
+        key = (endpoint.url, self.model)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = OllamaClient(
+                    model_name=self.model, base_url=endpoint.url, session=self.session,
+                    cache=self.cache, deterministic_only=self.deterministic_only
+                )
+                self._clients[key] = client
+        return client
+
+    def _acquire(self, tried):
+        """
+        Picks a host for the next attempt and counts the request against it.
+
+        Returns:
+            Endpoint or None: None when every host serving the model has been tried.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in tried and e.serves(self.model)]
+            healthy = [e for e in candidates if e.healthy(now)]
+            if not healthy:
+                # Every host is cooling down; trying one beats failing outright
+                healthy = candidates[:1]
+            if not healthy:
+                return None
+            free = [e for e in healthy if not e.full()] or healthy
+            endpoint = self._choose(free)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _choose(self, endpoints):
+        if self.policy == "weighted":
+            total = sum(e.weight for e in endpoints)
+            for e in endpoints:
+                e.current_weight += e.weight
+            best = max(endpoints, key=lambda e: e.current_weight)
+            best.current_weight -= total
+            return best
+        if self.policy == "affinity":
+            warm = [e for e in endpoints if self.model in e.loaded_models]
+            if warm:
+                endpoints = warm
+        return min(endpoints, key=lambda e: e.outstanding / e.weight)
+
+    def _release(self, endpoint, error=None):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if error:
+                endpoint.failures += 1
+                endpoint.down_until = time.monotonic() + self.cooldown
+                endpoint.loaded_models.discard(self.model)
+            else:
+                endpoint.down_until = 0.0
+                endpoint.loaded_models.add(self.model)
+
+    def _slot(self):
+        return self._slots if self._slots else contextlib.nullcontext()
+
+    def generate(self, prompt, system_prompt=None, stats=None):
+        """
+        Generate a response on one of the hosts. See OllamaClient.generate.
+
+        stats additionally gets 'endpoint' (the host that answered) and
+        'failovers' (hosts that failed before it).
+        """
+        if stats is None:
+            stats = {}
+        tried = []
+        text = None
+        with self._slot():
+            while True:
+                endpoint = self._acquire(tried)
+                if endpoint is None:
+                    break
+                tried.append(endpoint)
+                attempt = {}
+                try:
+                    with endpoint.slot():
+                        text = self._client(endpoint).generate(prompt, system_prompt=system_prompt, stats=attempt)
+                finally:
+                    self._release(endpoint, attempt.get("error"))
+                self._record(stats, attempt, endpoint, tried)
+                if "error" not in attempt:
+                    break
+        if text is None:
+            stats["error"] = "no Ollama endpoint serves this model"
+            text = f"Error: {stats['error']}"
+        return text
+
+    def generate_stream(self, prompt, system_prompt=None, stats=None):
+        """
+        Stream a response from one of the hosts. See OllamaClient.generate_stream.
+
+        A host that fails before its first fragment is skipped and the request
+        fails over; an error after that ends the stream like OllamaClient does.
+        """
+        if stats is None:
+            stats = {}
+        tried = []
+        with self._slot():
+            while True:
+                endpoint = self._acquire(tried)
+                if endpoint is None:
+                    # Every host failed before its first fragment (or none serves the model)
+                    if not tried:
+                        stats["error"] = "no Ollama endpoint serves this model"
+                    yield f"Error: {stats['error']}"
+                    return
+                tried.append(endpoint)
+                attempt = {}
+                started = False
+                try:
+                    with endpoint.slot():
+                        stream = self._client(endpoint).generate_stream(
+                            prompt, system_prompt=system_prompt, stats=attempt
+                        )
+                        try:
+                            for token in stream:
+                                if "error" in attempt and not started:
+                                    # Nothing was yielded yet, so another host can take over
+                                    break
+                                started = True
+                                yield token
+                        finally:
+                            stream.close()
+                finally:
+                    self._release(endpoint, attempt.get("error"))
+                    self._record(stats, attempt, endpoint, tried)
+                if "error" not in attempt or started:
+                    return
+
+    def _record(self, stats, attempt, endpoint, tried):
+        # stats may be a tracer span; only the fields of a failed attempt are dropped
+        stats.pop("error", None)
+        stats.update(attempt)
+        stats["endpoint"] = endpoint.url
+        stats["failovers"] = len(tried) - 1
+
+    def check_health(self, timeout=None):
+        """
+        Probes every host's /api/ps: unreachable hosts are put on cooldown and
+        the models each host has loaded feed the 'affinity' policy.
+
+        Returns:
+            list: Endpoint status dicts (see stats()).
+        """
+        timeout = timeout if timeout else HTTPConfig.CONNECT_TIMEOUT
+        for endpoint in self.endpoints:
+            try:
+                response = self.session.get(endpoint.ps_url(), timeout=timeout)
+                response.raise_for_status()
+                models = {m.get("name") or m.get("model") for m in response.json().get("models", [])}
+            except Exception as e:
+                print(f"Ollama endpoint {endpoint.url} is unhealthy: {e}")
+                with self._lock:
+                    endpoint.down_until = time.monotonic() + self.cooldown
+                continue
+            with self._lock:
+                endpoint.down_until = 0.0
+                endpoint.loaded_models = {m for m in models if m}
+        return self.stats()
+
+    def stats(self):
+        """
+        Returns the routing state of every host.
+        """
+        with self._lock:
+            return [endpoint.to_dict() for endpoint in self.endpoints]
+
+def create_llm(model_name=None, cache=None, max_concurrency=None):
+    """
+    Creates the LLM client configured in LLMConfig: an OllamaRouter when
+    LLMConfig.ENDPOINTS lists hosts, otherwise a plain OllamaClient.
+
+    With several hosts, the router checks their health once before the first
+    request: hosts that are down are skipped until their cooldown expires and
+    the 'affinity' policy starts out knowing which models each host has loaded.
+    """
+    if LLMConfig.ENDPOINTS:
+        router = OllamaRouter(model_name=model_name, cache=cache, max_concurrency=max_concurrency)
+        if len(router.endpoints) > 1:
+            router.check_health()
+        return router
+    return OllamaClient(model_name=model_name, cache=cache, max_concurrency=max_concurrency)
@@ -1,16 +1,50 @@
 import argparse
 import os
 import sys
-from dotenv import load_dotenv
-from agent import DeepResearchAgent
 
-from report_generator import generate_html_report
-from config import LLMConfig, TavilyConfig
+# The agent, its clients and the report generator (requests, markdown, ...)
+# are imported where they are first needed, so --help and argument errors
+# return without loading them. config.py loads .env on import.
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Deep Research Agent powered by DeepSeek-R1")
+    parser.add_argument("query", nargs="?", help="The research topic")
+    parser.add_argument("--advanced", action="store_true", help="Use advanced search depth (overrides config)")
+    parser.add_argument("--adaptive", action="store_true", help="Start every query as a basic search and search only weak ones again at advanced depth, within AdaptiveSearchConfig budgets")
+    parser.add_argument("--model", choices=["local", "deepseek-cloud", "gpt-cloud"], default=None, help="Select the LLM model to use")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the search result cache")
+    parser.add_argument("--refresh-cache", action="store_true", help="Ignore cached search results and store fresh ones")
+    parser.add_argument("--llm-cache", action="store_true", help="Reuse cached LLM responses for identical requests")
+    parser.add_argument("--plan-cache", action="store_true", help="Reuse the cached search queries of a repeated topic and skip planning")
+    parser.add_argument("--refresh", action="store_true", help="Re-run the stored session of a topic: only searches older than SessionConfig.REFRESH_MAX_AGE are executed again, then the answer is rewritten")
+    parser.add_argument("--map-reduce", action="store_true", help="Summarize each search query's results in parallel, then write the answer from the summaries (see SynthesisConfig)")
+    parser.add_argument("--rounds", type=int, default=None, help="Search rounds per topic; rounds after the first run follow-up queries (default: ResearchConfig.MAX_ROUNDS)")
+    parser.add_argument("--search-reports", metavar="TEXT", help="Search the answers, topics and sources of earlier reports and exit")
+    parser.add_argument("--reindex", action="store_true", help="Add every report in ReportConfig.RESULTS_DIR to the report index, e.g. ones written before it existed, and exit")
+    parser.add_argument("--batch", metavar="FILE", help="Research every topic in a JSONL or text file")
+    parser.add_argument("--output-dir", default=None, help="Output directory for batch reports (default: BatchConfig.OUTPUT_DIR)")
+    parser.add_argument("--workers", type=int, default=None, help="Topics researched concurrently in batch mode")
+    parser.add_argument("--llm-concurrency", type=int, default=None, help="Max concurrent LLM calls in batch mode")
+    parser.add_argument("--search-concurrency", type=int, default=None, help="Max concurrent search calls in batch mode")
+    parser.add_argument("--no-resume", action="store_true", help="Re-run batch topics that already have a report")
+    parser.add_argument("--pipeline", action="store_true", help="Run batch topics through per-stage worker pools (plan, search, synthesize)")
+    return parser
 
 def main():
-    # Load environment variables
-    load_dotenv()
-    
+    # Parse Command Line Arguments
+    args = build_parser().parse_args()
+
+    if args.reindex or args.search_reports is not None:
+        # Reads only the local reports and their index; no API key needed
+        from report_index import reindex_reports, search_reports
+        if args.reindex:
+            reindex_reports()
+        if args.search_reports is not None:
+            search_reports(args.search_reports)
+        return
+
+    from config import AdaptiveSearchConfig, CacheConfig, LLMConfig, SessionConfig, TavilyConfig
+
     # Check for API Key
     if not os.getenv("TAVILY_API_KEY"):
         print("Error: TAVILY_API_KEY not found.")
@@ -18,13 +52,6 @@ def main():
         print("Example: TAVILY_API_KEY=tvly-...")
         sys.exit(1)
 
-    # Parse Command Line Arguments
-    parser = argparse.ArgumentParser(description="Deep Research Agent powered by DeepSeek-R1")
-    parser.add_argument("query", nargs="?", help="The research topic")
-    parser.add_argument("--advanced", action="store_true", help="Use advanced search depth (overrides config)")
-    parser.add_argument("--model", choices=["local", "deepseek-cloud", "gpt-cloud"], default=None, help="Select the LLM model to use")
-    args = parser.parse_args()
-
     # Map model choice to config constant
     model_map = {
         "local": LLMConfig.MODEL_LOCAL,
@@ -46,34 +73,189 @@ def main():
     print("==========================================")
     print("      Deep Research Agent   ")
     print("==========================================")
-    print(f"      Mode: {search_depth.upper()}        ")
+    adaptive_search = args.adaptive or AdaptiveSearchConfig.ENABLED
+    print(f"      Mode: {'ADAPTIVE' if adaptive_search else search_depth.upper()}        ")
     print(f"      Model: {selected_model}             ")
     print("==========================================")
 
+    from cache import create_llm_cache, create_search_cache
+    from session_store import SessionStore
+
+    search_cache = None
+    if CacheConfig.SEARCH_CACHE_ENABLED and not args.no_cache:
+        # Refreshed searches must not be served from the cache either
+        search_cache = create_search_cache(refresh=args.refresh_cache or args.refresh)
+
+    # LLM responses and plans share one cache file
+    use_llm_cache = args.llm_cache or CacheConfig.LLM_CACHE_ENABLED
+    use_plan_cache = args.plan_cache or CacheConfig.PLAN_CACHE_ENABLED
+    llm_cache = create_llm_cache() if use_llm_cache or use_plan_cache else None
+    caches = {
+        "search_cache": search_cache,
+        "llm_cache": llm_cache if use_llm_cache else None,
+        "plan_cache": llm_cache if use_plan_cache else None,
+    }
+    sessions = SessionStore() if SessionConfig.ENABLED else None
+    if args.refresh and sessions is None:
+        print("--refresh needs SessionConfig.ENABLED; running full research instead.")
+
+    synthesis_mode = "map_reduce" if args.map_reduce else None
+
+    if args.batch:
+        # Batch mode
+        run_batch(
+            args, search_depth, selected_model, sessions=sessions, synthesis_mode=synthesis_mode,
+            adaptive_search=adaptive_search, **caches
+        )
+        return
+
+    # One agent, and so one Ollama and one Tavily client, for every query of this process
+    agent = build_agent(selected_model, synthesis_mode=synthesis_mode, adaptive_search=adaptive_search, **caches)
     if args.query:
         # Single run mode
-        run_research(args.query, search_depth, selected_model)
+        run_research(agent, args.query, search_depth, max_rounds=args.rounds, sessions=sessions, refresh=args.refresh)
     else:
         # Interactive mode
-        interactive_loop(search_depth, selected_model)
+        interactive_loop(agent, search_depth, max_rounds=args.rounds, sessions=sessions, refresh=args.refresh)
 
-def run_research(query, search_depth, model_name):
-    try:
-        agent = DeepResearchAgent(model_name=model_name)
-        result_data = agent.run(query, search_depth=search_depth)
-        
+def build_agent(model_name, search_cache=None, llm_cache=None, plan_cache=None, synthesis_mode=None,
+                adaptive_search=None):
+    """
+    Creates the agent with its LLM and search clients.
+    """
+    from agent import DeepResearchAgent
+    from config import LLMConfig
+    from llm_router import create_llm
+    from tavily_client import TavilyClient
+
+    tavily = TavilyClient(cache=search_cache)
+    llm = create_llm(model_name=model_name, cache=llm_cache)
+    planner = llm.with_model(LLMConfig.PLANNING_MODEL) if LLMConfig.PLANNING_MODEL else None
+    return DeepResearchAgent(
+        llm=llm, tavily=tavily, plan_cache=plan_cache, planner=planner, synthesis_mode=synthesis_mode,
+        adaptive_search=adaptive_search
+    )
+
+class AnswerPrinter:
+    """
+    Prints the final answer progressively as the LLM streams it.
+    """
+    def __init__(self):
+        self.started = False
+
+    def _print_header(self):
         print("\n" + "="*40)
         print("FINAL ANSWER")
         print("="*40 + "\n")
-        print(result_data["final_answer"])
-        
-        # Generate Report
-        report_path = generate_html_report(result_data)
+
+    def __call__(self, token):
+        if not self.started:
+            self._print_header()
+            self.started = True
+        print(token, end="", flush=True)
+
+    def finish(self, final_answer):
+        if self.started:
+            print()
+        else:
+            # Nothing was streamed (e.g. planning failed)
+            self._print_header()
+            print(final_answer)
+
+def run_research(agent, query, search_depth, max_rounds=None, sessions=None, refresh=False):
+    from config import ReportConfig
+    from report_generator import ReportWriter
+    from report_index import index_report
+    from tracing import Tracer
+
+    try:
+        printer = AnswerPrinter()
+        tracer = Tracer(name=query)
+        session = None
+        if refresh and sessions is not None:
+            session = sessions.latest(query)
+            if session is None:
+                print("No stored session for this topic; running full research.")
+        # The report is written section by section as each stage finishes
+        with ReportWriter(query) as report:
+            if session is not None:
+                result_data = agent.refresh(
+                    session, search_depth=search_depth, on_token=printer, tracer=tracer, report=report
+                )
+            else:
+                result_data = agent.run(
+                    query, search_depth=search_depth, on_token=printer, tracer=tracer,
+                    max_rounds=max_rounds, report=report
+                )
+            printer.finish(result_data["final_answer"])
+            report.write_timings(tracer.to_dict())
+        report_path = report.filepath
         print(f"\nReport generated: {report_path}")
+        index_report(report_path, result_data)
+
+        if sessions is not None and result_data["search_results"]:
+            session_id = sessions.save(
+                result_data, model=agent.llm.model, report=report_path, parent_id=session["id"] if session else None
+            )
+            refreshed = result_data.get("refreshed")
+            if refreshed:
+                print(
+                    f"Session saved: #{session_id} (refreshed #{session['id']}: "
+                    f"{refreshed['searched']} searched again, {refreshed['reused']} reused)"
+                )
+            else:
+                print(f"Session saved: #{session_id}")
+
+        if ReportConfig.SAVE_TRACE:
+            trace_path = tracer.write(os.path.splitext(report_path)[0] + ".trace.json")
+            print(f"Trace written: {trace_path}")
+
+        search_cache = agent.tavily.cache
+        llm_cache = agent.llm.cache or agent.plan_cache
+        if search_cache is not None:
+            stats = search_cache.stats()
+            print(
+                f"Search cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries "
+                f"({stats['bytes'] / 1e6:.1f} MB)"
+            )
+        if llm_cache is not None:
+            stats = llm_cache.stats()
+            print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
     except Exception as e:
         print(f"\nAn error occurred: {e}")
 
-def interactive_loop(default_search_depth, model_name):
+def run_batch(args, search_depth, model_name, search_cache=None, llm_cache=None, plan_cache=None, sessions=None,
+              synthesis_mode=None, adaptive_search=None):
+    from batch_runner import BatchRunner, load_topics
+
+    try:
+        topics = load_topics(args.batch)
+    except (OSError, ValueError) as e:
+        print(f"Error reading batch file: {e}")
+        sys.exit(1)
+
+    runner = BatchRunner(
+        output_dir=args.output_dir,
+        model_name=model_name,
+        search_depth=search_depth,
+        topic_workers=args.workers,
+        llm_concurrency=args.llm_concurrency,
+        search_concurrency=args.search_concurrency,
+        search_cache=search_cache,
+        llm_cache=llm_cache,
+        plan_cache=plan_cache,
+        resume=not args.no_resume,
+        max_rounds=args.rounds,
+        pipeline=args.pipeline or None,
+        sessions=sessions,
+        refresh=args.refresh,
+        synthesis_mode=synthesis_mode,
+        adaptive_search=adaptive_search
+    )
+    summary = runner.run(topics)
+    print(f"Summary index: {summary['index']}")
+
+def interactive_loop(agent, default_search_depth, max_rounds=None, sessions=None, refresh=False):
     while True:
         try:
             user_query = input("\nEnter your research topic (or 'exit' to quit): ").strip()
@@ -84,7 +266,9 @@ def interactive_loop(default_search_depth, model_name):
             if not user_query:
                 continue
 
-            run_research(user_query, default_search_depth, model_name)
+            run_research(
+                agent, user_query, default_search_depth, max_rounds=max_rounds, sessions=sessions, refresh=refresh
+            )
             
         except KeyboardInterrupt:
             print("\nExiting...")
@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+
+_DONE = object()  # Tells a stage worker that no more items will come
+
+class Stage:
+    """
+    One step of a StagedPipeline.
+
+    Args:
+        name (str): Stage name used in the metrics.
+        func (callable): Called with each item; returns the item for the next
+            stage, or None to drop it.
+        workers (int): Threads running this stage.
+        queue_size (int): Items that may wait for this stage. A full queue
+            blocks the stage before it (backpressure).
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.processed = 0
+        self.failed = 0
+        self.busy_time = 0.0  # Seconds spent in func, over all workers
+        self.wait_time = 0.0  # Seconds items spent queued
+        self.blocked_time = 0.0  # Seconds the stage before waited on a full queue
+        self.max_depth = 0
+        self.depth_samples = []
+        self.running = self.workers
+
+    def to_dict(self, elapsed):
+        samples = self.depth_samples
+        handled = self.processed + self.failed
+        return {
+            "name": self.name,
+            "workers": self.workers,
+            "queue_size": self.queue.maxsize,
+            "processed": self.processed,
+            "failed": self.failed,
+            "max_queue_depth": self.max_depth,
+            "avg_queue_depth": round(sum(samples) / len(samples), 2) if samples else 0.0,
+            "avg_wait_seconds": round(self.wait_time / handled, 3) if handled else 0.0,
+            "blocked_seconds": round(self.blocked_time, 3),
+            # Share of the stage's worker time spent working rather than waiting for items
+            "utilization": round(self.busy_time / (elapsed * self.workers), 3) if elapsed > 0 else 0.0,
+        }
+
+class StagedPipeline:
+    """
+    Runs items through a chain of stages, each with its own bounded queue and
+    worker threads, so different items are in different stages at the same
+    time: while one topic is being synthesized, the next ones are planned and
+    searched.
+
+    Queues are bounded, so a slow stage holds back the stages before it
+    instead of letting work pile up. Queue depths are sampled every
+    `sample_interval` seconds for the metrics.
+
+    Args:
+        stages (list): Stage objects, in order.
+        on_error (callable, optional): Called with (stage name, item, exception)
+            when a stage raises; the item is dropped.
+        sample_interval (float): Seconds between queue depth samples.
+    """
+
+    def __init__(self, stages, on_error=None, sample_interval=0.1):
+        if not stages:
+            raise ValueError("StagedPipeline needs at least one stage.")
+        self.stages = stages
+        self.on_error = on_error
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._elapsed = 0.0
+
+    def run(self, items):
+        """
+        Feeds every item through the stages and waits until all are done.
+
+        Returns:
+            list: The items returned by the last stage, in completion order.
+        """
+        results = []
+        start = time.perf_counter()
+        threads = []
+        for stage in self.stages:
+            stage.running = stage.workers
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(index, results), name=f"{stage.name}-{number + 1}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+        finished = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(finished,), name="pipeline-sampler", daemon=True)
+        sampler.start()
+
+        first = self.stages[0]
+        for item in items:
+            self._put(first, item)
+        for _ in range(first.workers):
+            first.queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+        finished.set()
+        sampler.join()
+        self._elapsed = time.perf_counter() - start
+        return results
+
+    def _put(self, stage, item):
+        queued = time.perf_counter()
+        stage.queue.put((item, queued))
+        blocked = time.perf_counter() - queued
+        with self._lock:
+            stage.blocked_time += blocked
+            stage.max_depth = max(stage.max_depth, stage.queue.qsize())
+
+    def _work(self, index, results):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            entry = stage.queue.get()
+            if entry is _DONE:
+                break
+            item, queued = entry
+            started = time.perf_counter()
+            with self._lock:
+                stage.wait_time += started - queued
+            try:
+                output = stage.func(item)
+                error = None
+            except Exception as e:
+                output = None
+                error = e
+            with self._lock:
+                stage.busy_time += time.perf_counter() - started
+                if error is None:
+                    stage.processed += 1
+                else:
+                    stage.failed += 1
+            if error is not None:
+                if self.on_error:
+                    self.on_error(stage.name, item, error)
+                continue
+            if output is None:
+                continue
+            if next_stage is None:
+                with self._lock:
+                    results.append(output)
+            else:
+                self._put(next_stage, output)
+
+        # The last worker out tells the next stage's workers to stop
+        with self._lock:
+            stage.running -= 1
+            last = stage.running == 0
+        if last and next_stage is not None:
+            for _ in range(next_stage.workers):
+                next_stage.queue.put(_DONE)
+
+    def _sample(self, finished):
+        while not finished.wait(self.sample_interval):
+            with self._lock:
+                for stage in self.stages:
+                    stage.depth_samples.append(stage.queue.qsize())
+
+    def queue_depths(self):
+        """
+        Returns the current number of items waiting for each stage.
+        """
+        return {stage.name: stage.queue.qsize() for stage in self.stages}
+
+    def metrics(self):
+        """
+        Returns per-stage counts, queue depths, waiting and utilization of the
+        last run.
+        """
+        with self._lock:
+            return [stage.to_dict(self._elapsed) for stage in self.stages]
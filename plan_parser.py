@@ -0,0 +1,190 @@
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+_QUOTES = {'"': '"', "'": "'", "“": "”"}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/", "\\": "\\", '"': '"', "'": "'"}
+
+class PlanParser:
+    """
+    Finds the planned search queries in an LLM response while it streams in.
+
+    Text is scanned once as it arrives. The first complete JSON array of
+    strings outside <think> blocks is the plan; arrays holding anything else
+    (numbers, objects, bare words like a "[1]" citation) are skipped. Common
+    slips are tolerated: trailing or doubled commas, single or curly quotes
+    and raw newlines inside strings.
+
+    Usage:
+        parser = PlanParser()
+        for token in stream:
+            queries = parser.feed(token)
+            if queries is not None:
+                break  # Stop generating; the rest is not needed
+        queries = parser.finish()
+    """
+
+    def __init__(self):
+        self.queries = None
+        self._chunks = []  # Every fragment fed, joined only when text is read
+        # The text from the earliest position still needed (the array being
+        # parsed, or the next character to scan) onwards, so tokens are never
+        # appended to an ever-growing string
+        self._buffer = ""
+        self._offset = 0  # Position of _buffer[0] in the whole text
+        self._pos = 0  # Next character to scan
+        self._in_think = False
+        self._array_start = None  # Position of the '[' being parsed
+        self._items = []
+        self._expect_value = True
+        self._quote = None  # Closing quote of the string being parsed
+        self._chars = []
+        self._escape = None  # Characters after a backslash so far
+
+    def feed(self, token):
+        """
+        Adds the next fragment of the response.
+
+        Returns:
+            list or None: The queries once a complete plan has been seen.
+        """
+        if self.queries is None:
+            self._chunks.append(token)
+            self._buffer += token
+            self._scan()
+            self._trim()
+        return self.queries
+
+    @property
+    def text(self):
+        """
+        The response fed so far.
+        """
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def finish(self):
+        """
+        Returns the queries after the response has ended, or None if it holds
+        no plan. An unclosed <think> block is searched as a last resort, since
+        some models never close it.
+        """
+        if self.queries is None:
+            self._scan(final=True)
+        if self.queries is None and self._in_think:
+            fallback = PlanParser()
+            fallback.feed(self.text.replace(_THINK_OPEN, " ").replace(_THINK_CLOSE, " "))
+            self.queries = fallback.finish()
+        return self.queries
+
+    def _scan(self, final=False):
+        text = self._buffer
+        end = self._offset + len(text)
+        while self._pos < end and self.queries is None:
+            i = self._pos
+            char = text[i - self._offset]
+            if self._quote is not None:
+                self._string_char(char)
+                self._pos += 1
+                continue
+            if char == "<":
+                tag = self._tag_at(i, final)
+                if tag is None:
+                    # Possibly a tag split over two tokens; wait for more text
+                    return
+                if tag:
+                    self._in_think = tag == _THINK_OPEN
+                    self._reset_array()
+                    self._pos = i + len(tag)
+                    continue
+            if self._in_think:
+                self._pos += 1
+                continue
+            if self._array_start is None:
+                if char == "[":
+                    self._array_start = i
+                self._pos += 1
+                continue
+            self._array_char(char)
+
+    def _tag_at(self, i, final):
+        """
+        Returns the think tag starting at i, "" if there is none, or None if
+        the text ends with what may be the start of one.
+        """
+        start = i - self._offset
+        rest = self._buffer[start:start + len(_THINK_CLOSE)]
+        for tag in (_THINK_OPEN, _THINK_CLOSE):
+            if rest.startswith(tag):
+                return tag
+            if not final and len(rest) < len(tag) and tag.startswith(rest):
+                return None
+        return ""
+
+    def _trim(self):
+        keep = self._pos if self._array_start is None else min(self._pos, self._array_start)
+        if keep > self._offset:
+            self._buffer = self._buffer[keep - self._offset:]
+            self._offset = keep
+
+    def _array_char(self, char):
+        if char in _QUOTES and self._expect_value:
+            self._quote = _QUOTES[char]
+            self._chars = []
+            self._pos += 1
+        elif char.isspace() or char == ",":
+            # Doubled and trailing commas are tolerated
+            if char == ",":
+                self._expect_value = True
+            self._pos += 1
+        elif char == "]":
+            queries = [q.strip() for q in self._items if q.strip()]
+            if queries:
+                self.queries = queries
+                self._pos += 1
+            else:
+                self._abandon()
+        else:
+            self._abandon()
+
+    def _string_char(self, char):
+        if self._escape is not None:
+            self._escape += char
+            if self._escape[0] == "u":
+                if len(self._escape) < 5:
+                    return
+                try:
+                    self._chars.append(chr(int(self._escape[1:], 16)))
+                except ValueError:
+                    self._chars.append(self._escape)
+            else:
+                self._chars.append(_ESCAPES.get(char, "\\" + char))
+            self._escape = None
+        elif char == "\\":
+            self._escape = ""
+        elif char == self._quote:
+            self._items.append("".join(self._chars))
+            self._quote = None
+            self._expect_value = False
+        else:
+            self._chars.append(" " if char in "\r\n" else char)
+
+    def _abandon(self):
+        # Not a list of strings; look for the next '[' right after this one
+        self._pos = self._array_start + 1
+        self._reset_array()
+
+    def _reset_array(self):
+        self._array_start = None
+        self._items = []
+        self._expect_value = True
+        self._quote = None
+        self._escape = None
+
+def parse_plan(response):
+    """
+    Returns the search queries in a complete LLM response (see PlanParser),
+    or None if it holds no plan.
+    """
+    parser = PlanParser()
+    parser.feed(response)
+    return parser.finish()
@@ -0,0 +1,149 @@
+import re
+import threading
+from cache import normalize_query
+from config import ResearchConfig
+from ranking import tokenize
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)*")
+
+# Words search planners use interchangeably for "the most recent one"
+_SYNONYMS = {
+    "current": "latest",
+    "newest": "latest",
+    "recent": "latest",
+    "latest": "latest",
+}
+
+def query_features(query, n=3):
+    """
+    Returns the lexical fingerprint of a query: its character n-grams (after
+    normalization, stopword removal and sorting the words, so word order does
+    not matter), the numbers it mentions and its words.
+
+    Returns:
+        tuple: (frozenset of n-grams, frozenset of numbers, frozenset of words).
+    """
+    words = sorted(_SYNONYMS.get(word, word) for word in tokenize(normalize_query(query)))
+    text = f" {' '.join(words)} "
+    grams = frozenset(text[i:i + n] for i in range(max(len(text) - n + 1, 1)))
+    return grams, frozenset(_NUMBER_RE.findall(query)), frozenset(words)
+
+def similarity(a, b):
+    """
+    Jaccard similarity of two query fingerprints (see query_features).
+
+    Queries naming different numbers ("Python 3.12" vs "Python 3.13", "2023"
+    vs "2024") are treated as unrelated however similar the rest is, and so
+    are queries where one adds words to the other ("coral bleaching causes
+    Australia" vs "coral bleaching causes"): the longer one is more specific.
+    """
+    grams_a, numbers_a, words_a = a
+    grams_b, numbers_b, words_b = b
+    if numbers_a != numbers_b:
+        return 0.0
+    if words_a < words_b or words_b < words_a:
+        return 0.0
+    if not grams_a or not grams_b:
+        return 0.0
+    overlap = len(grams_a & grams_b)
+    return overlap / (len(grams_a) + len(grams_b) - overlap)
+
+class QueryIndex:
+    """
+    Finds previously seen queries similar to a new one.
+
+    An inverted index from n-gram to query keeps lookups proportional to the
+    number of queries sharing n-grams with the new one rather than to the
+    size of the index. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self._queries = []  # (query, fingerprint), None once removed
+        self._ids = {}  # query -> its id
+        self._postings = {}  # n-gram -> query ids
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, query):
+        features = query_features(query)
+        with self._lock:
+            if query in self._ids:
+                return
+            query_id = len(self._queries)
+            self._queries.append((query, features))
+            self._ids[query] = query_id
+            for gram in features[0]:
+                self._postings.setdefault(gram, []).append(query_id)
+
+    def remove(self, query):
+        with self._lock:
+            query_id = self._ids.pop(query, None)
+            if query_id is None:
+                return
+            for gram in self._queries[query_id][1][0]:
+                self._postings[gram].remove(query_id)
+            self._queries[query_id] = None
+
+    def matches(self, query, threshold):
+        """
+        Returns (query, similarity) for every indexed query at or above
+        threshold, most similar first.
+        """
+        features = query_features(query)
+        with self._lock:
+            overlaps = {}
+            for gram in features[0]:
+                for query_id in self._postings.get(gram, ()):
+                    overlaps[query_id] = overlaps.get(query_id, 0) + 1
+            found = []
+            for query_id in overlaps:
+                candidate, candidate_features = self._queries[query_id]
+                score = similarity(features, candidate_features)
+                if score >= threshold:
+                    found.append((candidate, score))
+        found.sort(key=lambda match: match[1], reverse=True)
+        return found
+
+    def find(self, query, threshold):
+        """
+        Returns (query, similarity) for the most similar indexed query at or
+        above threshold, or None.
+        """
+        found = self.matches(query, threshold)
+        return found[0] if found else None
+
+def dedupe_queries(queries, threshold=None, existing=None):
+    """
+    Drops queries that are near-duplicates of an earlier query.
+
+    Args:
+        queries (list): Candidate queries, in priority order.
+        threshold (float, optional): Similarity at or above which two queries
+            are merged. Defaults to ResearchConfig.QUERY_DEDUP_THRESHOLD; if
+            that is None, nothing is merged.
+        existing (list, optional): Queries already searched; candidates similar
+            to any of them are dropped as well.
+
+    Returns:
+        tuple: (kept queries, dict mapping each dropped query to the query it
+            was merged into).
+    """
+    threshold = ResearchConfig.QUERY_DEDUP_THRESHOLD if threshold is None else threshold
+    if threshold is None:
+        return list(queries), {}
+    index = QueryIndex()
+    for query in existing or []:
+        index.add(query)
+
+    kept = []
+    merged = {}
+    for query in queries:
+        match = index.find(query, threshold)
+        if match:
+            merged[query] = match[0]
+            continue
+        kept.append(query)
+        index.add(query)
+    return kept, merged
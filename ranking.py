@@ -0,0 +1,100 @@
+import heapq
+import math
+import re
+from array import array
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the "
+    "this to was were what when where which who why will with".split()
+)
+
+def tokenize(text):
+    """
+    Splits text into lowercase word tokens, dropping common English stopwords.
+    """
+    if not text:
+        return []
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+class BM25:
+    """
+    Okapi BM25 ranking backed by an inverted index.
+
+    Documents can be given up front or added one at a time with add(). Postings
+    are stored as compact integer arrays so large indexes (tens of thousands of
+    chunks) stay small in memory.
+
+    Args:
+        documents (list, optional): Token lists, one per document (see tokenize()).
+        k1 (float): Term frequency saturation.
+        b (float): Document length normalization.
+    """
+
+    def __init__(self, documents=None, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = array("I")
+        self.total_length = 0
+
+        # term -> (array of doc ids, array of term frequencies)
+        self.postings = {}
+        for doc in documents or []:
+            self.add(doc)
+
+    @property
+    def doc_count(self):
+        return len(self.doc_lengths)
+
+    @property
+    def avg_length(self):
+        return (self.total_length / self.doc_count) if self.doc_count else 0.0
+
+    def add(self, tokens):
+        """
+        Indexes one more document and returns its id.
+        """
+        doc_id = len(self.doc_lengths)
+        self.doc_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        for term, freq in Counter(tokens).items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array("I"), array("I"))
+            entry[0].append(doc_id)
+            entry[1].append(freq)
+        return doc_id
+
+    def idf(self, term):
+        entry = self.postings.get(term)
+        df = len(entry[0]) if entry else 0
+        return math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def scores(self, query_tokens):
+        """
+        Returns a BM25 score for every document, in document order.
+        """
+        scores = [0.0] * self.doc_count
+        avg_length = self.avg_length
+        if not avg_length:
+            return scores
+        k1, b = self.k1, self.b
+        doc_lengths = self.doc_lengths
+        for term in set(query_tokens):
+            entry = self.postings.get(term)
+            if not entry:
+                continue
+            idf = self.idf(term)
+            for doc_id, freq in zip(*entry):
+                norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * freq * (k1 + 1) / (freq + norm)
+        return scores
+
+    def top_k(self, query_tokens, k):
+        """
+        Returns (doc_id, score) pairs for the k best matching documents with a positive score.
+        """
+        scored = ((doc_id, score) for doc_id, score in enumerate(self.scores(query_tokens)) if score > 0)
+        return heapq.nsmallest(k, scored, key=lambda pair: (-pair[1], pair[0]))
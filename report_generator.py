@@ -1,165 +1,309 @@
 import os
 import datetime
+import html
 import markdown
 import json
 import re
 from config import ReportConfig
+from report_index import index_report
+from result_dedup import ResultCollapser
 
-def _json_to_html(data):
+# Sections are written in pipeline order but displayed in this order
+SECTION_ORDER = {
+    "topic": 0,
+    "answer": 1,
+    "timings": 2,
+    "plan": 3,
+    "results": 4,
+}
+
+_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Research Report: {title}</title>
+    <style>
+        body {{ font-family: sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }}
+        h1 {{ color: #2c3e50; }}
+        h2 {{ color: #34495e; border-bottom: 2px solid #ecf0f1; padding-bottom: 10px; }}
+        .report {{ display: flex; flex-direction: column; }}
+        .section {{ margin-bottom: 30px; }}
+        table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; vertical-align: top; }}
+        th {{ background-color: #f2f2f2; }}
+        .source-url {{ font-size: 0.9em; color: #7f8c8d; }}
+        .answer {{ background-color: #f9f9f9; padding: 20px; border-radius: 5px; border: 1px solid #e0e0e0; }}
+        ul {{ padding-left: 20px; }}
+        li {{ margin-bottom: 5px; }}
+    </style>
+</head>
+<body>
+    <h1>Deep Research Report</h1>
+    <div class="report">
+"""
+
+_FOOTER = """    </div>
+    <div class="footer">
+        <p>Generated by Deep Research Agent on {timestamp}</p>
+    </div>
+</body>
+</html>
+"""
+
+def _escape(value):
+    return html.escape(str(value), quote=True)
+
+def _safe_url(url):
+    url = str(url or "").strip()
+    if not re.match(r"https?://", url, re.IGNORECASE):
+        return "#"
+    return _escape(url)
+
+def _iter_json_html(data):
     """
-    Recursively converts a JSON object (dict or list) into an HTML structure.
-    And renders markdown for string values.
+    Yields the HTML fragments for a JSON object (dict or list), rendering
+    markdown for string values.
     """
     if isinstance(data, dict):
-        html = '<table style="width: 100%; border-collapse: collapse; margin-top: 10px;">'
+        yield '<table style="width: 100%; border-collapse: collapse; margin-top: 10px;">'
         for key, value in data.items():
-            html += f'<tr><th style="width: 30%; background-color: #f2f2f2; border: 1px solid #ddd; padding: 8px; vertical-align: top;">{key}</th>'
-            html += f'<td style="border: 1px solid #ddd; padding: 8px;">{_json_to_html(value)}</td></tr>'
-        html += '</table>'
-        return html
+            yield f'<tr><th style="width: 30%; background-color: #f2f2f2; border: 1px solid #ddd; padding: 8px; vertical-align: top;">{_escape(key)}</th>'
+            yield '<td style="border: 1px solid #ddd; padding: 8px;">'
+            yield from _iter_json_html(value)
+            yield '</td></tr>'
+        yield '</table>'
     elif isinstance(data, list):
-        html = '<ul>'
+        yield '<ul>'
         for item in data:
-            html += f'<li>{_json_to_html(item)}</li>'
-        html += '</ul>'
-        return html
+            yield '<li>'
+            yield from _iter_json_html(item)
+            yield '</li>'
+        yield '</ul>'
     elif isinstance(data, str):
         # Render markdown content
-        # Check if it's a simple string to avoid excessive <p> tags for short values?
-        # Markdown usually wraps in <p>. 
-        # For tables, <p> is fine.
-        return markdown.markdown(data)
+        yield markdown.markdown(data)
     else:
-        return str(data)
+        yield _escape(data)
 
-def generate_html_report(data):
+def _json_to_html(data):
     """
-    Generates an HTML report from the research data.
-    
-    Args:
-        data (dict): Contains 'query', 'search_results', and 'final_answer'.
-    
-    Returns:
-        str: The path to the generated HTML file.
+    Converts a JSON object (dict or list) into an HTML structure.
+    And renders markdown for string values.
+    """
+    return "".join(_iter_json_html(data))
+
+def _answer_to_html(final_answer):
+    """
+    Renders the final answer, as a table if it contains a JSON object and as
+    markdown otherwise.
     """
-    query = data.get("query", "Unknown Query")
-    search_results = data.get("search_results", [])
-    final_answer = data.get("final_answer", "")
-    
-    # Create results directory if it doesn't exist
-    results_dir = ReportConfig.RESULTS_DIR
-    if not os.path.exists(results_dir):
-        os.makedirs(results_dir)
-        
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"research_report_{timestamp}.html"
-    filepath = os.path.join(results_dir, filename)
-    
-    # Try to parse final_answer as JSON
-    final_answer_html = ""
-    json_parsed = False
-    
     # Clean up <think> blocks if present
     cleaned_answer = re.sub(r"<think>.*?</think>", "", final_answer, flags=re.DOTALL).strip()
-    
+
     # Attempt to find JSON block
     # Look for content between ```json and ``` or just start/end braces
     json_match = re.search(r"```json\s*(.*?)\s*```", cleaned_answer, re.DOTALL)
     if not json_match:
         json_match = re.search(r"(\{.*\})", cleaned_answer, re.DOTALL)
-        
+
     if json_match:
         json_str = json_match.group(1) if json_match.lastindex else json_match.group(0)
         try:
-            parsed_json = json.loads(json_str)
-            final_answer_html = _json_to_html(parsed_json)
-            json_parsed = True
+            return _json_to_html(json.loads(json_str))
         except json.JSONDecodeError:
             pass
-            
-    if not json_parsed:
-        # Convert Markdown answer to HTML
-        final_answer_html = markdown.markdown(final_answer)
-    
-    # Build HTML content
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Research Report: {query}</title>
-        <style>
-            body {{ font-family: sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }}
-            h1 {{ color: #2c3e50; }}
-            h2 {{ color: #34495e; border-bottom: 2px solid #ecf0f1; padding-bottom: 10px; }}
-            .section {{ margin-bottom: 30px; }}
-            table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
-            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; vertical-align: top; }}
-            th {{ background-color: #f2f2f2; }}
-            .source-url {{ font-size: 0.9em; color: #7f8c8d; }}
-            .answer {{ background-color: #f9f9f9; padding: 20px; border-radius: 5px; border: 1px solid #e0e0e0; }}
-            ul {{ padding-left: 20px; }}
-            li {{ margin-bottom: 5px; }}
-        </style>
-    </head>
-    <body>
-        <h1>Deep Research Report</h1>
-        
-        <div class="section">
-            <h2>Research Topic</h2>
-            <p><strong>{query}</strong></p>
-        </div>
-        
-        <div class="section">
-            <h2>Final Answer</h2>
-            <div class="answer">
-                {final_answer_html}
-            </div>
-        </div>
-        
-        <div class="section">
-            <h2>Raw Search Results</h2>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Source</th>
-                        <th>Content Snippet</th>
-                    </tr>
-                </thead>
-                <tbody>
+
+    # Convert Markdown answer to HTML
+    return markdown.markdown(final_answer)
+
+def _format_number(value, fmt):
+    return format(value, fmt) if isinstance(value, (int, float)) else "-"
+
+def _iter_timings_html(trace):
+    """
+    Yields a trace (see tracing.Tracer) as a timing breakdown table.
     """
-    
-    for res in search_results:
-        if "results" in res:
-            for item in res["results"]:
-                title = item.get("title", "No Title")
-                url = item.get("url", "#")
-                content = item.get("content", "No Content")
-                
-                html_content += f"""
-                    <tr>
-                        <td>
-                            <strong>{title}</strong><br>
-                            <a href="{url}" class="source-url" target="_blank">{url}</a>
-                        </td>
-                        <td>{content}</td>
-                    </tr>
-                """
-    
-    html_content += """
-                </tbody>
-            </table>
-        </div>
-        
-        <div class="footer">
-            <p>Generated by Deep Research Agent on """ + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + """</p>
-        </div>
-    </body>
-    </html>
+    yield '<table>'
+    yield '<thead><tr><th>Stage</th><th>Start (s)</th><th>Duration (s)</th>'
+    yield '<th>Tokens (prompt / generated)</th><th>Bytes (sent / received)</th><th>Details</th></tr></thead><tbody>'
+    for span in trace.get("spans", []):
+        tokens = "-"
+        if "eval_count" in span:
+            tokens = f"{span.get('prompt_eval_count', '-')} / {span['eval_count']}"
+        transfer = "-"
+        if "bytes_sent" in span or "bytes_received" in span:
+            transfer = f"{span.get('bytes_sent', '-')} / {span.get('bytes_received', '-')}"
+        details = []
+        if "query" in span:
+            details.append(span["query"])
+        if span.get("cache_hit"):
+            details.append("cache hit")
+        if "time_to_first_token" in span:
+            details.append(f"first token {span['time_to_first_token']:.2f}s")
+        if "error" in span:
+            details.append(f"error: {span['error']}")
+        yield (
+            f'<tr><td>{_escape(span["name"])}</td><td>{_format_number(span.get("start"), ".2f")}</td>'
+            f'<td>{_format_number(span.get("duration"), ".2f")}</td><td>{tokens}</td><td>{transfer}</td>'
+            f'<td>{_escape("; ".join(details))}</td></tr>'
+        )
+    yield f'<tr><th>Total</th><td></td><td>{_format_number(trace.get("total_time"), ".2f")}</td><td></td><td></td><td></td></tr>'
+    yield '</tbody></table>'
+
+def _iter_result_rows(entries):
+    for item in entries:
+        title = _escape(item.get("title") or "No Title")
+        url = item.get("url") or "#"
+        content = _escape(item.get("content") or "No Content")
+        also_at = ""
+        if item.get("duplicate_urls"):
+            links = ", ".join(
+                f'<a href="{_safe_url(other)}" target="_blank">{_escape(other)}</a>' for other in item["duplicate_urls"]
+            )
+            also_at = f'<br><span class="source-url">Also at: {links}</span>'
+        queries = "<br>".join(_escape(query) for query in item.get("queries", []))
+        yield (
+            f'<tr><td><strong>{title}</strong><br>'
+            f'<a href="{_safe_url(url)}" class="source-url" target="_blank">{_escape(url)}</a>{also_at}</td>'
+            f'<td>{content}</td><td>{queries}</td></tr>\n'
+        )
+
+def _default_report_path():
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(ReportConfig.RESULTS_DIR, f"research_report_{timestamp}.html")
+
+class ReportWriter:
+    """
+    Writes an HTML report section by section, straight to disk.
+
+    Sections can be written as soon as the pipeline stage producing them
+    finishes; CSS ordering keeps the displayed layout fixed regardless of the
+    order they were written in. Nothing but the current section is held in
+    memory, so reports with many (or very large) search results stay cheap.
+
+    Args:
+        query (str): The research topic, written immediately.
+        filepath (str, optional): Where to write the report. Defaults to a
+            timestamped file in ReportConfig.RESULTS_DIR.
+    """
+
+    def __init__(self, query, filepath=None):
+        self.filepath = filepath if filepath else _default_report_path()
+        results_dir = os.path.dirname(self.filepath)
+        if results_dir and not os.path.exists(results_dir):
+            os.makedirs(results_dir, exist_ok=True)
+
+        self._file = open(self.filepath, "w", encoding="utf-8")
+        self._results_open = False
+        # Collapses duplicates across all write_search_results calls
+        self._collapser = ResultCollapser()
+        self._file.write(_HEAD.format(title=_escape(query)))
+        self.write_section("Research Topic", f"<p><strong>{_escape(query)}</strong></p>", order=SECTION_ORDER["topic"])
+
+    def _write_all(self, fragments):
+        write = self._file.write
+        for fragment in fragments:
+            write(fragment)
+
+    def write_section(self, title, body, order=None):
+        """
+        Writes a complete section. body may be a string or an iterable of HTML fragments.
+        """
+        self._close_results()
+        style = f' style="order: {order}"' if order is not None else ""
+        self._file.write(f'<div class="section"{style}>\n<h2>{_escape(title)}</h2>\n')
+        self._write_all([body] if isinstance(body, str) else body)
+        self._file.write("\n</div>\n")
+        self._file.flush()
+
+    def write_plan(self, queries, merged=None):
+        """
+        Lists the search queries, and any planned queries merged into them as near-duplicates.
+        """
+        items = "".join(f"<li>{_escape(query)}</li>" for query in queries)
+        body = f"<ul>{items}</ul>"
+        if merged:
+            merged_items = "".join(
+                f"<li>{_escape(query)} &rarr; {_escape(kept)}</li>" for query, kept in merged.items()
+            )
+            body += f"<p>Merged near-duplicate queries:</p><ul>{merged_items}</ul>"
+        self.write_section("Search Plan", body, order=SECTION_ORDER["plan"])
+
+    def write_answer(self, final_answer):
+        body = f'<div class="answer">\n{_answer_to_html(final_answer)}\n</div>'
+        self.write_section("Final Answer", body, order=SECTION_ORDER["answer"])
+
+    def write_timings(self, trace):
+        if ReportConfig.INCLUDE_TIMINGS and trace:
+            self.write_section("Timing Breakdown", _iter_timings_html(trace), order=SECTION_ORDER["timings"])
+
+    def write_search_results(self, search_results):
+        """
+        Appends rows to the Raw Search Results table. May be called once per
+        search round; consecutive calls share one table.
+
+        Results already shown (same canonical URL or near-duplicate content)
+        are not repeated; each row lists the queries that found it when it was written.
+        """
+        if not self._results_open:
+            self._file.write(
+                f'<div class="section" style="order: {SECTION_ORDER["results"]}">\n<h2>Raw Search Results</h2>\n'
+                '<table>\n<thead><tr><th>Source</th><th>Content Snippet</th><th>Found by</th></tr></thead>\n<tbody>\n'
+            )
+            self._results_open = True
+        self._write_all(_iter_result_rows(self._collapser.add_results(search_results)))
+        self._file.flush()
+
+    def _close_results(self):
+        if self._results_open:
+            self._file.write("</tbody>\n</table>\n")
+            stats = self._collapser.stats()
+            collapsed = stats["url_duplicates"] + stats["content_duplicates"]
+            if collapsed:
+                self._file.write(
+                    f'<p class="source-url">{collapsed} duplicate results collapsed '
+                    f'({stats["url_duplicates"]} same URL, {stats["content_duplicates"]} near-duplicate content).</p>\n'
+                )
+            self._file.write("</div>\n")
+            self._results_open = False
+
+    def close(self):
+        """
+        Writes the footer and closes the file. Returns the report path.
+        """
+        if not self._file.closed:
+            self._close_results()
+            self._file.write(_FOOTER.format(timestamp=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            self._file.close()
+        return self.filepath
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def generate_html_report(data, filepath=None, index=True):
+    """
+    Generates an HTML report from the research data.
+
+    Args:
+        data (dict): Contains 'query', 'search_results', and 'final_answer',
+            and optionally a 'trace' rendered as a timing breakdown.
+        filepath (str, optional): Where to write the report. Defaults to a
+            timestamped file in ReportConfig.RESULTS_DIR.
+        index (bool): Also write the JSON sidecar and add the report to the
+            report index (see report_index.index_report). Callers that move
+            the report into place afterwards index it themselves.
+
+    Returns:
+        str: The path to the generated HTML file.
     """
-    
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(html_content)
-        
-    return filepath
+    with ReportWriter(data.get("query", "Unknown Query"), filepath=filepath) as writer:
+        writer.write_answer(data.get("final_answer", ""))
+        writer.write_timings(data.get("trace"))
+        writer.write_search_results(data.get("search_results", []))
+    if index:
+        index_report(writer.filepath, data)
+    return writer.filepath
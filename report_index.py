@@ -0,0 +1,435 @@
+import datetime
+import html
+import json
+import os
+import re
+import sqlite3
+import time
+from config import ReportConfig
+from html_text import clean_text
+
+_PAGE_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Research Reports</title>
+    <style>
+        body { font-family: sans-serif; line-height: 1.6; max-width: 900px; margin: 0 auto; padding: 20px; }
+        h1 { color: #2c3e50; }
+        .reports { display: flex; flex-direction: column-reverse; }
+        .entry { border-bottom: 1px solid #ecf0f1; padding: 10px 0; }
+        .meta { font-size: 0.9em; color: #7f8c8d; }
+    </style>
+</head>
+<body>
+    <h1>Research Reports</h1>
+    <p class="meta">Newest first. Search them with <code>python main.py --search-reports "terms"</code>.</p>
+    <div class="reports">
+"""
+# New entries are written over this footer, which is then written again
+_PAGE_FOOT = """    </div>
+</body>
+</html>
+"""
+
+def sidecar_path(report_path):
+    """
+    Returns where the JSON sidecar of a report is written.
+    """
+    return os.path.splitext(report_path)[0] + ".json"
+
+def build_sidecar(data, report_path):
+    """
+    Summarizes a research result for the index: the query, the answer text
+    without its <think> block, each source once with the queries that found
+    it, and the stage timings.
+
+    Args:
+        data (dict): The result of DeepResearchAgent.run (or refresh).
+        report_path (str): The HTML report the result was written to.
+    """
+    sources = {}
+    for search in data.get("search_results", []):
+        for item in search.get("results", []):
+            url = item.get("url")
+            if not url:
+                continue
+            source = sources.setdefault(url, {"title": item.get("title") or "", "url": url, "queries": []})
+            query = search.get("query")
+            if query and query not in source["queries"]:
+                source["queries"].append(query)
+
+    trace = data.get("trace") or {}
+    stages = {name: totals["duration"] for name, totals in trace.get("summary", {}).items() if "duration" in totals}
+    return {
+        "report": os.path.basename(report_path),
+        "query": data.get("query", ""),
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "answer": re.sub(r"<think>.*?</think>", "", data.get("final_answer", ""), flags=re.DOTALL).strip(),
+        "sources": list(sources.values()),
+        "timings": {"total_time": trace.get("total_time"), "stages": stages},
+    }
+
+_TITLE_RE = re.compile(r"<title>Research Report: (.*?)</title>", re.DOTALL)
+_ANSWER_START_RE = re.compile(r'<div class="answer">')
+# The answer ends where the next section (or the footer) starts
+_ANSWER_END_RE = re.compile(r'<div class="(?:section|footer)"')
+# Titles are HTML-escaped, so they hold no '<'
+_SOURCE_RE = re.compile(r'<strong>([^<]*)</strong><br>\s*<a href="([^"]*)" class="source-url"')
+
+def sidecar_from_report(report_path):
+    """
+    Rebuilds the sidecar of a report written without one (e.g. before the
+    index existed) from its HTML: the query, the answer text and the
+    sources. Which queries found each source and the timings are not
+    recovered.
+
+    Returns:
+        dict or None: The sidecar, or None if the file is not a research report.
+    """
+    with open(report_path, encoding="utf-8") as f:
+        page = f.read()
+    title = _TITLE_RE.search(page)
+    if title is None:
+        return None
+    answer = ""
+    start = _ANSWER_START_RE.search(page)
+    if start:
+        end = _ANSWER_END_RE.search(page, start.end())
+        answer = clean_text(page[start.end():end.start() if end else len(page)])
+    sources = {}
+    for source_title, url in _SOURCE_RE.findall(page):
+        url = html.unescape(url)
+        if url != "#":
+            sources.setdefault(url, {"title": html.unescape(source_title), "url": url, "queries": []})
+    modified = datetime.datetime.fromtimestamp(os.path.getmtime(report_path))
+    return {
+        "report": os.path.basename(report_path),
+        "query": html.unescape(title.group(1)).strip(),
+        "created_at": modified.isoformat(timespec="seconds"),
+        "answer": answer,
+        "sources": list(sources.values()),
+        "timings": {"total_time": None, "stages": {}},
+    }
+
+def _match_expression(text):
+    # Every word must match, in any column; quoting keeps FTS5 syntax characters literal
+    words = re.findall(r"\w+", text)
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+class ReportIndex:
+    """
+    Full-text index and HTML index page over the reports in the results
+    directory.
+
+    Reports are added one at a time as they are written (see index_report):
+    the sidecar goes into an SQLite FTS5 table and one entry is written over
+    the closing tags at the end of the index page (which are then written
+    again), so neither the directory nor the HTML reports are ever
+    rescanned. Re-indexing a report (e.g. a batch re-run) replaces its
+    entry and marks the page stale; refresh_page() then rewrites it from the
+    index once, however many reports were replaced. Safe to use from several
+    threads and processes; writes are serialized by SQLite.
+
+    Args:
+        path (str, optional): SQLite file. Defaults to ReportConfig.INDEX_PATH.
+        page_path (str, optional): HTML index page. Defaults to ReportConfig.INDEX_PAGE.
+    """
+
+    def __init__(self, path=None, page_path=None):
+        self.path = path if path else ReportConfig.INDEX_PATH
+        self.page_path = page_path if page_path else ReportConfig.INDEX_PAGE
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " path TEXT NOT NULL UNIQUE,"
+            " query TEXT NOT NULL,"
+            " created_at TEXT NOT NULL,"
+            " num_sources INTEGER NOT NULL,"
+            " total_time REAL,"
+            " preview TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(query, answer, sources, tokenize='unicode61')"
+        )
+        # Holds 'page_stale' while replaced reports still show their old entries
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def add(self, report_path, sidecar, update_page=True):
+        """
+        Indexes one report and adds it to the index page. A report that was
+        already indexed only marks the page stale (see refresh_page).
+
+        Args:
+            report_path (str): The HTML report.
+            sidecar (dict): Its summary (see build_sidecar).
+            update_page (bool): Update the index page too. Callers adding many
+                reports at once pass False and call write_page() at the end.
+        """
+        path = os.path.abspath(report_path)
+        preview = " ".join(sidecar["answer"].split())[:ReportConfig.INDEX_PREVIEW_CHARS]
+        sources = " ".join(f"{source['title']} {source['url']}" for source in sidecar["sources"])
+        row = (
+            sidecar["query"], sidecar["created_at"], len(sidecar["sources"]),
+            sidecar["timings"].get("total_time"), preview,
+        )
+        # BEGIN IMMEDIATE takes the write lock up front, so page appends are serialized too
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = self._conn.execute("SELECT id FROM reports WHERE path = ?", (path,)).fetchone()
+            if existing:
+                report_id = existing[0]
+                self._conn.execute(
+                    "UPDATE reports SET query = ?, created_at = ?, num_sources = ?, total_time = ?, preview = ?"
+                    " WHERE id = ?", row + (report_id,)
+                )
+                self._conn.execute("DELETE FROM reports_fts WHERE rowid = ?", (report_id,))
+            else:
+                report_id = self._conn.execute(
+                    "INSERT INTO reports (query, created_at, num_sources, total_time, preview, path)"
+                    " VALUES (?, ?, ?, ?, ?, ?)", row + (path,)
+                ).lastrowid
+            self._conn.execute(
+                "INSERT INTO reports_fts (rowid, query, answer, sources) VALUES (?, ?, ?, ?)",
+                (report_id, sidecar["query"], sidecar["answer"], sources),
+            )
+            # A new entry is appended; a replaced one leaves the page for refresh_page()
+            if existing:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('page_stale', '1')")
+            elif update_page and (report_id == 1 or not self._append_entry(self._page_entry(path, *row))):
+                self.write_page()
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return report_id
+
+    def search(self, text, limit=20):
+        """
+        Finds the reports whose query, answer or sources contain every word
+        of text, best matches (BM25) first.
+
+        Returns:
+            list: Dicts with 'path', 'query', 'created_at', 'num_sources' and
+                'snippet' (matching answer text, matches in [brackets]).
+        """
+        expression = _match_expression(text)
+        if not expression:
+            return []
+        rows = self._conn.execute(
+            "SELECT r.path, r.query, r.created_at, r.num_sources,"
+            " snippet(reports_fts, 1, '[', ']', '...', 16)"
+            " FROM reports_fts JOIN reports r ON r.id = reports_fts.rowid"
+            " WHERE reports_fts MATCH ? ORDER BY bm25(reports_fts, 10.0, 1.0, 2.0) LIMIT ?",
+            (expression, limit),
+        ).fetchall()
+        return [
+            {"path": r[0], "query": r[1], "created_at": r[2], "num_sources": r[3], "snippet": r[4]}
+            for r in rows
+        ]
+
+    def refresh_page(self):
+        """
+        Rewrites the index page if replaced reports have left it stale.
+
+        Returns:
+            bool: True if the page was rewritten.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            stale = self._conn.execute("SELECT 1 FROM meta WHERE key = 'page_stale'").fetchone() is not None
+            if stale:
+                self.write_page()
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return stale
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def _page_entry(self, path, query, created_at, num_sources, total_time, preview):
+        link = os.path.relpath(path, os.path.dirname(os.path.abspath(self.page_path)))
+        duration = f", {total_time:.1f}s" if total_time is not None else ""
+        return (
+            f'<div class="entry"><a href="{html.escape(link.replace(os.sep, "/"), quote=True)}">'
+            f"<strong>{html.escape(query)}</strong></a>"
+            f'<div class="meta">{html.escape(created_at)}, {num_sources} sources{duration}</div>'
+            f"<div>{html.escape(preview)}</div></div>\n"
+        )
+
+    def _append_entry(self, entry):
+        """
+        Writes entry over the page's footer and closes the page again.
+
+        Returns:
+            bool: False if the page is missing or does not end with the footer.
+        """
+        footer = _PAGE_FOOT.encode("utf-8")
+        try:
+            with open(self.page_path, "r+b") as f:
+                end = f.seek(0, os.SEEK_END) - len(footer)
+                if end < 0:
+                    return False
+                f.seek(end)
+                if f.read() != footer:
+                    return False
+                f.seek(end)
+                f.write(entry.encode("utf-8") + footer)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def write_page(self):
+        """
+        Rewrites the index page from the index.
+        """
+        tmp_path = self.page_path + ".tmp"
+        # newline="\n" keeps the footer byte-identical to _PAGE_FOOT on every platform
+        with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(_PAGE_HEAD)
+            rows = self._conn.execute(
+                "SELECT path, query, created_at, num_sources, total_time, preview FROM reports ORDER BY id"
+            )
+            for row in rows:
+                f.write(self._page_entry(*row))
+            f.write(_PAGE_FOOT)
+        os.replace(tmp_path, self.page_path)
+        self._conn.execute("DELETE FROM meta WHERE key = 'page_stale'")
+
+    def close(self):
+        self._conn.close()
+
+def _in_results_dir(report_path):
+    results_dir = os.path.abspath(ReportConfig.RESULTS_DIR)
+    try:
+        return os.path.commonpath([results_dir, os.path.abspath(report_path)]) == results_dir
+    except ValueError:
+        # On another drive (Windows)
+        return False
+
+def index_report(report_path, data, refresh_page=True):
+    """
+    Writes the JSON sidecar of a report and, if ReportConfig.INDEX_ENABLED and
+    the report lies in ReportConfig.RESULTS_DIR (batch reports in a
+    subdirectory included), adds it to the report index.
+
+    Args:
+        report_path (str): The HTML report.
+        data (dict): The research result it was written from.
+        refresh_page (bool): Rewrite a stale index page right away. A batch
+            that replaces many reports passes False and calls
+            refresh_index_page() once at the end.
+
+    Returns:
+        str: The sidecar path.
+    """
+    sidecar = build_sidecar(data, report_path)
+    path = sidecar_path(report_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False)
+
+    if ReportConfig.INDEX_ENABLED and _in_results_dir(report_path):
+        index = ReportIndex()
+        try:
+            index.add(report_path, sidecar)
+            if refresh_page:
+                index.refresh_page()
+        finally:
+            index.close()
+    return path
+
+def refresh_index_page():
+    """
+    Rewrites the index page if reports replaced since it was last written
+    have left it stale (see ReportIndex.refresh_page).
+
+    Returns:
+        bool: True if the page was rewritten.
+    """
+    if not ReportConfig.INDEX_ENABLED or not os.path.exists(ReportConfig.INDEX_PATH):
+        return False
+    index = ReportIndex()
+    try:
+        return index.refresh_page()
+    finally:
+        index.close()
+
+def reindex_reports():
+    """
+    Adds every report in ReportConfig.RESULTS_DIR (batch subdirectories
+    included) to the report index and rewrites the index page, e.g. for
+    reports written before the index existed. Reports without a JSON
+    sidecar get one, rebuilt from their HTML (see sidecar_from_report).
+
+    Returns:
+        int: The number of reports indexed.
+    """
+    page_path = os.path.abspath(ReportConfig.INDEX_PAGE)
+    reports = []
+    for directory, _, names in os.walk(ReportConfig.RESULTS_DIR):
+        for name in names:
+            path = os.path.join(directory, name)
+            if name.endswith(".html") and os.path.abspath(path) != page_path:
+                reports.append(path)
+    # Oldest first, so the page lists the newest reports first
+    reports.sort(key=os.path.getmtime)
+
+    start = time.perf_counter()
+    indexed = 0
+    rebuilt = 0
+    index = ReportIndex()
+    try:
+        for report_path in reports:
+            path = sidecar_path(report_path)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    sidecar = json.load(f)
+            else:
+                sidecar = sidecar_from_report(report_path)
+                if sidecar is None:
+                    continue
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(sidecar, f, ensure_ascii=False)
+                rebuilt += 1
+            index.add(report_path, sidecar, update_page=False)
+            indexed += 1
+        index.write_page()
+    finally:
+        index.close()
+    print(
+        f"Indexed {indexed} reports ({rebuilt} sidecars rebuilt from HTML) in "
+        f"{time.perf_counter() - start:.1f}s; index page: {ReportConfig.INDEX_PAGE}"
+    )
+    return indexed
+
+def search_reports(text, limit=20):
+    """
+    Searches the report index and prints the matches.
+    """
+    if not os.path.exists(ReportConfig.INDEX_PATH):
+        print(f"No report index at {ReportConfig.INDEX_PATH} yet; build one with --reindex.")
+        return []
+    start = time.perf_counter()
+    index = ReportIndex()
+    try:
+        matches = index.search(text, limit=limit)
+        total = index.count()
+    finally:
+        index.close()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for match in matches:
+        print(f"{match['created_at']}  {match['query']}  ({match['num_sources']} sources)")
+        print(f"    {match['path']}")
+        if match["snippet"]:
+            print(f"    {' '.join(match['snippet'].split())}")
+    print(f"{len(matches)} matching reports of {total} in {elapsed_ms:.1f} ms")
+    return matches
@@ -0,0 +1,220 @@
+import functools
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from config import ResearchConfig
+from html_text import clean_text
+from ranking import tokenize
+
+# Query parameters that only track where a click came from
+_TRACKING_PARAM_RE = re.compile(
+    r"^(?:utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|igshid|ref|ref_src|spm|_hsenc|_hsmi)$",
+    re.IGNORECASE,
+)
+_INDEX_PAGE_RE = re.compile(r"/(?:index|default)\.(?:html?|php|aspx?)$", re.IGNORECASE)
+_DEFAULT_PORTS = {80, 443}
+
+SIMHASH_BITS = 64
+_MASK = (1 << SIMHASH_BITS) - 1
+_K1 = 0x9E3779B97F4A7C15
+_K2 = 0xC2B2AE3D27D4EB4F
+# Leading words of each page used for its fingerprint; copies of a page
+# share their beginning, and a bounded prefix keeps fingerprinting cheap
+_FINGERPRINT_WORDS = 256
+_FINGERPRINT_CHARS = _FINGERPRINT_WORDS * 12  # Generous, so markup-heavy pages still yield enough words
+# Shorter texts (placeholders, one-line snippets) are too short to tell apart
+_MIN_WORDS = 8
+
+def canonical_url(url):
+    """
+    Normalizes a URL so links to the same page compare equal: scheme and
+    'www.' are ignored, default ports, fragments, tracking parameters and
+    trailing slashes or index pages are dropped and query parameters sorted.
+
+    Returns:
+        str: The canonical URL, or None for an empty URL.
+    """
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port not in _DEFAULT_PORTS:
+        host = f"{host}:{port}"
+    path = _INDEX_PAGE_RE.sub("", re.sub(r"/{2,}", "/", parts.path)).rstrip("/")
+    params = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _TRACKING_PARAM_RE.match(key)
+    )
+    return urlunsplit(("", host, path, urlencode(params), "")).lstrip("/")
+
+def simhash(text):
+    """
+    Computes a 64-bit SimHash of the beginning of text over word 3-shingles.
+
+    Texts that share most of their shingles get fingerprints that differ in
+    only a few bits. Returns None for text too short to fingerprint.
+    """
+    if not text:
+        return None
+    # The same results are fingerprinted for synthesis and again for the report
+    return _simhash_prefix(text[:_FINGERPRINT_CHARS])
+
+@functools.lru_cache(maxsize=2048)
+def _simhash_prefix(text):
+    words = tokenize(clean_text(text))[:_FINGERPRINT_WORDS]
+    if len(words) < _MIN_WORDS:
+        return None
+    word_hashes = [_word_hash(word) for word in words]
+    # A shingle's hash combines the hashes of its three words, then one
+    # multiply-xorshift round spreads the bits (inlined, this is the hot loop)
+    hashes = set()
+    for a, b, c in zip(word_hashes, word_hashes[1:], word_hashes[2:]):
+        h = (a ^ (b * _K1) ^ (c * _K2)) & _MASK
+        h = ((h ^ (h >> 29)) * 0xBF58476D1CE4E5B9) & _MASK
+        hashes.add(h ^ (h >> 32))
+    # Concatenated binary strings of the feature hashes: every 64th character
+    # is one bit column, so each column is counted in C instead of a Python
+    # loop per bit and feature
+    bits = "".join([format(h, "064b") for h in hashes])
+    threshold = len(hashes) / 2
+    fingerprint = 0
+    for position in range(SIMHASH_BITS):
+        fingerprint = (fingerprint << 1) | (bits[position::SIMHASH_BITS].count("1") > threshold)
+    return fingerprint
+
+@functools.lru_cache(maxsize=65536)
+def _word_hash(word):
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+class ResultCollapser:
+    """
+    Collapses duplicate search results while keeping provenance.
+
+    Results are merged when their canonical URLs match or when their content
+    (full page text if available, otherwise the snippet) has SimHash
+    fingerprints at most max_distance bits apart. The fingerprint is split
+    into max_distance + 1 bands and only results sharing a band are compared,
+    so collapsing stays roughly linear in the number of results.
+
+    Each kept result is a copy of the first one seen, with 'queries' (every
+    query that returned it) and 'duplicate_urls' (other URLs collapsed into it).
+    Results can be added over several calls, e.g. one per search round.
+
+    Args:
+        max_distance (int, optional): Largest Hamming distance treated as a
+            near-duplicate. Defaults to ResearchConfig.NEAR_DUPLICATE_DISTANCE;
+            0 only collapses identical content.
+    """
+
+    def __init__(self, max_distance=None):
+        self.max_distance = ResearchConfig.NEAR_DUPLICATE_DISTANCE if max_distance is None else max_distance
+        self.entries = []
+        self.url_duplicates = 0
+        self.content_duplicates = 0
+
+        bands = self.max_distance + 1
+        self._band_width = SIMHASH_BITS // bands
+        self._band_mask = (1 << self._band_width) - 1
+        self._bands = bands
+        self._by_url = {}  # canonical URL -> entry index
+        self._buckets = {}  # (band, band value) -> entry indexes
+        self._fingerprints = []
+
+    def _band_keys(self, fingerprint):
+        return [
+            (band, (fingerprint >> (band * self._band_width)) & self._band_mask)
+            for band in range(self._bands)
+        ]
+
+    def _find_near_duplicate(self, fingerprint):
+        for key in self._band_keys(fingerprint):
+            for index in self._buckets.get(key, ()):
+                if hamming_distance(fingerprint, self._fingerprints[index]) <= self.max_distance:
+                    return index
+        return None
+
+    def add(self, item, query=None):
+        """
+        Adds one search result.
+
+        Returns:
+            tuple: (the entry the result was kept as or merged into, True if it is a new entry).
+        """
+        url = item.get("url")
+        url_key = canonical_url(url)
+        index = self._by_url.get(url_key) if url_key else None
+        if index is not None:
+            self.url_duplicates += 1
+        else:
+            fingerprint = simhash(item.get("raw_content") or item.get("content") or "")
+            if fingerprint is not None:
+                index = self._find_near_duplicate(fingerprint)
+            if index is not None:
+                self.content_duplicates += 1
+                if url_key:
+                    self._by_url[url_key] = index
+            else:
+                return self._new_entry(item, query, url_key, fingerprint), True
+
+        entry = self.entries[index]
+        if query and query not in entry["queries"]:
+            entry["queries"].append(query)
+        if url and url != entry.get("url") and url not in entry["duplicate_urls"]:
+            entry["duplicate_urls"].append(url)
+        if not entry.get("raw_content") and item.get("raw_content"):
+            entry["raw_content"] = item["raw_content"]
+        return entry, False
+
+    def _new_entry(self, item, query, url_key, fingerprint):
+        index = len(self.entries)
+        entry = dict(item, queries=[query] if query else [], duplicate_urls=[])
+        self.entries.append(entry)
+        self._fingerprints.append(fingerprint)
+        if url_key:
+            self._by_url[url_key] = index
+        if fingerprint is not None:
+            for key in self._band_keys(fingerprint):
+                self._buckets.setdefault(key, []).append(index)
+        return entry
+
+    def add_results(self, search_results):
+        """
+        Adds every result of a list of Tavily responses.
+
+        Returns:
+            list: The entries created by this call, in result order.
+        """
+        new_entries = []
+        for res in search_results:
+            for item in res.get("results", []):
+                entry, is_new = self.add(item, res.get("query"))
+                if is_new:
+                    new_entries.append(entry)
+        return new_entries
+
+    def stats(self):
+        return {
+            "unique": len(self.entries),
+            "url_duplicates": self.url_duplicates,
+            "content_duplicates": self.content_duplicates,
+        }
+
+def collapse_results(search_results, max_distance=None):
+    """
+    Flattens Tavily responses into unique results (see ResultCollapser).
+
+    Returns:
+        tuple: (list of result dicts with provenance, stats dict).
+    """
+    collapser = ResultCollapser(max_distance=max_distance)
+    collapser.add_results(search_results)
+    return collapser.entries, collapser.stats()
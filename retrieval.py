@@ -0,0 +1,180 @@
+import time
+from config import RetrievalConfig
+from context_packer import estimate_tokens, unique_results
+from html_text import clean_text
+from ranking import BM25, tokenize
+
+def chunk_text(text, chunk_words=None, overlap_words=None):
+    """
+    Splits text into overlapping chunks of about chunk_words words.
+
+    Yields:
+        str: Chunks in document order.
+    """
+    chunk_words = chunk_words or RetrievalConfig.CHUNK_WORDS
+    overlap_words = RetrievalConfig.CHUNK_OVERLAP if overlap_words is None else overlap_words
+    step = max(1, chunk_words - overlap_words)
+    words = text.split()
+    for start in range(0, max(len(words) - overlap_words, 1), step):
+        chunk = words[start:start + chunk_words]
+        if chunk:
+            yield " ".join(chunk)
+
+class ChunkIndex:
+    """
+    BM25 index over cleaned, chunked page text for one research run.
+
+    Each search result is indexed from its full page text when Tavily returned
+    it (raw_content) and from the snippet otherwise. Pages are truncated and
+    the number of chunks per page and in total is capped, so memory stays
+    bounded however many pages a run collects.
+
+    Args:
+        chunk_words (int, optional): Words per chunk.
+        overlap_words (int, optional): Words shared by consecutive chunks.
+        max_page_chars (int, optional): Page text beyond this is ignored.
+        max_chunks_per_page (int, optional): Chunks kept per page.
+        max_chunks (int, optional): Chunks kept in the whole index.
+    """
+
+    def __init__(self, chunk_words=None, overlap_words=None, max_page_chars=None,
+                 max_chunks_per_page=None, max_chunks=None):
+        self.chunk_words = chunk_words or RetrievalConfig.CHUNK_WORDS
+        self.overlap_words = RetrievalConfig.CHUNK_OVERLAP if overlap_words is None else overlap_words
+        self.max_page_chars = max_page_chars or RetrievalConfig.MAX_PAGE_CHARS
+        self.max_chunks_per_page = max_chunks_per_page or RetrievalConfig.MAX_CHUNKS_PER_PAGE
+        self.max_chunks = max_chunks or RetrievalConfig.MAX_INDEX_CHUNKS
+
+        self.bm25 = BM25()
+        self.pages = []  # search result dicts
+        self.chunks = []  # (page id, chunk text)
+        self.truncated_pages = 0
+
+    def add_page(self, item):
+        """
+        Cleans, chunks and indexes one search result. Returns the number of chunks added.
+        """
+        raw = item.get("raw_content") or item.get("content") or ""
+        if len(raw) > self.max_page_chars:
+            raw = raw[:self.max_page_chars]
+            self.truncated_pages += 1
+
+        page_id = len(self.pages)
+        self.pages.append(item)
+        # The title is indexed with every chunk so it counts towards each one's relevance
+        title_tokens = tokenize(item.get("title"))
+        added = 0
+        for chunk in chunk_text(clean_text(raw), self.chunk_words, self.overlap_words):
+            if added >= self.max_chunks_per_page or len(self.chunks) >= self.max_chunks:
+                break
+            self.bm25.add(title_tokens + tokenize(chunk))
+            self.chunks.append((page_id, chunk))
+            added += 1
+        return added
+
+    def search(self, query, k):
+        """
+        Returns (chunk id, score) pairs for the k chunks best matching query.
+        """
+        return self.bm25.top_k(tokenize(query), k)
+
+    def retrieve(self, queries, k):
+        """
+        Merges the top-k chunks of several queries, taking each query's best
+        hit in turn so every query is represented.
+
+        Returns:
+            list: Chunk ids, most relevant first, without duplicates.
+        """
+        hits = [[chunk_id for chunk_id, _ in self.search(query, k)] for query in queries]
+        selected = []
+        seen = set()
+        for rank in range(k):
+            for query_hits in hits:
+                if rank < len(query_hits) and query_hits[rank] not in seen:
+                    seen.add(query_hits[rank])
+                    selected.append(query_hits[rank])
+        return selected
+
+def format_excerpts(number, item, chunks):
+    """
+    Formats a search result and its retrieved chunks as a numbered source block.
+    """
+    excerpts = "".join(f"  ... {chunk}\n" for chunk in chunks)
+    return (
+        f"Source {number}:\n"
+        f"- Title: {item.get('title')}\n"
+        f"  URL: {item.get('url')}\n"
+        f"  Excerpts:\n{excerpts}\n"
+    )
+
+def pack_chunks(query, search_results, token_budget, sub_queries=None, top_k=None):
+    """
+    Selects the page chunks most relevant to the query and its search
+    queries that fit into a token budget.
+
+    Results are deduplicated by URL, indexed with ChunkIndex and the top_k
+    chunks per query are packed greedily. Chunks are grouped by page into
+    numbered sources, in the order each page was first selected.
+
+    Args:
+        query (str): The user query.
+        search_results (list): Tavily responses, one per search query.
+        token_budget (int): Maximum estimated tokens for the packed context.
+        sub_queries (list, optional): Search queries to retrieve for as well.
+            Defaults to the 'query' of each search response.
+        top_k (int, optional): Chunks retrieved per query.
+
+    Returns:
+        tuple: (context string, stats dict with the pack_context fields plus
+            'chunks', 'indexed_pages', 'indexed_chunks' and 'index_time').
+    """
+    top_k = top_k or RetrievalConfig.TOP_K
+    if sub_queries is None:
+        sub_queries = [res.get("query") for res in search_results]
+    queries = [query] + [q for q in dict.fromkeys(sub_queries) if q and q != query]
+
+    start = time.perf_counter()
+    items, duplicates = unique_results(search_results)
+    index = ChunkIndex()
+    for item in items:
+        index.add_page(item)
+    selected = index.retrieve(queries, top_k)
+    index_time = time.perf_counter() - start
+
+    # page id -> chunk ids, in the order pages are first selected
+    pages = {}
+    used_tokens = 0
+    dropped = 0
+    dropped_tokens = 0
+    for chunk_id in selected:
+        page_id, chunk = index.chunks[chunk_id]
+        cost = estimate_tokens(chunk) + 2
+        if page_id not in pages:
+            cost += estimate_tokens(format_excerpts(len(pages) + 1, index.pages[page_id], []))
+        if used_tokens + cost > token_budget:
+            dropped += 1
+            dropped_tokens += cost
+            continue
+        pages.setdefault(page_id, []).append(chunk_id)
+        used_tokens += cost
+
+    blocks = []
+    for number, (page_id, chunk_ids) in enumerate(pages.items(), 1):
+        # Chunk ids increase along the page, so sorting restores reading order
+        chunks = [index.chunks[chunk_id][1] for chunk_id in sorted(chunk_ids)]
+        blocks.append(format_excerpts(number, index.pages[page_id], chunks))
+
+    stats = {
+        "packed": len(pages),
+        "chunks": sum(len(chunk_ids) for chunk_ids in pages.values()),
+        "dropped": dropped,
+        "duplicates": duplicates,
+        "used_tokens": used_tokens,
+        "dropped_tokens": dropped_tokens,
+        "token_budget": token_budget,
+        "indexed_pages": len(index.pages),
+        "indexed_chunks": len(index.chunks),
+        "index_time": round(index_time, 4),
+    }
+    return "".join(blocks), stats
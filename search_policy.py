@@ -0,0 +1,154 @@
+import threading
+import time
+from config import AdaptiveSearchConfig
+from ranking import tokenize
+
+# Tavily API credits charged per search
+SEARCH_CREDITS = {"basic": 1, "advanced": 2}
+
+def term_coverage(query, results):
+    """
+    Returns the share (0-1) of the query's terms that appear in the titles or
+    content of the results.
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return 1.0
+    found = set()
+    for item in results:
+        found.update(tokenize(f"{item.get('title') or ''} {item.get('content') or ''}"))
+    return len(terms & found) / len(terms)
+
+class AdaptiveSearchPolicy:
+    """
+    Decides how deep and wide to search each query of one research run.
+
+    Every query starts as a basic search with BASIC_MAX_RESULTS results. A
+    query is escalated to an advanced search with ADVANCED_MAX_RESULTS when
+    its results look weak: the best relevance score is below MIN_TOP_SCORE,
+    fewer than MIN_RESULTS came back, or they mention less than MIN_COVERAGE
+    of the query's terms. Escalations are only made while the credits spent
+    so far (basic searches included; cached results are free) leave room for
+    one, and until the latency budget since the first search has passed.
+    Basic searches always run; one that fails is not escalated.
+
+    Each query's decision is kept in `decisions` so the thresholds can be
+    tuned from real runs. One policy is shared by the threads of a run.
+
+    Args:
+        credit_budget (int, optional): Defaults to AdaptiveSearchConfig.CREDIT_BUDGET.
+        latency_budget (float, optional): Seconds; defaults to AdaptiveSearchConfig.LATENCY_BUDGET.
+    """
+
+    def __init__(self, credit_budget=None, latency_budget=None):
+        self.credit_budget = AdaptiveSearchConfig.CREDIT_BUDGET if credit_budget is None else credit_budget
+        self.latency_budget = AdaptiveSearchConfig.LATENCY_BUDGET if latency_budget is None else latency_budget
+        self.credits_used = 0
+        self.decisions = []
+        self._start = None
+        self._lock = threading.Lock()
+
+    def basic_kwargs(self):
+        """
+        Returns the search parameters every query starts with.
+        """
+        with self._lock:
+            if self._start is None:
+                self._start = time.perf_counter()
+        return {"search_depth": "basic", "max_results": AdaptiveSearchConfig.BASIC_MAX_RESULTS}
+
+    def advanced_kwargs(self):
+        """
+        Returns the search parameters of an escalated query.
+        """
+        return {"search_depth": "advanced", "max_results": AdaptiveSearchConfig.ADVANCED_MAX_RESULTS}
+
+    def assess(self, query, result, stats=None):
+        """
+        Scores the basic search of a query and decides whether to escalate it.
+
+        Args:
+            query (str): The search query.
+            result (dict): Its basic search result.
+            stats (dict, optional): The search span; a 'cache_hit' costs no credits.
+
+        Returns:
+            dict: The recorded decision: 'query', 'top_score', 'num_results',
+                'coverage', 'reasons' (why the results look weak), 'escalated'
+                and 'skipped' (the budget that prevented an escalation, or None).
+        """
+        stats = stats or {}
+        decision = dict(query=query, **self._measure(query, result))
+        reasons = []
+        if result.get("error"):
+            reasons.append("error")
+        else:
+            if decision["top_score"] < AdaptiveSearchConfig.MIN_TOP_SCORE:
+                reasons.append("low score")
+            if decision["num_results"] < AdaptiveSearchConfig.MIN_RESULTS:
+                reasons.append("few results")
+            if decision["coverage"] < AdaptiveSearchConfig.MIN_COVERAGE:
+                reasons.append("low coverage")
+        decision.update(reasons=reasons, escalated=False, skipped=None, credits=0)
+
+        with self._lock:
+            if not result.get("error") and not stats.get("cache_hit"):
+                self.credits_used += SEARCH_CREDITS["basic"]
+                decision["credits"] += SEARCH_CREDITS["basic"]
+            # A failed basic search is not retried at advanced depth, which would cost 2 credits
+            if reasons and not result.get("error"):
+                elapsed = time.perf_counter() - self._start if self._start is not None else 0.0
+                if elapsed > self.latency_budget:
+                    decision["skipped"] = "latency budget"
+                elif self.credits_used + SEARCH_CREDITS["advanced"] > self.credit_budget:
+                    decision["skipped"] = "credit budget"
+                else:
+                    # Reserved now so concurrent queries cannot overspend the budget
+                    self.credits_used += SEARCH_CREDITS["advanced"]
+                    decision["credits"] += SEARCH_CREDITS["advanced"]
+                    decision["escalated"] = True
+            self.decisions.append(decision)
+        return decision
+
+    def settle(self, decision, basic, advanced, stats=None):
+        """
+        Records the outcome of an escalated search and returns the result to
+        keep: the advanced one, unless it failed.
+        """
+        stats = stats or {}
+        decision["advanced"] = self._measure(decision["query"], advanced)
+        with self._lock:
+            if advanced.get("error") or stats.get("cache_hit"):
+                # Failed and cached searches are not charged
+                self.credits_used -= SEARCH_CREDITS["advanced"]
+                decision["credits"] -= SEARCH_CREDITS["advanced"]
+        if advanced.get("error"):
+            decision["advanced"]["error"] = advanced["error"]
+            return basic
+        return advanced
+
+    def _measure(self, query, result):
+        items = result.get("results", [])
+        return {
+            "top_score": round(max((item.get("score") or 0.0 for item in items), default=0.0), 3),
+            "num_results": len(items),
+            "coverage": round(term_coverage(query, items), 3),
+        }
+
+    def summary(self):
+        """
+        Returns the run's totals and every decision, in the order the basic
+        searches finished.
+        """
+        with self._lock:
+            decisions = [dict(decision) for decision in self.decisions]
+            credits_used = self.credits_used
+        return {
+            "searched": len(decisions),
+            "escalated": sum(1 for decision in decisions if decision["escalated"]),
+            "skipped": sum(1 for decision in decisions if decision["skipped"]),
+            "credits_used": credits_used,
+            "credit_budget": self.credit_budget,
+            "latency_budget": self.latency_budget,
+            "decisions": decisions,
+        }
@@ -0,0 +1,195 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from cache import normalize_query
+from config import SessionConfig
+
+def _without_raw_content(search):
+    if not any("raw_content" in item for item in search.get("results", [])):
+        return search
+    results = [{k: v for k, v in item.items() if k != "raw_content"} for item in search["results"]]
+    return dict(search, results=results)
+
+class SessionStore:
+    """
+    Keeps every research run in SQLite so it can be read back, queried and
+    refreshed later (see DeepResearchAgent.refresh).
+
+    A session holds the topic, the plan, the answer, the research notes and
+    the trace; each of its searches is a row with the query, the result and
+    when it was fetched. Sessions are found by their normalized topic, so
+    "Coral reefs" and "coral reefs?" share a history. The store is safe to
+    share between threads.
+
+    Args:
+        path (str, optional): Location of the SQLite database file. Defaults
+            to SessionConfig.PATH.
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path else SessionConfig.PATH
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " topic TEXT NOT NULL,"
+            " topic_key TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " model TEXT,"
+            " plan TEXT NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " notes TEXT,"
+            " duration REAL,"
+            " trace TEXT,"
+            " report TEXT,"
+            " parent_id INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            " session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,"
+            " position INTEGER NOT NULL,"
+            " query TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " num_results INTEGER NOT NULL,"
+            " error TEXT,"
+            " result TEXT NOT NULL,"
+            " PRIMARY KEY (session_id, position))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_topic ON sessions (topic_key, created_at)")
+        self._conn.commit()
+
+    def save(self, result, model=None, report=None, parent_id=None):
+        """
+        Stores a run's result (as returned by DeepResearchAgent.run or refresh).
+
+        Searches are stamped with result['fetched_at'] when present (a refresh
+        keeps the time of the results it reused), otherwise with the current time.
+        Full page text (raw_content) is left out; a refresh that reuses a
+        search falls back to its snippets for retrieval.
+
+        Returns:
+            int: The new session's id.
+        """
+        now = time.time()
+        searches = result.get("search_results", [])
+        fetched_at = result.get("fetched_at") or [now] * len(searches)
+        trace = result.get("trace")
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO sessions (topic, topic_key, created_at, model, plan, answer, notes, duration, trace, report,"
+                " parent_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    result["query"],
+                    normalize_query(result["query"]),
+                    now,
+                    model,
+                    json.dumps([search.get("query") for search in searches], ensure_ascii=False),
+                    result.get("final_answer", ""),
+                    result.get("notes"),
+                    trace.get("total_time") if trace else None,
+                    json.dumps(trace, ensure_ascii=False) if trace else None,
+                    report,
+                    parent_id,
+                ),
+            )
+            session_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO searches (session_id, position, query, fetched_at, num_results, error, result)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        session_id, position, search.get("query", ""), fetched, len(search.get("results", [])),
+                        search.get("error"), json.dumps(_without_raw_content(search), ensure_ascii=False),
+                    )
+                    for position, (search, fetched) in enumerate(zip(searches, fetched_at))
+                ],
+            )
+            self._conn.commit()
+        return session_id
+
+    def get(self, session_id):
+        """
+        Returns a stored session with its searches, or None.
+
+        Returns:
+            dict: 'id', 'topic', 'created_at', 'model', 'plan', 'answer',
+                'notes', 'duration', 'trace', 'report', 'parent_id' and
+                'searches', a list of dicts with 'query', 'fetched_at',
+                'num_results', 'error' and 'result' (the search result dict).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, topic, created_at, model, plan, answer, notes, duration, trace, report, parent_id"
+                " FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            searches = self._conn.execute(
+                "SELECT query, fetched_at, num_results, error, result FROM searches"
+                " WHERE session_id = ? ORDER BY position", (session_id,)
+            ).fetchall()
+        return {
+            "id": row[0],
+            "topic": row[1],
+            "created_at": row[2],
+            "model": row[3],
+            "plan": json.loads(row[4]),
+            "answer": row[5],
+            "notes": row[6],
+            "duration": row[7],
+            "trace": json.loads(row[8]) if row[8] else None,
+            "report": row[9],
+            "parent_id": row[10],
+            "searches": [
+                {"query": s[0], "fetched_at": s[1], "num_results": s[2], "error": s[3], "result": json.loads(s[4])}
+                for s in searches
+            ],
+        }
+
+    def latest(self, topic):
+        """
+        Returns the most recent session for the topic, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM sessions WHERE topic_key = ? ORDER BY created_at DESC, id DESC LIMIT 1",
+                (normalize_query(topic),),
+            ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def list_sessions(self, topic=None, limit=20):
+        """
+        Returns summaries of the most recent sessions, optionally for one topic.
+
+        Returns:
+            list: Dicts with 'id', 'topic', 'created_at', 'duration',
+                'num_searches' and 'parent_id', newest first.
+        """
+        query = (
+            "SELECT s.id, s.topic, s.created_at, s.duration, s.parent_id, COUNT(q.position) FROM sessions s"
+            " LEFT JOIN searches q ON q.session_id = s.id"
+        )
+        params = []
+        if topic is not None:
+            query += " WHERE s.topic_key = ?"
+            params.append(normalize_query(topic))
+        query += " GROUP BY s.id ORDER BY s.created_at DESC, s.id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"id": r[0], "topic": r[1], "created_at": r[2], "duration": r[3], "parent_id": r[4], "num_searches": r[5]}
+            for r in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,365 @@
+"""
+Local stand-ins for the Tavily and Ollama HTTP APIs.
+
+Used by the tests and benchmarks so the pipeline can run without network access.
+Each server listens on 127.0.0.1 on a free port and runs in a background thread.
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = (
+    "research data model system analysis report growth market energy policy network "
+    "study result method value change impact region sector price risk source trend "
+    "support design process quality level rate share cost survey signal index factor "
+    "scale demand supply review update forecast record output input sample test"
+).split()
+
+
+def _synthetic_text(seed, size):
+    """
+    Deterministic filler text of about `size` characters that differs per seed,
+    so separate pages do not look like copies of each other.
+    """
+    rng = random.Random(seed)
+    sentences = []
+    length = 0
+    while length < size:
+        sentence = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)[:size]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Avoid Nagle + delayed-ACK stalls on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        try:
+            payload = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            payload = {}
+        stub = self.server.stub
+        stub.record(self.path, payload)
+        stub.enter()
+        try:
+            stub.handle_post(self, payload)
+        finally:
+            stub.leave()
+
+    def do_GET(self):
+        self.server.stub.handle_get(self)
+
+    def send_json(self, data, status=200, trickle=0.0, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not trickle:
+            self.wfile.write(body)
+            return
+        # A few bytes at a time, so the client's read timeout never fires
+        chunks = [body[i:i + 16] for i in range(0, len(body), 16)]
+        for chunk in chunks:
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            time.sleep(trickle / len(chunks))
+
+    def log_message(self, format, *args):
+        # Keep test and benchmark output quiet
+        pass
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of connections at once
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients that stop reading a stream early reset their connection
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubServer:
+    """
+    Base class for a threaded local HTTP server. Subclasses implement handle_post.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0  # Most POST requests handled at the same time
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def record(self, path, payload):
+        with self._lock:
+            self.requests.append((path, payload))
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def handle_post(self, handler, payload):
+        raise NotImplementedError
+
+    def handle_get(self, handler):
+        handler.send_json({"detail": "not found"}, status=404)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class FakeTavilyServer(StubServer):
+    """
+    Mimics the Tavily /search endpoint.
+
+    Args:
+        latency (float): Seconds to wait before answering every query.
+        latencies (dict, optional): Per-query latency overrides.
+        failures (dict, optional): Maps a query to an HTTP status code to return.
+        transient_failures (dict, optional): Maps a query to a (status, count) pair;
+            the first `count` requests for that query fail with `status`.
+        results_per_query (int): Number of synthetic results per response.
+        content_size (int, optional): Pad each synthetic snippet to this many characters.
+        raw_content_size (int, optional): Size of the synthetic page text returned
+            as raw_content when the request asks for it.
+        responses (dict, optional): Recorded responses replayed verbatim, keyed by query.
+        trickles (dict, optional): Maps a query to the seconds its response is
+            spread over, sent a few bytes at a time (a slow-dripping server).
+        retry_after (int, optional): Retry-After header sent with failures.
+    """
+
+    def __init__(self, latency=0.0, latencies=None, failures=None, transient_failures=None,
+                 results_per_query=3, content_size=None, raw_content_size=None, responses=None, trickles=None,
+                 retry_after=None):
+        super().__init__()
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.failures = failures or {}
+        self.transient_failures = dict(transient_failures or {})
+        self.results_per_query = results_per_query
+        self.content_size = content_size
+        self.raw_content_size = raw_content_size
+        self.responses = responses or {}
+        self.trickles = trickles or {}
+        self.retry_after = retry_after
+
+    def _take_transient_failure(self, query):
+        with self._lock:
+            if query not in self.transient_failures:
+                return None
+            status, count = self.transient_failures[query]
+            if count <= 0:
+                return None
+            self.transient_failures[query] = (status, count - 1)
+            return status
+
+    @property
+    def search_url(self):
+        return f"{self.url}/search"
+
+    def handle_post(self, handler, payload):
+        query = payload.get("query", "")
+        time.sleep(self.latencies.get(query, self.latency))
+        status = self.failures.get(query) or self._take_transient_failure(query)
+        if status:
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else None
+            handler.send_json({"detail": "stub failure"}, status=status, headers=headers)
+            return
+        if query in self.responses:
+            handler.send_json(self.responses[query])
+            return
+        max_results = min(payload.get("max_results", self.results_per_query), self.results_per_query)
+        results = [
+            {
+                "title": f"{query} result {i + 1}",
+                "url": f"https://example.com/{query.replace(' ', '-')}/{i + 1}",
+                "content": self._content(query, i),
+                "score": round(1.0 - i * 0.1, 2),
+            }
+            for i in range(max_results)
+        ]
+        if payload.get("include_raw_content") and self.raw_content_size:
+            for i, result in enumerate(results):
+                result["raw_content"] = self._raw_content(query, i)
+        handler.send_json({
+            "query": query,
+            "answer": f"Stub answer for {query}",
+            "results": results,
+        }, trickle=self.trickles.get(query, 0.0))
+
+    def _content(self, query, index):
+        content = f"Content about {query} number {index + 1}."
+        if self.content_size and len(content) < self.content_size:
+            content += " " + _synthetic_text(f"{query}|{index}|snippet", self.content_size - len(content) - 1)
+        return content
+
+    def _raw_content(self, query, index):
+        paragraphs = [f"Page {index + 1} about {query}."]
+        size = len(paragraphs[0])
+        while size < self.raw_content_size:
+            paragraph = _synthetic_text(f"{query}|{index}|{len(paragraphs)}", 400)
+            paragraphs.append(paragraph)
+            size += len(paragraph) + 2
+        return "\n\n".join(paragraphs)[:self.raw_content_size]
+
+
+def default_ollama_responder(payload):
+    """
+    Returns a plan (JSON list of queries) for planning prompts and a short answer otherwise.
+    """
+    system = payload.get("system", "")
+    if "search queries" in system:
+        return '<think>\nI should look this up from a few angles.\n</think>\n["stub query 1", "stub query 2"]'
+    return "<think>\nCombining the sources.\n</think>\nThis is the synthesized answer [1]."
+
+
+class FakeOllamaServer(StubServer):
+    """
+    Mimics the Ollama /api/generate endpoint, including NDJSON streaming, and
+    /api/ps, which lists the models used so far as loaded.
+
+    Args:
+        responder (callable, optional): Maps the request payload to the full response text.
+        first_token_delay (float): Seconds before the first token (simulates prefill).
+        prompt_token_delay (float): Extra prefill seconds per prompt token, so
+            longer prompts take longer to start answering.
+        token_delay (float): Seconds between streamed tokens (simulates decoding).
+        latency (float): Base delay for non-streaming requests; prefill
+            (prompt_token_delay) and decoding (token_delay) time are added.
+        loaded_models (list, optional): Models reported as loaded before any request.
+        status (int, optional): HTTP status returned for every generate request
+            (e.g. 500 to simulate a broken host).
+    """
+
+    def __init__(self, responder=None, first_token_delay=0.0, token_delay=0.0, latency=0.0,
+                 loaded_models=None, status=None, prompt_token_delay=0.0):
+        super().__init__()
+        self.responder = responder or default_ollama_responder
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.latency = latency
+        self.prompt_token_delay = prompt_token_delay
+        self.loaded_models = list(loaded_models or [])
+        self.status = status
+        self.disconnects = 0
+
+    @property
+    def generate_url(self):
+        return f"{self.url}/api/generate"
+
+    @staticmethod
+    def tokenize(text):
+        # Split into word-ish tokens, keeping whitespace attached like a real tokenizer
+        return re.findall(r"\s*\S+|\s+", text)
+
+    def _prompt_tokens(self, payload):
+        return len(self.tokenize(payload.get("system", ""))) + len(self.tokenize(payload.get("prompt", "")))
+
+    def _prefill_delay(self, payload):
+        return self.first_token_delay + self.prompt_token_delay * self._prompt_tokens(payload)
+
+    def _stats(self, payload, tokens):
+        return {
+            "done": True,
+            "prompt_eval_count": len(self.tokenize(payload.get("prompt", ""))),
+            "eval_count": len(tokens),
+            "prompt_eval_duration": int(self._prefill_delay(payload) * 1e9),
+            "eval_duration": int(self.token_delay * len(tokens) * 1e9),
+            "load_duration": 0,
+        }
+
+    @property
+    def models(self):
+        """
+        Models requested from this server, in order of first use.
+        """
+        with self._lock:
+            return list(dict.fromkeys(payload.get("model") for _, payload in self.requests))
+
+    def handle_get(self, handler):
+        if handler.path != "/api/ps":
+            super().handle_get(handler)
+            return
+        models = list(dict.fromkeys(self.loaded_models + self.models))
+        handler.send_json({"models": [{"name": model, "model": model} for model in models]})
+
+    def handle_post(self, handler, payload):
+        if self.status:
+            handler.send_json({"error": "stub failure"}, status=self.status)
+            return
+        text = self.responder(payload)
+        tokens = self.tokenize(text)
+        model = payload.get("model", "stub")
+
+        if not payload.get("stream", True):
+            time.sleep(self.latency + self.prompt_token_delay * self._prompt_tokens(payload)
+                       + self.token_delay * max(0, len(tokens) - 1))
+            data = {"model": model, "response": text}
+            data.update(self._stats(payload, tokens))
+            handler.send_json(data)
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        try:
+            time.sleep(self._prefill_delay(payload))
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(self.token_delay)
+                self._write_chunk(handler, {"model": model, "response": token, "done": False})
+            final = {"model": model, "response": ""}
+            final.update(self._stats(payload, tokens))
+            self._write_chunk(handler, final)
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            with self._lock:
+                self.disconnects += 1
+            handler.close_connection = True
+
+    @staticmethod
+    def _write_chunk(handler, data):
+        line = (json.dumps(data) + "\n").encode("utf-8")
+        handler.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        handler.wfile.flush()
@@ -1,26 +1,80 @@
 import requests
+import contextlib
 import json
-from config import TavilyConfig
+import threading
+from cache import make_key, normalize_query
+from config import CacheConfig, HTTPConfig, RetrievalConfig, TavilyConfig
+from http_session import create_async_session, get_shared_session, post_with_retry
+from query_dedup import QueryIndex
 
 class TavilyClient:
-    def __init__(self):
-        self.api_key = TavilyConfig.API_KEY
-        self.base_url = TavilyConfig.BASE_URL
+    def __init__(self, api_key=None, base_url=None, session=None, cache=None, max_concurrency=None):
+        self.api_key = api_key if api_key else TavilyConfig.API_KEY
+        self.base_url = base_url if base_url else TavilyConfig.BASE_URL
+        self.session = session if session else self._default_session()
+        # Optional ResultCache; successful responses are served from it when fresh
+        self.cache = cache
+        self.similar_threshold = CacheConfig.SIMILAR_QUERY_THRESHOLD
+        # Cached queries, loaded on first use, for serving similar queries
+        self._similar = None
+        self._similar_lock = threading.Lock()
+        # Optional cap on in-flight requests when the client is shared between threads
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
         
         if not self.api_key:
             raise ValueError("TAVILY_API_KEY not found in environment variables.")
 
-    def search(self, query, **kwargs):
+    def search(self, query, timeout=None, stats=None, cancelled=None, **kwargs):
         """
         Perform a search using the Tavily API.
         
         Args:
             query (str): The search query.
+            timeout (float, optional): Deadline in seconds for this query.
+                Defaults to TavilyConfig.SEARCH_TIMEOUT.
+            stats (dict, optional): Filled with 'cache_hit', bytes sent and
+                received and the number of results. 'similar_hit' names the
+                cached query whose results were reused for a close query.
+            cancelled (threading.Event, optional): Checked once a request slot
+                is held; when set, the request is not sent.
             **kwargs: Override default configuration parameters.
         
         Returns:
             dict: The search results.
         """
+        payload = self._build_payload(query, kwargs)
+        if stats is None:
+            stats = {}
+        cache_key, cached = self._lookup(payload, stats)
+        if cached is not None:
+            return cached
+
+        body = json.dumps(payload).encode("utf-8")
+        stats["bytes_sent"] = len(body)
+        try:
+            with self._slot():
+                if cancelled is not None and cancelled.is_set():
+                    stats["error"] = "Search cancelled before it was sent"
+                    return {"results": [], "error": stats["error"]}
+                response = self.session.post(
+                    self.base_url,
+                    data=body,
+                    headers={"Content-Type": "application/json"},
+                    timeout=(HTTPConfig.CONNECT_TIMEOUT, timeout if timeout else TavilyConfig.SEARCH_TIMEOUT)
+                )
+            stats["bytes_received"] = len(response.content)
+            response.raise_for_status()
+            data = response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"Error searching Tavily: {e}")
+            stats["error"] = str(e)
+            return {"results": [], "error": str(e)}
+
+        stats["num_results"] = len(data.get("results", []))
+        self._store(cache_key, query, data)
+        return data
+
+    def _build_payload(self, query, kwargs):
         payload = {
             "api_key": self.api_key,
             "query": query,
@@ -38,14 +92,171 @@ class TavilyClient:
             del payload["include_domains"]
         if not payload["exclude_domains"]:
             del payload["exclude_domains"]
+        return payload
+
+    def _lookup(self, payload, stats):
+        """
+        Looks the request up in the cache, including similar cached queries.
+
+        Returns:
+            tuple: (cache key or None without a cache, cached response or None).
+        """
+        stats["cache_hit"] = False
+        if self.cache is None:
+            return None, None
+        cache_key = self._cache_key(payload)
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            cached = self._get_similar(payload, stats)
+        if cached is not None:
+            stats["cache_hit"] = True
+            stats["num_results"] = len(cached.get("results", []))
+        return cache_key, cached
+
+    def _store(self, cache_key, query, data):
+        if cache_key is None:
+            return
+        label = normalize_query(query)
+        self.cache.set(cache_key, self._capped_raw_content(data), label=label)
+        if self._similar is not None:
+            self._similar.add(label)
+
+    def _capped_raw_content(self, data):
+        # Retrieval never reads past MAX_PAGE_CHARS, so the cache need not keep more
+        limit = RetrievalConfig.MAX_PAGE_CHARS
+        results = data.get("results", [])
+        if not any(len(item.get("raw_content") or "") > limit for item in results):
+            return data
+        results = [
+            dict(item, raw_content=item["raw_content"][:limit]) if len(item.get("raw_content") or "") > limit else item
+            for item in results
+        ]
+        return dict(data, results=results)
+
+    def _default_session(self):
+        return get_shared_session()
+
+    def _slot(self):
+        return self._slots if self._slots else contextlib.nullcontext()
+
+    def _get_similar(self, payload, stats):
+        """
+        Returns the cached response of the most similar cached query that is
+        above the similarity threshold and was made with the same parameters.
+        Candidates are tried best first; those whose entries have all expired
+        or been evicted are dropped from the index.
+        """
+        if not self.similar_threshold:
+            return None
+        with self._similar_lock:
+            if self._similar is None:
+                self._similar = QueryIndex()
+                for label in self.cache.labels():
+                    self._similar.add(label)
+        normalized = normalize_query(payload["query"])
+        for label, _ in self._similar.matches(payload["query"], self.similar_threshold):
+            if label == normalized:
+                continue
+            cached = self.cache.get(self._cache_key(dict(payload, query=label)))
+            if cached is not None:
+                stats["similar_hit"] = label
+                return dict(cached, query=payload["query"], similar_query=label)
+            if not self.cache.has_label(label):
+                self._similar.remove(label)
+        return None
+
+    def _cache_key(self, payload):
+        """
+        Keys a request by its normalized query and every parameter that shapes the results.
+        """
+        params = {k: v for k, v in payload.items() if k not in ("api_key", "query")}
+        for field in ("include_domains", "exclude_domains"):
+            if field in params:
+                params[field] = sorted(d.lower() for d in params[field])
+        return make_key("tavily.search", normalize_query(payload["query"]), params)
+
+class AsyncTavilyClient(TavilyClient):
+    """
+    asyncio version of TavilyClient, backed by aiohttp (an optional dependency).
+
+    Cache lookups and writes run in a worker thread so SQLite never blocks the
+    event loop. Errors are returned as an error entry like TavilyClient does,
+    but nothing is printed. A client belongs to the event loop it is first
+    used on.
+
+    Args:
+        session (aiohttp.ClientSession, optional): Shared session. If not given,
+            one is created on first use and closed by aclose().
+        max_concurrency (int, optional): Cap on in-flight requests across all
+            tasks using this client.
+    """
+
+    def __init__(self, api_key=None, base_url=None, session=None, cache=None, max_concurrency=None):
+        super().__init__(api_key=api_key, base_url=base_url, session=session, cache=cache)
+        import asyncio
+
+        self._owns_session = session is None
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    def _default_session(self):
+        # Created on first use, inside the running event loop
+        return None
+
+    async def search(self, query, timeout=None, stats=None, **kwargs):
+        """
+        Perform a search using the Tavily API. See TavilyClient.search.
+        """
+        import asyncio
+        import aiohttp
 
+        payload = self._build_payload(query, kwargs)
+        if stats is None:
+            stats = {}
+        cache_key = None
+        if self.cache is not None:
+            cache_key, cached = await asyncio.to_thread(self._lookup, payload, stats)
+            if cached is not None:
+                return cached
+        else:
+            stats["cache_hit"] = False
+
+        if self.session is None:
+            self.session = create_async_session()
+        body = json.dumps(payload).encode("utf-8")
+        stats["bytes_sent"] = len(body)
+        client_timeout = aiohttp.ClientTimeout(
+            total=timeout if timeout else TavilyConfig.SEARCH_TIMEOUT, connect=HTTPConfig.CONNECT_TIMEOUT
+        )
         try:
-            response = requests.post(self.base_url, json=payload)
+            async with self._slot():
+                response = await post_with_retry(self.session, self.base_url, body, client_timeout)
+                async with response:
+                    content = await response.read()
+            stats["bytes_received"] = len(content)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error searching Tavily: {e}")
-            return {"results": [], "error": str(e)}
+            data = json.loads(content)
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+            stats["error"] = str(e) or type(e).__name__
+            return {"results": [], "error": stats["error"]}
+
+        stats["num_results"] = len(data.get("results", []))
+        if cache_key is not None:
+            await asyncio.to_thread(self._store, cache_key, query, data)
+        return data
+
+    async def aclose(self):
+        """
+        Closes the session if this client created it.
+        """
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
 
 if __name__ == "__main__":
     # Simple test
@@ -0,0 +1,112 @@
+import asyncio
+import time
+import pytest
+from agent import DeepResearchAgent
+from config import HTTPConfig
+from llm_client import AsyncOllamaClient, OllamaClient
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import AsyncTavilyClient, TavilyClient
+
+pytest.importorskip("aiohttp")
+
+
+def _run_async(ollama, tavily, body):
+    async def main():
+        async with AsyncOllamaClient(base_url=ollama.generate_url) as llm, \
+                AsyncTavilyClient(api_key="tvly-test", base_url=tavily.search_url) as search:
+            return await body(DeepResearchAgent(llm=llm, tavily=search))
+    return asyncio.run(main())
+
+
+def test_arun_matches_run_and_reports_events_instead_of_printing(capsys):
+    with FakeOllamaServer() as ollama, FakeTavilyServer() as tavily:
+        expected = DeepResearchAgent(
+            llm=OllamaClient(base_url=ollama.generate_url),
+            tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+        ).run("topic")
+        capsys.readouterr()
+
+        events = []
+        result = _run_async(ollama, tavily, lambda agent: agent.arun("topic", on_event=events.append))
+
+    assert capsys.readouterr().out == ""
+    assert result["final_answer"] == expected["final_answer"]
+    assert [res["query"] for res in result["search_results"]] == ["stub query 1", "stub query 2"]
+    types = [event["type"] for event in events]
+    assert types[:4] == ["plan", "search", "search", "context"]
+    assert set(types[4:-1]) == {"token"} and types[-1] == "done"
+    assert "".join(event["text"] for event in events if event["type"] == "token") == result["final_answer"]
+    assert {span["name"] for span in result["trace"]["spans"]} == {"plan", "dedup", "search_stage", "search", "synthesize"}
+
+
+def test_concurrent_sessions_share_one_event_loop():
+    sessions = 20
+    with FakeOllamaServer(first_token_delay=0.1) as ollama, FakeTavilyServer(latency=0.2) as tavily:
+        async def body(agent):
+            start = time.perf_counter()
+            results = await asyncio.gather(*(agent.arun(f"topic {i}") for i in range(sessions)))
+            return results, time.perf_counter() - start
+
+        results, elapsed = _run_async(ollama, tavily, body)
+
+    assert all("synthesized answer" in result["final_answer"] for result in results)
+    # One session takes ~0.4s (plan, search, synthesis); sequential runs would take ~8s
+    assert elapsed < 2.0
+
+
+def test_cancelling_a_run_drops_the_llm_connection():
+    long_answer = "word " * 400
+    responder = lambda payload: '["q1"]' if "search queries" in payload.get("system", "") else long_answer
+    with FakeOllamaServer(responder=responder, token_delay=0.01) as ollama, FakeTavilyServer() as tavily:
+        async def body(agent):
+            stream = agent.astream("topic")
+            async for event in stream:
+                if event["type"] == "token":
+                    break
+            # Planning already dropped its stream once it had the queries
+            before = ollama.disconnects
+            # Closing the stream cancels the run while the answer is being generated
+            await stream.aclose()
+            return before
+
+        before = _run_async(ollama, tavily, body)
+        deadline = time.perf_counter() + 2
+        while ollama.disconnects == before and time.perf_counter() < deadline:
+            time.sleep(0.05)
+
+    # Generating the whole answer would take 4 seconds
+    assert ollama.disconnects == before + 1
+
+
+def test_run_timeout_cancels_slow_searches():
+    with FakeOllamaServer() as ollama, FakeTavilyServer(latency=3.0) as tavily:
+        async def body(agent):
+            start = time.perf_counter()
+            with pytest.raises(asyncio.TimeoutError):
+                await agent.arun("topic", timeout=0.3)
+            return time.perf_counter() - start
+
+        elapsed = _run_async(ollama, tavily, body)
+
+    assert elapsed < 1.0
+
+
+def test_async_search_retries_and_reports_errors(monkeypatch):
+    monkeypatch.setattr(HTTPConfig, "BACKOFF_FACTOR", 0.01)
+    with FakeTavilyServer(transient_failures={"busy": (429, 2)}, failures={"down": 400}) as server:
+        async def main():
+            async with AsyncTavilyClient(api_key="tvly-test", base_url=server.search_url) as client:
+                stats = {}
+                return await client.search("busy"), await client.search("down", stats=stats), stats
+
+        busy, down, stats = asyncio.run(main())
+
+    assert busy["query"] == "busy"
+    assert down["results"] == [] and "error" in down and "error" in stats
+    assert len(server.requests) == 4
+
+
+def test_arun_needs_async_clients():
+    agent = DeepResearchAgent(llm=OllamaClient(), tavily=TavilyClient(api_key="tvly-test"))
+    with pytest.raises(TypeError):
+        asyncio.run(agent.arun("topic"))
@@ -0,0 +1,69 @@
+import json
+import os
+import pytest
+from batch_runner import BatchRunner, load_topics, topic_slug
+from llm_client import OllamaClient
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def test_load_topics_from_jsonl_and_text(tmp_path):
+    jsonl = tmp_path / "topics.jsonl"
+    jsonl.write_text('{"query": "solid state batteries"}\n"groq acquisition"\n\n{"topic": "solid state batteries"}\n')
+    text = tmp_path / "topics.txt"
+    text.write_text("# comment\nfirst topic\n\nsecond topic\n")
+
+    assert load_topics(str(jsonl)) == ["solid state batteries", "groq acquisition"]
+    assert load_topics(str(text)) == ["first topic", "second topic"]
+
+
+@pytest.mark.parametrize("line, message", [
+    ("42", "expected a string or object"),
+    ("[\"a\", \"b\"]", "expected a string or object"),
+    ("null", "expected a string or object"),
+    ('{"query": 7}', "expected a 'query' field"),
+])
+def test_load_topics_rejects_other_json_values(tmp_path, line, message):
+    jsonl = tmp_path / "topics.jsonl"
+    jsonl.write_text('"first topic"\n' + line + "\n")
+
+    with pytest.raises(ValueError, match=f"topics.jsonl:2: {message}"):
+        load_topics(str(jsonl))
+
+
+def test_topic_slug_is_stable_and_safe():
+    slug = topic_slug("What's new in Python 3.13?")
+    assert slug == topic_slug("What's new in Python 3.13?")
+    assert slug.startswith("what-s-new-in-python-3-13-")
+    assert "/" not in topic_slug("a/b")
+
+
+def _runner(ollama, tavily, output_dir, **kwargs):
+    return BatchRunner(
+        output_dir=output_dir,
+        llm=OllamaClient(base_url=ollama.generate_url, max_concurrency=2),
+        tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url, max_concurrency=4),
+        **kwargs
+    )
+
+
+def test_batch_writes_reports_and_resumes(tmp_path):
+    output_dir = str(tmp_path / "batch")
+    topics = ["topic one", "topic two", "topic three"]
+    with FakeOllamaServer() as ollama, FakeTavilyServer() as tavily:
+        summary = _runner(ollama, tavily, output_dir, topic_workers=3).run(topics)
+        assert summary["completed"] == 3
+        assert summary["topics_per_hour"] > 0
+        llm_calls = len(ollama.requests)
+
+        resumed = _runner(ollama, tavily, output_dir).run(topics + ["topic four"])
+        assert resumed["skipped"] == 3
+        assert resumed["completed"] == 1
+        # Only the new topic was planned and synthesized
+        assert len(ollama.requests) == llm_calls + 2
+
+    for topic in topics:
+        assert os.path.exists(os.path.join(output_dir, f"{topic_slug(topic)}.html"))
+    with open(os.path.join(output_dir, "index.json")) as f:
+        index = json.load(f)
+    assert sorted(entry["topic"] for entry in index["topics"]) == sorted(topics + ["topic four"])
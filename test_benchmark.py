@@ -0,0 +1,20 @@
+from benchmark import SCENARIOS, load_fixture, run_scenario
+
+
+def test_run_scenario_reports_metrics():
+    scenario = dict(SCENARIOS["small"], search_latency=0.0, first_token_delay=0.0, token_delay=0.0)
+    result = run_scenario("smoke", scenario, repeat=2)
+
+    assert result["repeat"] == 2
+    assert result["runs_per_minute"] > 0
+    assert 0 < result["p50"] <= result["p95"]
+    assert result["peak_memory_mb"] > 0
+
+
+def test_replays_recorded_fixture():
+    fixture = load_fixture("fixtures/benchmark_sample.json")
+    scenario = dict(SCENARIOS["small"], search_latency=0.0, first_token_delay=0.0, token_delay=0.0)
+    result = run_scenario("fixture", scenario, repeat=1, fixture=fixture)
+
+    assert result["fixture"]
+    assert result["p50"] > 0
@@ -0,0 +1,77 @@
+import time
+from agent import DeepResearchAgent
+from config import TavilyConfig
+from http_session import create_session
+from stub_servers import FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def _make_agent(server, session=None):
+    tavily = TavilyClient(api_key="tvly-test", base_url=server.search_url, session=session)
+    return DeepResearchAgent(tavily=tavily)
+
+
+def test_results_keep_query_order():
+    latencies = {"slow": 0.3, "medium": 0.15, "fast": 0.0}
+    with FakeTavilyServer(latencies=latencies) as server:
+        agent = _make_agent(server)
+        results = agent._execute_searches(["slow", "medium", "fast"])
+
+    assert [res["query"] for res in results] == ["slow", "medium", "fast"]
+
+
+def test_wall_time_close_to_slowest_query():
+    queries = [f"query {i}" for i in range(5)]
+    with FakeTavilyServer(latency=0.3) as server:
+        agent = _make_agent(server)
+        start = time.perf_counter()
+        results = agent._execute_searches(queries)
+        elapsed = time.perf_counter() - start
+
+    assert len(results) == 5
+    # Sequential execution would take ~1.5s
+    assert elapsed < 0.9
+
+
+def test_slow_and_failed_queries_do_not_block_others(monkeypatch):
+    monkeypatch.setattr(TavilyConfig, "SEARCH_TIMEOUT", 0.5)
+    with FakeTavilyServer(latencies={"stuck": 3.0}, failures={"broken": 500}) as server:
+        # Disable retries so the 500 surfaces immediately
+        agent = _make_agent(server, session=create_session(max_retries=0))
+        start = time.perf_counter()
+        results = agent._execute_searches(["stuck", "broken", "fine"])
+        elapsed = time.perf_counter() - start
+
+    assert "error" in results[0]
+    assert "error" in results[1]
+    assert results[2]["query"] == "fine"
+    assert elapsed < 2.0
+
+
+def test_stalled_query_does_not_block_the_round_past_the_deadline(monkeypatch):
+    monkeypatch.setattr(TavilyConfig, "SEARCH_TIMEOUT", 0.5)
+    monkeypatch.setattr(TavilyConfig, "MAX_CONCURRENT_SEARCHES", 1)
+    # The response trickles in, so the read timeout alone would never fire
+    with FakeTavilyServer(trickles={"stuck": 3.0}) as server:
+        agent = _make_agent(server)
+        start = time.perf_counter()
+        results = agent._execute_searches(["stuck", "fine"])
+        elapsed = time.perf_counter() - start
+
+    assert results[0] == {"results": [], "error": "Search timed out after 0.5s", "query": "stuck"}
+    # The late query freed its slot for the next one
+    assert results[1]["query"] == "fine" and "error" not in results[1]
+    assert elapsed < 1.2
+
+
+def test_queries_abandoned_while_waiting_for_a_slot_are_not_sent(monkeypatch):
+    monkeypatch.setattr(TavilyConfig, "SEARCH_TIMEOUT", 0.5)
+    with FakeTavilyServer(trickles={"stuck": 1.0}) as server:
+        tavily = TavilyClient(api_key="tvly-test", base_url=server.search_url, max_concurrency=1)
+        agent = DeepResearchAgent(tavily=tavily)
+        results = agent._execute_searches(["stuck", "queued"])
+        # The queued search gets the slot once the stuck response has drained
+        time.sleep(1.0)
+
+    assert results[1] == {"results": [], "error": "Search timed out after 0.5s", "query": "queued"}
+    assert [payload["query"] for _, payload in server.requests] == ["stuck"]
@@ -0,0 +1,46 @@
+from context_packer import estimate_tokens, pack_context
+from ranking import BM25, tokenize
+
+
+def _result(*items):
+    return {"results": [{"title": t, "url": u, "content": c} for t, u, c in items]}
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 100) == 100
+    # Non-ASCII scripts count roughly one token per character
+    assert estimate_tokens("전고체 배터리") == 7
+
+
+def test_bm25_prefers_matching_documents():
+    docs = [tokenize("bananas are yellow"), tokenize("python release schedule"), tokenize("python snakes")]
+    top = BM25(docs).top_k(tokenize("python release"), k=2)
+    assert [doc_id for doc_id, _ in top] == [1, 2]
+
+
+def test_duplicate_urls_across_queries_are_dropped():
+    results = [
+        _result(("A", "https://example.com/a/", "python 3.13 released")),
+        _result(("A again", "https://EXAMPLE.com/a#top", "python 3.13 released"),
+                ("B", "https://example.com/b", "other")),
+    ]
+    context, stats = pack_context("python release", results, token_budget=10_000)
+    assert stats["duplicates"] == 1
+    assert stats["packed"] == 2
+    assert "A again" not in context
+
+
+def test_most_relevant_sources_are_packed_first_within_budget():
+    results = [_result(
+        ("Irrelevant", "https://example.com/1", "lorem ipsum " * 200),
+        ("Python 3.13 release notes", "https://python.org/3.13", "The latest python release is 3.13."),
+        ("Also irrelevant", "https://example.com/2", "dolor sit amet " * 200),
+    )]
+    context, stats = pack_context("latest python release", results, token_budget=200)
+
+    assert context.startswith("Source 1:\n- Title: Python 3.13 release notes")
+    assert stats["packed"] == 1
+    assert stats["dropped"] == 2
+    assert stats["used_tokens"] <= 200
+    assert stats["dropped_tokens"] > 1000
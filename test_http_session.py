@@ -0,0 +1,47 @@
+import time
+from config import HTTPConfig
+from http_session import create_session, get_shared_session
+from llm_client import OllamaClient
+from stub_servers import FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def test_clients_share_one_pooled_session():
+    tavily = TavilyClient(api_key="tvly-test")
+    llm = OllamaClient()
+    assert tavily.session is llm.session is get_shared_session()
+
+
+def test_retries_rate_limited_requests():
+    with FakeTavilyServer(transient_failures={"busy": (429, 2)}) as server:
+        session = create_session(max_retries=3, backoff_factor=0.01)
+        client = TavilyClient(api_key="tvly-test", base_url=server.search_url, session=session)
+        result = client.search("busy")
+
+    assert "error" not in result
+    assert result["query"] == "busy"
+    assert len(server.requests) == 3
+
+
+def test_gives_up_after_max_retries():
+    with FakeTavilyServer(failures={"down": 503}) as server:
+        session = create_session(max_retries=1, backoff_factor=0.01)
+        client = TavilyClient(api_key="tvly-test", base_url=server.search_url, session=session)
+        result = client.search("down")
+
+    assert result["results"] == []
+    assert "error" in result
+    assert len(server.requests) == 2
+
+
+def test_retry_waits_are_capped(monkeypatch):
+    monkeypatch.setattr(HTTPConfig, "MAX_RETRY_WAIT", 0.1)
+    with FakeTavilyServer(transient_failures={"busy": (429, 2)}, retry_after=60) as server:
+        session = create_session(max_retries=3, backoff_factor=10)
+        client = TavilyClient(api_key="tvly-test", base_url=server.search_url, session=session)
+        start = time.perf_counter()
+        result = client.search("busy")
+        elapsed = time.perf_counter() - start
+
+    assert "error" not in result and len(server.requests) == 3
+    assert elapsed < 1.0
@@ -0,0 +1,86 @@
+from agent import DeepResearchAgent
+from cache import ResultCache
+from llm_client import OllamaClient
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def _cache(tmp_path):
+    return ResultCache(str(tmp_path / "llm.sqlite3"), ttl=60)
+
+
+def test_identical_requests_reuse_the_response(tmp_path):
+    with FakeOllamaServer(responder=lambda payload: "an answer") as server:
+        client = OllamaClient(base_url=server.generate_url, cache=_cache(tmp_path))
+        stats = {}
+        assert client.generate("prompt", system_prompt="sys") == "an answer"
+        assert client.generate("prompt", system_prompt="sys", stats=stats) == "an answer"
+        assert stats["cache_hit"]
+
+        # Every input that shapes the output is part of the key
+        client.generate("prompt", system_prompt="other sys")
+        client.generate("other prompt", system_prompt="sys")
+        client.temperature = 0.1
+        client.generate("prompt", system_prompt="sys")
+        client.context_window = 4096
+        client.generate("prompt", system_prompt="sys")
+
+    assert len(server.requests) == 5
+
+
+def test_only_complete_streams_are_cached(tmp_path):
+    with FakeOllamaServer(responder=lambda payload: "one two three four") as server:
+        client = OllamaClient(base_url=server.generate_url, cache=_cache(tmp_path))
+        stream = client.generate_stream("partial")
+        next(stream)
+        stream.close()
+        assert "".join(client.generate_stream("partial")) == "one two three four"
+
+        stats = {}
+        assert "".join(client.generate_stream("partial", stats=stats)) == "one two three four"
+
+    assert stats["cache_hit"] and "time_to_first_token" in stats
+    assert len(server.requests) == 2
+
+
+def test_deterministic_only_skips_sampled_requests(tmp_path):
+    with FakeOllamaServer() as server:
+        client = OllamaClient(base_url=server.generate_url, cache=_cache(tmp_path), deterministic_only=True)
+        client.temperature = 0.6
+        client.generate("prompt")
+        client.generate("prompt")
+        assert len(server.requests) == 2
+
+        client.seed = 42
+        client.generate("prompt")
+        client.generate("prompt")
+        assert len(server.requests) == 3
+        assert server.requests[-1][1]["options"]["seed"] == 42
+
+        client.seed = None
+        client.temperature = 0
+        client.generate("prompt")
+        client.generate("prompt")
+
+    assert len(server.requests) == 4
+
+
+def test_plan_cache_skips_planning_for_repeated_topics(tmp_path):
+    plan_cache = _cache(tmp_path)
+    with FakeOllamaServer() as ollama, FakeTavilyServer() as tavily:
+        def run(topic):
+            agent = DeepResearchAgent(
+                llm=OllamaClient(base_url=ollama.generate_url),
+                tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+                plan_cache=plan_cache,
+            )
+            return agent.run(topic)
+
+        run("Coral reefs")
+        result = run("coral reefs?")
+
+    planning = [payload for _, payload in ollama.requests if "search queries" in payload.get("system", "")]
+    assert len(planning) == 1
+    plan_span = next(span for span in result["trace"]["spans"] if span["name"] == "plan")
+    assert plan_span["plan_cache_hit"]
+    assert [res["query"] for res in result["search_results"]] == ["stub query 1", "stub query 2"]
@@ -0,0 +1,159 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from agent import DeepResearchAgent
+from config import LLMConfig
+from llm_router import Endpoint, OllamaRouter, create_llm
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def _router(servers, policy="least_outstanding", **kwargs):
+    return OllamaRouter(endpoints=[{"url": server.generate_url} for server in servers], policy=policy, **kwargs)
+
+
+def test_least_outstanding_spreads_concurrent_requests():
+    servers = [FakeOllamaServer(latency=0.2).start() for _ in range(3)]
+    try:
+        router = _router(servers)
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            answers = list(executor.map(lambda i: router.generate(f"prompt {i}"), range(6)))
+    finally:
+        for server in servers:
+            server.stop()
+
+    assert all("synthesized answer" in answer for answer in answers)
+    assert [len(server.requests) for server in servers] == [2, 2, 2]
+
+
+def test_weighted_policy_follows_weights():
+    servers = [FakeOllamaServer().start() for _ in range(2)]
+    try:
+        router = OllamaRouter(
+            endpoints=[{"url": servers[0].generate_url, "weight": 3}, {"url": servers[1].generate_url, "weight": 1}],
+            policy="weighted",
+        )
+        for i in range(8):
+            router.generate(f"prompt {i}")
+    finally:
+        for server in servers:
+            server.stop()
+
+    assert [len(server.requests) for server in servers] == [6, 2]
+
+
+def test_affinity_keeps_each_model_on_the_host_that_has_it_loaded():
+    servers = [FakeOllamaServer(loaded_models=["small"]).start(), FakeOllamaServer(loaded_models=["large"]).start()]
+    try:
+        router = _router(servers, policy="affinity")
+        router.check_health()
+        for i in range(3):
+            router.with_model("large").generate(f"prompt {i}")
+            router.with_model("small").generate(f"prompt {i}")
+        assert [server.models for server in servers] == [["small"], ["large"]]
+
+        # A model loaded nowhere yet stays where it was first served
+        other = router.with_model("other")
+        other.generate("a")
+        other.generate("b")
+    finally:
+        for server in servers:
+            server.stop()
+
+    assert sorted(["other" in server.models for server in servers]) == [False, True]
+
+
+def test_create_llm_checks_the_hosts_before_the_first_request(monkeypatch):
+    dead = FakeOllamaServer().start()
+    dead.stop()
+    alive = FakeOllamaServer(loaded_models=["large"]).start()
+    try:
+        monkeypatch.setattr(LLMConfig, "ENDPOINTS", [{"url": dead.generate_url}, {"url": alive.generate_url}])
+        router = create_llm(model_name="large")
+        health = router.stats()
+        router.generate("prompt")
+    finally:
+        alive.stop()
+
+    assert [endpoint["healthy"] for endpoint in health] == [False, True]
+    assert health[1]["loaded_models"] == ["large"]
+    # The dead host was never sent a request, so nothing failed over
+    assert [endpoint["requests"] for endpoint in router.stats()] == [0, 1]
+
+
+def test_failover_skips_a_dead_host_until_its_cooldown_expires():
+    dead = FakeOllamaServer(status=500).start()
+    alive = FakeOllamaServer().start()
+    try:
+        router = _router([dead, alive], cooldown=0.3)
+        stats = {}
+        first = router.generate("one", stats=stats)
+        streamed = "".join(router.generate_stream("two"))
+        assert len(dead.requests) == 1
+        time.sleep(0.35)
+        router.generate("three")
+        router.generate("four")
+    finally:
+        dead.stop()
+        alive.stop()
+
+    assert "synthesized answer" in first and "synthesized answer" in streamed
+    assert stats["endpoint"] == alive.generate_url and stats["failovers"] == 1 and "error" not in stats
+    # Tried once more after the cooldown, then skipped again
+    assert len(dead.requests) == 2
+    assert len(alive.requests) == 4
+    assert [endpoint["failures"] for endpoint in router.stats()] == [2, 0]
+
+
+def test_all_hosts_down_reports_an_error():
+    servers = [FakeOllamaServer(status=500).start() for _ in range(2)]
+    try:
+        router = _router(servers)
+        stats = {}
+        text = "".join(router.generate_stream("prompt", stats=stats))
+    finally:
+        for server in servers:
+            server.stop()
+
+    assert text.startswith("Error:") and "error" in stats
+    assert [len(server.requests) for server in servers] == [1, 1]
+
+
+def test_per_endpoint_caps_bound_in_flight_requests():
+    servers = [FakeOllamaServer(latency=0.1).start() for _ in range(2)]
+    try:
+        router = OllamaRouter(endpoints=[Endpoint(server.generate_url, max_concurrency=2) for server in servers])
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: router.generate(f"prompt {i}"), range(12)))
+    finally:
+        for server in servers:
+            server.stop()
+
+    assert [server.max_in_flight for server in servers] == [2, 2]
+    assert sum(len(server.requests) for server in servers) == 12
+
+
+def test_planning_and_synthesis_use_different_models_and_hosts():
+    small_host = FakeOllamaServer().start()
+    large_host = FakeOllamaServer().start()
+    try:
+        router = OllamaRouter(
+            endpoints=[
+                {"url": small_host.generate_url, "models": ["small"]},
+                {"url": large_host.generate_url, "models": ["large"]},
+            ],
+            model_name="large",
+        )
+        with FakeTavilyServer() as tavily:
+            agent = DeepResearchAgent(
+                llm=router,
+                planner=router.with_model("small"),
+                tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+            )
+            result = agent.run("topic")
+    finally:
+        small_host.stop()
+        large_host.stop()
+
+    assert "synthesized answer" in result["final_answer"]
+    assert small_host.models == ["small"] and "search queries" in small_host.requests[0][1]["system"]
+    assert large_host.models == ["large"] and len(large_host.requests) == 1
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import re
+import pytest
+from agent import DeepResearchAgent
+from config import SynthesisConfig
+from context_packer import estimate_tokens
+from llm_client import OllamaClient
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+QUERIES = ["reef bleaching causes", "ocean acidification chemistry", "fisheries economics", "marine protected areas"]
+
+
+def responder(payload):
+    system = payload.get("system", "")
+    if "search queries" in system:
+        return json.dumps(QUERIES)
+    if "Summarize the facts" in system:
+        search_query = re.search(r"Search Query: (.*)", payload["prompt"]).group(1)
+        url = re.search(r"URL: (\S+)", payload["prompt"]).group(1)
+        return f"<think>\nPicking facts.\n</think>\n- A fact about {search_query} [{url}]"
+    return "<think>\nCombining the summaries.\n</think>\nThe answer."
+
+
+def _agent(ollama, tavily, **kwargs):
+    return DeepResearchAgent(
+        llm=OllamaClient(base_url=ollama.generate_url),
+        tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+        synthesis_mode="map_reduce",
+        **kwargs,
+    )
+
+
+def _prompts(ollama, marker):
+    return [payload for _, payload in ollama.requests if marker in payload.get("system", "")]
+
+
+def test_each_query_is_summarized_concurrently_and_citations_reach_the_reduce_call():
+    with FakeOllamaServer(responder=responder, latency=0.2) as ollama, FakeTavilyServer() as tavily:
+        agent = _agent(ollama, tavily)
+        result = agent.run("coral reefs")
+
+    summary_prompts = _prompts(ollama, "Summarize the facts")
+    assert sorted(re.search(r"Search Query: (.*)", p["prompt"]).group(1) for p in summary_prompts) == sorted(QUERIES)
+    assert all(not p["stream"] for p in summary_prompts)
+    # Each map call only holds its own query's sources and leaves room for the summary
+    for payload in summary_prompts:
+        used = estimate_tokens(payload["system"]) + estimate_tokens(payload["prompt"])
+        assert used <= agent.llm.context_window - SynthesisConfig.MAP_TOKEN_RESERVE
+    assert ollama.max_in_flight > 1
+
+    (reduce_prompt,) = _prompts(ollama, "results of each search query have been summarized")
+    for query in QUERIES:
+        assert f"- A fact about {query} [https://example.com/{query.replace(' ', '-')}/" in reduce_prompt["prompt"]
+    assert "<think>" not in reduce_prompt["prompt"] and "Source 1:" not in reduce_prompt["prompt"]
+    assert "The answer." in result["final_answer"]
+
+    spans = result["trace"]["spans"]
+    assert len([span for span in spans if span["name"] == "summarize"]) == len(QUERIES)
+    synthesize = next(span for span in spans if span["name"] == "synthesize")
+    assert synthesize["map"]["summaries"] == len(QUERIES)
+    # Four 0.2s summaries run side by side, not one after another
+    assert synthesize["map"]["time"] < 0.6
+
+
+def test_queries_without_results_are_not_summarized():
+    with FakeOllamaServer(responder=responder) as ollama, FakeTavilyServer() as tavily:
+        agent = _agent(ollama, tavily)
+        search_results = agent._execute_searches(QUERIES[:2])
+        search_results.append({"query": "failed query", "results": [], "error": "timeout"})
+        summaries = agent._map_summaries("coral reefs", search_results)
+
+    assert [query for query, _ in summaries] == QUERIES[:2]
+    assert len(_prompts(ollama, "Summarize the facts")) == 2
+
+
+def test_reduce_prompt_drops_summaries_over_budget():
+    agent = DeepResearchAgent(llm=OllamaClient(base_url="http://127.0.0.1:9"), tavily=TavilyClient(api_key="tvly-test"))
+    agent.llm.context_window = 3072 + 400
+    summaries = [(f"query {i}", "word " * 150) for i in range(4)]
+    _, user_prompt, pack_stats, token_budget = agent._reduce_prompts("topic", summaries)
+
+    assert 0 < pack_stats["summaries"] < 4
+    assert pack_stats["summaries"] + pack_stats["dropped"] == 4
+    assert pack_stats["used_tokens"] <= token_budget
+    assert "Search Query: query 0" in user_prompt
+
+
+def test_astream_emits_a_summary_event_per_query():
+    pytest.importorskip("aiohttp")
+    from llm_client import AsyncOllamaClient
+    from tavily_client import AsyncTavilyClient
+
+    async def main(ollama, tavily):
+        async with AsyncOllamaClient(base_url=ollama.generate_url) as llm, \
+                AsyncTavilyClient(api_key="tvly-test", base_url=tavily.search_url) as search:
+            agent = DeepResearchAgent(llm=llm, tavily=search, synthesis_mode="map_reduce")
+            events = []
+            result = await agent.arun("coral reefs", on_event=events.append)
+            return result, events
+
+    with FakeOllamaServer(responder=responder) as ollama, FakeTavilyServer() as tavily:
+        result, events = asyncio.run(main(ollama, tavily))
+
+    summaries = [event for event in events if event["type"] == "summary"]
+    assert sorted(event["query"] for event in summaries) == sorted(QUERIES)
+    assert all(event["error"] is None for event in summaries)
+    context = next(event for event in events if event["type"] == "context")
+    assert context["stats"]["summaries"] == len(QUERIES)
+    assert "The answer." in result["final_answer"]
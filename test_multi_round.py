@@ -0,0 +1,101 @@
+import json
+from agent import DeepResearchAgent
+from config import LLMConfig, ResearchConfig
+from context_packer import estimate_tokens
+from llm_client import OllamaClient
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+class ScriptedResponder:
+    """
+    Plans two queries, asks for follow-ups in the first review and stops after the second.
+    """
+
+    def __init__(self, follow_ups):
+        self.follow_ups = list(follow_ups)
+        self.review_prompts = []
+        self.synthesis_prompts = []
+
+    def __call__(self, payload):
+        system = payload.get("system", "")
+        if "reviewing search results" in system:
+            self.review_prompts.append(payload["prompt"])
+            queries = self.follow_ups.pop(0) if self.follow_ups else []
+            notes = f"notes after review {len(self.review_prompts)}"
+            return "<think>gaps?</think>\n" + json.dumps({"notes": notes, "follow_up_queries": queries})
+        if "search queries" in system:
+            return '["first query", "second query"]'
+        self.synthesis_prompts.append(payload["prompt"])
+        return "Final answer."
+
+
+def _agent(ollama, tavily):
+    return DeepResearchAgent(
+        llm=OllamaClient(base_url=ollama.generate_url),
+        tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+    )
+
+
+def test_follow_up_rounds_until_no_gaps():
+    responder = ScriptedResponder([["reef bleaching causes", "First Query", "espresso extraction time"], []])
+    with FakeOllamaServer(responder=responder) as ollama, FakeTavilyServer() as tavily:
+        result = _agent(ollama, tavily).run("topic", max_rounds=4)
+        searched = [payload["query"] for path, payload in tavily.requests]
+
+    # The repeated "First Query" is not searched again
+    assert sorted(searched) == ["espresso extraction time", "first query", "reef bleaching causes", "second query"]
+    assert [entry["round"] for entry in result["rounds"]] == [1, 2]
+    assert result["rounds"][1]["queries"] == ["reef bleaching causes", "espresso extraction time"]
+    assert result["rounds"][-1]["cumulative_tokens"] >= result["rounds"][0]["tokens"] > 0
+    assert result["notes"] == "notes after review 2"
+
+    # Later reviews only see the latest round's results plus the running notes
+    assert "first query result" in responder.review_prompts[0]
+    assert "first query result" not in responder.review_prompts[1]
+    assert "notes after review 1" in responder.review_prompts[1]
+    assert "notes after review 2" in responder.synthesis_prompts[0]
+
+
+def test_rounds_stop_at_query_limit(monkeypatch):
+    monkeypatch.setattr(ResearchConfig, "MAX_TOTAL_QUERIES", 3)
+    responder = ScriptedResponder([["extra 1", "extra 2", "extra 3"], ["extra 4"]])
+    with FakeOllamaServer(responder=responder) as ollama, FakeTavilyServer() as tavily:
+        result = _agent(ollama, tavily).run("topic", max_rounds=5)
+
+    assert len(result["search_results"]) == 3
+    assert result["rounds"][1]["queries"] == ["extra 1"]
+    assert len(responder.review_prompts) == 1
+
+
+def test_single_round_by_default():
+    responder = ScriptedResponder([["never used"]])
+    with FakeOllamaServer(responder=responder) as ollama, FakeTavilyServer() as tavily:
+        result = _agent(ollama, tavily).run("topic")
+
+    assert responder.review_prompts == []
+    assert "rounds" not in result
+
+
+def test_notes_are_cut_to_their_budget_and_the_review_leaves_room_to_answer(monkeypatch):
+    monkeypatch.setattr(ResearchConfig, "NOTES_TOKEN_BUDGET", 200)
+    agent = DeepResearchAgent(llm=OllamaClient(), tavily=TavilyClient(api_key="tvly-test"))
+    long_notes = " ".join(f"fact{i}" for i in range(2000))
+
+    notes, _ = agent._parse_review(json.dumps({"notes": long_notes, "follow_up_queries": []}), "")
+    assert 150 < estimate_tokens(notes) <= 200 and long_notes.startswith(notes)
+
+    results = [{"query": "q", "results": [
+        {"title": f"page {i}", "url": f"https://example.com/{i}", "content": "reef " * 400} for i in range(40)
+    ]}]
+    system_prompt, user_prompt = agent._review_prompts("reefs", long_notes, results, ["q"])
+    assert notes in user_prompt and long_notes not in user_prompt
+    prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+    assert prompt_tokens <= agent.llm.context_window - LLMConfig.ANSWER_TOKEN_RESERVE
+
+
+def test_follow_up_queries_that_are_not_a_list_are_ignored():
+    agent = DeepResearchAgent(llm=OllamaClient(), tavily=TavilyClient(api_key="tvly-test"))
+    for value in (None, "python", 42):
+        response = json.dumps({"notes": "updated notes", "follow_up_queries": value})
+        assert agent._parse_review(response, "old notes") == ("updated notes", [])
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from batch_runner import BatchRunner, topic_slug
+from llm_client import OllamaClient
+from pipeline import Stage, StagedPipeline
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def test_stages_overlap_and_keep_items():
+    def slow(item):
+        time.sleep(0.1)
+        return item
+
+    pipeline = StagedPipeline([Stage("a", slow), Stage("b", slow), Stage("c", slow)])
+    start = time.perf_counter()
+    results = pipeline.run(range(6))
+    elapsed = time.perf_counter() - start
+
+    assert sorted(results) == list(range(6))
+    # Sequential would take 1.8s; pipelined it is about (6 + 2) * 0.1s
+    assert elapsed < 1.2
+    assert [stage["processed"] for stage in pipeline.metrics()] == [6, 6, 6]
+
+
+def test_a_slow_stage_holds_back_the_ones_before_it():
+    started = []
+    release = threading.Event()
+
+    def produce(item):
+        started.append(item)
+        return item
+
+    def consume(item):
+        release.wait()
+        return item
+
+    pipeline = StagedPipeline([Stage("produce", produce), Stage("consume", consume, queue_size=2)])
+    runner = threading.Thread(target=lambda: pipeline.run(range(20)))
+    runner.start()
+    time.sleep(0.3)
+    # One item in consume, two queued for it and one produced and waiting to be queued
+    assert len(started) == 4
+    assert pipeline.queue_depths()["consume"] == 2
+    release.set()
+    runner.join()
+
+    consume = pipeline.metrics()[1]
+    assert consume["processed"] == 20 and consume["max_queue_depth"] == 2
+    assert consume["blocked_seconds"] > 0.2
+
+
+def test_failing_items_are_reported_and_dropped():
+    errors = []
+
+    def check(item):
+        if item % 3 == 0:
+            raise ValueError(f"bad {item}")
+        return item
+
+    pipeline = StagedPipeline(
+        [Stage("check", check, workers=2), Stage("keep", lambda item: item if item < 7 else None)],
+        on_error=lambda stage, item, error: errors.append((stage, item)),
+    )
+    results = pipeline.run(range(10))
+
+    assert sorted(results) == [1, 2, 4, 5]
+    assert sorted(errors) == [("check", 0), ("check", 3), ("check", 6), ("check", 9)]
+    assert pipeline.metrics()[0]["failed"] == 4
+
+
+def test_pipelined_batch_writes_reports_and_stage_metrics(tmp_path):
+    output_dir = str(tmp_path / "batch")
+    topics = [f"topic {i}" for i in range(4)]
+    with FakeOllamaServer() as ollama, FakeTavilyServer() as tavily:
+        runner = BatchRunner(
+            output_dir=output_dir,
+            llm=OllamaClient(base_url=ollama.generate_url, max_concurrency=2),
+            tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+            pipeline=True,
+        )
+        summary = runner.run(topics)
+
+    assert summary["completed"] == 4
+    assert [stage["name"] for stage in summary["stages"]] == ["plan", "search", "synthesize"]
+    assert all(stage["processed"] == 4 for stage in summary["stages"])
+    for topic in topics:
+        assert os.path.exists(os.path.join(output_dir, f"{topic_slug(topic)}.html"))
+
+
+def test_pipelined_batch_records_failed_plans(tmp_path):
+    responder = lambda payload: "no queries here" if "search queries" in payload.get("system", "") else "answer"
+    with FakeOllamaServer(responder=responder) as ollama, FakeTavilyServer() as tavily:
+        runner = BatchRunner(
+            output_dir=str(tmp_path),
+            llm=OllamaClient(base_url=ollama.generate_url),
+            tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+            pipeline=True,
+        )
+        summary = runner.run(["topic"])
+
+    assert summary["failed"] == 1
+    assert summary["stages"][0]["failed"] == 1 and summary["stages"][2]["processed"] == 0
+    assert not os.path.exists(runner.report_path("topic"))
@@ -0,0 +1,84 @@
+import json
+import os
+import random
+import pytest
+from agent import DeepResearchAgent
+from llm_client import OllamaClient
+from plan_parser import PlanParser, parse_plan
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "plan_responses.json"), encoding="utf-8") as f:
+    CORPUS = json.load(f)
+
+
+def _feed_in_pieces(text, rng):
+    parser = PlanParser()
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 8)
+        if parser.feed(text[pos:pos + size]) is not None:
+            break
+        pos += size
+    return parser.finish()
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[case["name"] for case in CORPUS])
+def test_corpus(case):
+    assert parse_plan(case["response"]) == case["expected"]
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[case["name"] for case in CORPUS])
+def test_streamed_pieces_give_the_same_plan(case):
+    rng = random.Random(case["name"])
+    for _ in range(20):
+        assert _feed_in_pieces(case["response"], rng) == case["expected"]
+
+
+def test_feed_stops_at_the_end_of_the_plan():
+    parser = PlanParser()
+    assert parser.feed('<think>maybe ["x"]') is None
+    assert parser.feed('</think>\n["a", ') is None
+    assert parser.feed('"b"]') == ["a", "b"]
+    # Nothing after the plan is scanned
+    assert parser.feed(" [broken") == ["a", "b"]
+    assert parser.finish() == ["a", "b"]
+
+
+def test_long_streams_keep_only_what_is_still_needed():
+    parser = PlanParser()
+    tokens = ["<think>"] + ["reasoning [1] "] * 5000 + ['</think> ["a", ', '"b"]']
+    for token in tokens[:-1]:
+        assert parser.feed(token) is None
+        # Scanned text is dropped; only an unfinished array or tag is kept
+        assert len(parser._buffer) <= len('["a", ')
+    assert parser.feed(tokens[-1]) == ["a", "b"]
+    assert parser.text == "".join(tokens)
+
+
+def test_fuzzed_responses_never_raise():
+    rng = random.Random(0)
+    alphabet = ['[', ']', '"', "'", ',', ' ', '\\', 'u', '0', 'a', 'b', '\n', '<think>', '</think>', '<', '{', '}', '1']
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        queries = parse_plan(text)
+        assert queries is None or (queries and all(isinstance(q, str) and q.strip() for q in queries))
+        assert _feed_in_pieces(text, rng) == queries
+
+
+def test_agent_searches_the_plan_after_bracketed_reasoning():
+    plan = '<think>Options: [1] history, [2] ["maybe this"]</think>\n["first query", "second query",]\n\nSee [notes].'
+
+    def responder(payload):
+        return plan if "search queries" in payload.get("system", "") else "answer"
+
+    with FakeOllamaServer(responder=responder) as ollama, FakeTavilyServer() as tavily:
+        agent = DeepResearchAgent(
+            llm=OllamaClient(base_url=ollama.generate_url),
+            tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+        )
+        result = agent.run("topic")
+
+    assert [res["query"] for res in result["search_results"]] == ["first query", "second query"]
+    plan_span = next(span for span in result["trace"]["spans"] if span["name"] == "plan")
+    assert plan_span["stopped_early"]
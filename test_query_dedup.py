@@ -0,0 +1,147 @@
+import sqlite3
+from agent import DeepResearchAgent
+from cache import ResultCache
+from config import ResearchConfig
+from llm_client import OllamaClient
+from query_dedup import QueryIndex, dedupe_queries, query_features, similarity
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def _similarity(a, b):
+    return similarity(query_features(a), query_features(b))
+
+
+def test_similarity_ignores_word_order_stopwords_and_synonyms():
+    assert _similarity("causes of coral bleaching", "coral bleaching causes") == 1.0
+    assert _similarity("latest Python version", "What is the latest version of Python?") == 1.0
+    assert _similarity("latest Python version", "newest Python versions") >= 0.65
+    assert _similarity("python release schedule", "python release date") < 0.65
+    assert _similarity("espresso brewing ratio", "coral bleaching causes") < 0.1
+
+
+def test_queries_with_different_numbers_are_never_merged():
+    assert _similarity("Python 3.13 new features", "Python 3.12 new features") == 0.0
+    assert _similarity("GDP growth 2023", "GDP growth 2024") == 0.0
+
+
+def test_more_specific_queries_are_never_merged():
+    assert _similarity("coral reef bleaching causes Australia", "coral reef bleaching causes") == 0.0
+    assert _similarity("coral bleaching causes", "coral bleaching causes in Korea") == 0.0
+    kept, merged = dedupe_queries(
+        ["coral reef bleaching causes", "coral reef bleaching causes Australia", "causes of coral reef bleaching"],
+        threshold=0.65,
+    )
+    assert kept == ["coral reef bleaching causes", "coral reef bleaching causes Australia"]
+    assert merged == {"causes of coral reef bleaching": "coral reef bleaching causes"}
+
+
+def test_none_threshold_disables_merging(monkeypatch):
+    monkeypatch.setattr(ResearchConfig, "QUERY_DEDUP_THRESHOLD", None)
+    queries = ["Python GIL removal", "python gil removal?"]
+    assert dedupe_queries(queries) == (queries, {})
+
+
+def test_dedupe_keeps_first_query_and_reports_merges():
+    kept, merged = dedupe_queries(
+        ["latest Python version", "newest Python versions", "Python GIL removal", "python gil removal?"],
+        threshold=0.65,
+    )
+    assert kept == ["latest Python version", "Python GIL removal"]
+    assert merged == {
+        "newest Python versions": "latest Python version",
+        "python gil removal?": "Python GIL removal",
+    }
+
+    kept, merged = dedupe_queries(["removal of the Python GIL", "Python JIT"], threshold=0.65, existing=["Python GIL removal"])
+    assert kept == ["Python JIT"]
+    assert merged == {"removal of the Python GIL": "Python GIL removal"}
+
+
+def test_query_index_returns_best_match_above_threshold():
+    index = QueryIndex()
+    for query in ("coral reef bleaching", "espresso extraction", "coral reef restoration"):
+        index.add(query)
+
+    assert index.find("bleaching of coral reefs", 0.5)[0] == "coral reef bleaching"
+    assert index.find("sourdough starter", 0.5) is None
+
+
+def test_similar_cached_query_is_reused(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    with FakeTavilyServer() as server:
+        TavilyClient(api_key="tvly-test", base_url=server.search_url, cache=cache).search("causes of coral bleaching")
+        # A fresh client (e.g. the next run) finds the similar query through the cache labels
+        client = TavilyClient(api_key="tvly-test", base_url=server.search_url, cache=cache)
+        stats = {}
+        reused = client.search("coral bleaching causes", stats=stats)
+        client.search("coral bleaching causes", search_depth="basic")
+
+    assert stats["similar_hit"] == "causes of coral bleaching"
+    assert reused["query"] == "coral bleaching causes"
+    assert reused["results"]
+    # Different search parameters never reuse results
+    assert [payload["query"] for _, payload in server.requests] == ["causes of coral bleaching", "coral bleaching causes"]
+
+
+def test_similar_reuse_falls_back_to_the_next_best_cached_query(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=2)
+    with FakeTavilyServer() as server:
+        setup = TavilyClient(api_key="tvly-test", base_url=server.search_url, cache=cache)
+        setup.similar_threshold = None
+        setup.search("causes of coral bleaching")
+        setup.search("coral bleaching cause")
+        client = TavilyClient(api_key="tvly-test", base_url=server.search_url, cache=cache)
+        client.similar_threshold = 0.7
+        # Loads both labels into the client's index, then evicts the best match for the query below
+        client.search("espresso extraction time")
+        stats = {}
+        reused = client.search("coral bleaching causes", stats=stats)
+
+    assert stats["similar_hit"] == "coral bleaching cause" and reused["results"]
+    assert len(server.requests) == 3
+    # The evicted entry's label is gone from the index
+    assert [match[0] for match in client._similar.matches("coral bleaching causes", 0.7)] == ["coral bleaching cause"]
+
+
+def test_query_index_ignores_duplicates_and_forgets_removed_queries():
+    index = QueryIndex()
+    index.add("coral reef bleaching")
+    index.add("coral reef bleaching")
+    assert len(index) == 1
+
+    index.remove("coral reef bleaching")
+    assert len(index) == 0 and index.find("coral reef bleaching", 0.5) is None
+    index.add("coral reef bleaching")
+    assert index.find("coral reef bleaching", 0.5) == ("coral reef bleaching", 1.0)
+
+
+def test_old_cache_without_labels_is_migrated(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+    conn.execute("INSERT INTO entries VALUES ('old', '{}', 0, 0)")
+    conn.commit()
+    conn.close()
+
+    cache = ResultCache(path)
+    cache.set("new", {"a": 1}, label="some query")
+    assert cache.get("old") == {}
+    assert cache.labels() == ["some query"]
+
+
+def test_run_reports_saved_search_calls():
+    def responder(payload):
+        if "search queries" in payload.get("system", ""):
+            return '["latest Python version", "newest Python versions", "Python GIL removal"]'
+        return "answer"
+
+    with FakeOllamaServer(responder=responder) as ollama, FakeTavilyServer() as tavily:
+        agent = DeepResearchAgent(
+            llm=OllamaClient(base_url=ollama.generate_url),
+            tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+        )
+        result = agent.run("python news")
+
+    assert len(tavily.requests) == 2
+    assert result["dedup"] == {"merged_queries": 1, "similar_cache_hits": 0, "search_calls_saved": 1}
@@ -26,16 +26,15 @@ mock_data_md = {
     "final_answer": "**This is bold text** and should be rendered as Markdown."
 }
 
-# Generate reports
-import time
+# Generate reports outside the results directory, so nothing is added to the report index
+import tempfile
+output_dir = tempfile.mkdtemp()
 print("Generating JSON report...")
-json_report_path = generate_html_report(mock_data_json)
+json_report_path = generate_html_report(mock_data_json, filepath=os.path.join(output_dir, "json_report.html"))
 print(f"JSON Report generated at: {json_report_path}")
 
-time.sleep(2)
-
 print("Generating Markdown report...")
-md_report_path = generate_html_report(mock_data_md)
+md_report_path = generate_html_report(mock_data_md, filepath=os.path.join(output_dir, "md_report.html"))
 print(f"Markdown Report generated at: {md_report_path}")
 
 # Read the generated files to verify content
@@ -0,0 +1,173 @@
+import json
+import os
+import pytest
+from config import ReportConfig
+from report_generator import generate_html_report
+from report_index import (
+    ReportIndex, index_report, refresh_index_page, reindex_reports, search_reports, sidecar_path,
+)
+
+
+@pytest.fixture
+def results_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "results"
+    monkeypatch.setattr(ReportConfig, "RESULTS_DIR", str(directory))
+    monkeypatch.setattr(ReportConfig, "INDEX_PATH", str(directory / "report_index.sqlite3"))
+    monkeypatch.setattr(ReportConfig, "INDEX_PAGE", str(directory / "index.html"))
+    return directory
+
+
+def _data(query, answer, urls=("https://example.com/a",)):
+    return {
+        "query": query,
+        "final_answer": f"<think>\nscratch work\n</think>\n{answer}",
+        "search_results": [
+            {"query": f"{query} q1", "results": [{"title": f"{query} page", "url": url} for url in urls]},
+            {"query": f"{query} q2", "results": [{"title": f"{query} page", "url": urls[0]}]},
+        ],
+        "trace": {"total_time": 12.5, "summary": {"search": {"count": 2, "duration": 1.5}}},
+    }
+
+
+def test_report_gets_a_sidecar_and_is_searchable(results_dir):
+    path = generate_html_report(_data("Coral reefs", "Bleaching is driven by heat."), filepath=str(results_dir / "r1.html"))
+
+    sidecar = json.load(open(sidecar_path(path), encoding="utf-8"))
+    assert sidecar["query"] == "Coral reefs" and sidecar["report"] == "r1.html"
+    assert sidecar["answer"] == "Bleaching is driven by heat."
+    assert sidecar["sources"] == [
+        {"title": "Coral reefs page", "url": "https://example.com/a", "queries": ["Coral reefs q1", "Coral reefs q2"]}
+    ]
+    assert sidecar["timings"] == {"total_time": 12.5, "stages": {"search": 1.5}}
+
+    index = ReportIndex()
+    matches = index.search("bleaching HEAT")
+    assert [m["path"] for m in matches] == [os.path.abspath(path)]
+    assert "[Bleaching]" in matches[0]["snippet"]
+    # Sources are indexed too; FTS5 syntax in the search text is taken literally
+    assert len(index.search("example.com")) == 1
+    assert index.search('coral AND (" NEAR') == []
+    index.close()
+
+
+def test_index_page_is_appended_and_rewritten_only_for_replaced_reports(results_dir):
+    generate_html_report(_data("Coral reefs", "First answer."), filepath=str(results_dir / "r1.html"))
+    page = open(ReportConfig.INDEX_PAGE, encoding="utf-8").read()
+    generate_html_report(_data("Deep sea mining", "Second answer."), filepath=str(results_dir / "batch" / "r2.html"))
+    appended = open(ReportConfig.INDEX_PAGE, encoding="utf-8").read()
+
+    # The new entry is written over the closing tags, which follow it again
+    head = page[:page.rindex("    </div>")]
+    assert page.endswith("</body>\n</html>\n") and appended.endswith("</body>\n</html>\n")
+    assert appended.startswith(head) and appended.count("</html>") == 1
+    assert appended[len(head):].count('class="entry"') == 1 and 'href="batch/r2.html"' in appended
+
+    generate_html_report(_data("Coral reefs", "Revised answer."), filepath=str(results_dir / "r1.html"))
+    rewritten = open(ReportConfig.INDEX_PAGE, encoding="utf-8").read()
+    assert rewritten.count('class="entry"') == 2
+    assert "Revised answer." in rewritten and "First answer." not in rewritten
+
+    index = ReportIndex()
+    assert index.count() == 2
+    assert index.search("first") == [] and len(index.search("revised")) == 1
+    index.close()
+
+
+def test_replaced_reports_rewrite_the_page_once_when_refreshed(results_dir, monkeypatch):
+    paths = [str(results_dir / "batch" / f"r{i}.html") for i in range(3)]
+    for i, path in enumerate(paths):
+        generate_html_report(_data(f"Topic {i}", "First answer."), filepath=path)
+    assert refresh_index_page() is False
+
+    writes = []
+    write_page = ReportIndex.write_page
+    monkeypatch.setattr(ReportIndex, "write_page", lambda self: writes.append(1) or write_page(self))
+    # A batch re-run: every report is replaced, the page is rewritten once at the end
+    for i, path in enumerate(paths):
+        index_report(path, _data(f"Topic {i}", "Revised answer."), refresh_page=False)
+    assert writes == [] and "Revised answer." not in open(ReportConfig.INDEX_PAGE, encoding="utf-8").read()
+
+    assert refresh_index_page() is True and refresh_index_page() is False
+    assert writes == [1]
+    page = open(ReportConfig.INDEX_PAGE, encoding="utf-8").read()
+    assert page.count('class="entry"') == 3 and "First answer." not in page
+
+
+def test_reports_outside_the_results_dir_are_not_indexed(results_dir, tmp_path):
+    path = generate_html_report(_data("Coral reefs", "Answer."), filepath=str(tmp_path / "elsewhere" / "r.html"))
+
+    assert os.path.exists(sidecar_path(path))
+    assert not os.path.exists(ReportConfig.INDEX_PATH)
+
+
+def test_search_reports_prints_matches(results_dir, capsys):
+    search_reports("anything")
+    assert "No report index" in capsys.readouterr().out
+
+    generate_html_report(_data("Coral reefs", "Bleaching is driven by heat."), filepath=str(results_dir / "r1.html"))
+    generate_html_report(_data("Deep sea mining", "Nodules."), filepath=str(results_dir / "r2.html"))
+    matches = search_reports("heat")
+    out = capsys.readouterr().out
+
+    assert [m["query"] for m in matches] == ["Coral reefs"]
+    assert "1 matching reports of 2" in out
+
+
+LEGACY_REPORT = """<!DOCTYPE html>
+<html><head><title>Research Report: Deep sea &amp; mining</title></head>
+<body>
+    <div class="section">
+        <h2>Final Answer</h2>
+        <div class="answer">
+            <p>Polymetallic <strong>nodules</strong> hold cobalt.</p>
+        </div>
+    </div>
+    <div class="section">
+        <h2>Raw Search Results</h2>
+        <table><tbody>
+            <tr>
+                <td>
+                    <strong>Nodule survey</strong><br>
+                    <a href="https://example.com/nodules?a=1&amp;b=2" class="source-url" target="_blank">link</a>
+                </td>
+            </tr>
+        </tbody></table>
+    </div>
+</body></html>
+"""
+
+
+def test_reindex_adds_existing_reports_and_rebuilds_missing_sidecars(results_dir):
+    os.makedirs(results_dir / "batch")
+    new = generate_html_report(_data("Coral reefs", "Bleaching is driven by heat."),
+                               filepath=str(results_dir / "batch" / "r1.html"), index=False)
+    (results_dir / "old.html").write_text(LEGACY_REPORT, encoding="utf-8")
+    (results_dir / "notes.html").write_text("<html><body>not a report</body></html>", encoding="utf-8")
+    assert not os.path.exists(ReportConfig.INDEX_PATH)
+
+    assert reindex_reports() == 2
+    legacy = json.load(open(sidecar_path(str(results_dir / "old.html")), encoding="utf-8"))
+    assert legacy["query"] == "Deep sea & mining" and legacy["answer"] == "Polymetallic nodules hold cobalt."
+    assert legacy["sources"] == [{"title": "Nodule survey", "url": "https://example.com/nodules?a=1&b=2", "queries": []}]
+    assert json.load(open(sidecar_path(new), encoding="utf-8"))["sources"][0]["url"] == "https://example.com/a"
+
+    # Running it again replaces the entries instead of adding them twice
+    assert reindex_reports() == 2
+    index = ReportIndex()
+    assert index.count() == 2
+    assert len(index.search("cobalt")) == 1 and len(index.search("heat")) == 1
+    index.close()
+    page = open(ReportConfig.INDEX_PAGE, encoding="utf-8").read()
+    assert page.count('class="entry"') == 2 and page.endswith("</html>\n")
+
+
+def test_reports_on_another_drive_are_not_indexed(results_dir, tmp_path, monkeypatch):
+    def other_drive(paths):
+        raise ValueError("Paths don't have the same drive")
+
+    monkeypatch.setattr(os.path, "commonpath", other_drive)
+    os.makedirs(tmp_path / "elsewhere")
+    path = index_report(str(tmp_path / "elsewhere" / "r.html"), _data("Coral reefs", "Answer."))
+
+    assert os.path.exists(path)
+    assert not os.path.exists(ReportConfig.INDEX_PATH)
@@ -0,0 +1,43 @@
+from report_generator import SECTION_ORDER, ReportWriter, generate_html_report
+
+
+def test_sections_are_streamed_in_pipeline_order_and_displayed_by_css_order(tmp_path):
+    path = tmp_path / "report.html"
+    with ReportWriter("topic <b>", filepath=str(path)) as report:
+        report.write_plan(["q1", "q2"])
+        report.write_search_results([{"query": "q1", "results": [{"title": "A", "url": "https://a.example", "content": "one"}]}])
+        partial = path.read_text(encoding="utf-8")
+        report.write_search_results([{"query": "q2", "results": [{"title": "B", "url": "https://b.example", "content": "two"}]}])
+        report.write_answer("**Answer**")
+
+    # Sections are on disk before the run finishes
+    assert "Search Plan" in partial and "https://a.example" in partial
+
+    html = path.read_text(encoding="utf-8")
+    assert html.rstrip().endswith("</html>")
+    assert "topic &lt;b&gt;" in html
+    # Both rounds share a single results table
+    assert html.count("<h2>Raw Search Results</h2>") == 1
+    assert html.index("https://a.example") < html.index("https://b.example")
+    assert f'style="order: {SECTION_ORDER["answer"]}"' in html
+    assert html.index("Search Plan") < html.index("Final Answer")
+    assert "<strong>Answer</strong>" in html
+
+
+def test_search_results_are_escaped(tmp_path):
+    data = {
+        "query": "topic",
+        "final_answer": "answer",
+        "search_results": [{"results": [{
+            "title": "<script>alert(1)</script>",
+            "url": "javascript:alert(1)",
+            "content": "<img src=x>",
+            "raw_content": "</pre><script>",
+        }]}],
+    }
+    html = open(generate_html_report(data, filepath=str(tmp_path / "r.html")), encoding="utf-8").read()
+    assert "<script>" not in html
+    assert "&lt;img src=x&gt;" in html
+    assert 'href="#"' in html
+    # Full page text is only used for retrieval, never rendered
+    assert "<details>" not in html and "</pre>" not in html
@@ -0,0 +1,95 @@
+from config import ResearchConfig
+from context_packer import pack_context
+from report_generator import generate_html_report
+from result_dedup import ResultCollapser, canonical_url, collapse_results, hamming_distance, simhash
+from stub_servers import _synthetic_text
+
+ARTICLE = _synthetic_text("article", 3000)
+# The same article syndicated under another URL with a lead-in and a changed word
+SYNDICATED = "Reported by our partner site. " + ARTICLE.replace("data", "figures", 1)
+
+
+def test_canonical_url_ignores_presentation_differences():
+    same = [
+        "https://www.example.com/news/story/",
+        "http://example.com/news/story",
+        "https://EXAMPLE.com:443/news//story#comments",
+        "https://example.com/news/story?utm_source=feed&utm_medium=rss",
+        "https://example.com/news/story/index.html",
+    ]
+    assert {canonical_url(url) for url in same} == {"example.com/news/story"}
+    assert canonical_url("https://example.com/search?b=2&a=1&fbclid=x") == "example.com/search?a=1&b=2"
+    assert canonical_url("https://example.com:8080/a") == "example.com:8080/a"
+    assert canonical_url("https://example.com/a") != canonical_url("https://example.com/b")
+    assert canonical_url("") is None
+
+
+def test_simhash_separates_near_duplicates_from_different_text():
+    assert hamming_distance(simhash(ARTICLE), simhash(SYNDICATED)) <= ResearchConfig.NEAR_DUPLICATE_DISTANCE
+    assert hamming_distance(simhash(ARTICLE), simhash(_synthetic_text("other", 3000))) > 16
+    # Too short to fingerprint, so placeholders never collapse unrelated results
+    assert simhash("No Content") is None
+
+
+def test_collapsing_keeps_provenance():
+    results = [
+        {"query": "q1", "results": [
+            {"title": "Original", "url": "https://news.example/story", "content": "snippet", "raw_content": ARTICLE},
+            {"title": "Unrelated", "url": "https://other.example/page", "content": _synthetic_text("unrelated", 500)},
+        ]},
+        {"query": "q2", "results": [
+            {"title": "Original again", "url": "https://www.news.example/story/?utm_source=x", "content": "other snippet"},
+            {"title": "Syndicated", "url": "https://mirror.example/copy", "content": "snippet", "raw_content": SYNDICATED},
+        ]},
+    ]
+    items, stats = collapse_results(results)
+
+    assert [item["title"] for item in items] == ["Original", "Unrelated"]
+    assert stats == {"unique": 2, "url_duplicates": 1, "content_duplicates": 1}
+    assert items[0]["queries"] == ["q1", "q2"]
+    assert items[0]["duplicate_urls"] == ["https://www.news.example/story/?utm_source=x", "https://mirror.example/copy"]
+    assert items[1]["queries"] == ["q1"]
+
+
+def test_collapser_state_carries_across_rounds():
+    collapser = ResultCollapser()
+    first = collapser.add_results([{"query": "q1", "results": [{"title": "A", "url": "https://a.example"}]}])
+    second = collapser.add_results([{"query": "q2", "results": [{"title": "A", "url": "https://a.example/"}]}])
+
+    assert len(first) == 1 and second == []
+    assert first[0]["queries"] == ["q1", "q2"]
+
+
+def test_tracking_url_copies_collapse_across_hundreds_of_results():
+    results = [
+        {"query": f"q{q}", "results": [
+            {"title": f"{q}-{i}", "url": f"https://example.com/{q}/{i}", "content": _synthetic_text(f"{q}|{i}", 1500)}
+            for i in range(10)
+        ]}
+        for q in range(30)
+    ]
+    # Every page shows up a second time under a tracking URL
+    results += [
+        {"query": res["query"] + " again", "results": [dict(item, url=item["url"] + "?utm_source=x") for item in res["results"]]}
+        for res in results
+    ]
+    items, stats = collapse_results(results)
+    assert stats == {"unique": 300, "url_duplicates": 300, "content_duplicates": 0}
+
+
+def test_prompt_and_report_show_each_page_once(tmp_path):
+    results = [
+        {"query": "q1", "results": [{"title": "Original", "url": "https://news.example/story", "content": ARTICLE}]},
+        {"query": "q2", "results": [{"title": "Syndicated", "url": "https://mirror.example/copy", "content": SYNDICATED}]},
+    ]
+    context, stats = pack_context("topic", results, token_budget=100_000)
+    assert stats["duplicates"] == 1
+    assert "Syndicated" not in context
+
+    path = generate_html_report({"query": "topic", "search_results": results, "final_answer": "answer"},
+                                filepath=str(tmp_path / "report.html"))
+    html = open(path, encoding="utf-8").read()
+    assert html.count("<strong>Original</strong>") == 1
+    assert "Syndicated" not in html
+    assert "Also at: " in html and "https://mirror.example/copy" in html
+    assert "1 duplicate results collapsed" in html
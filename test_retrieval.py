@@ -0,0 +1,94 @@
+import os
+from retrieval import ChunkIndex, chunk_text, clean_text, pack_chunks
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "retrieval")
+
+
+def _page(name, title):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return {"title": title, "url": f"https://example.com/{name}", "content": f"{title} snippet", "raw_content": f.read()}
+
+
+def _fixture_results():
+    return [
+        {"query": "python 3.13 new features", "results": [_page("python_release.html", "Python 3.13 released")]},
+        {"query": "espresso brewing ratio", "results": [_page("espresso.html", "Espresso guide")]},
+        {"query": "coral bleaching causes", "results": [_page("coral_reefs.html", "Coral reef bleaching")]},
+    ]
+
+
+def test_clean_text_keeps_article_text_only():
+    with open(os.path.join(FIXTURES, "python_release.html"), "r", encoding="utf-8") as f:
+        text = clean_text(f.read())
+
+    assert "free-threaded build" in text
+    assert "PEP 594" in text
+    assert "Improved error messages & a new REPL" in text
+    for noise in ("window.tracking", "font-family", "Downloads", "newsletter", "All rights reserved", "editor's note", "<"):
+        assert noise not in text
+    assert "  " not in text
+
+
+def test_chunk_text_overlaps_and_covers_every_word():
+    words = [f"w{i}" for i in range(250)]
+    chunks = list(chunk_text(" ".join(words), chunk_words=100, overlap_words=20))
+
+    assert [len(chunk.split()) for chunk in chunks] == [100, 100, 90]
+    assert chunks[1].split()[0] == "w80"
+    assert chunks[-1].split()[-1] == "w249"
+    assert list(chunk_text("just a few words", chunk_words=100, overlap_words=20)) == ["just a few words"]
+
+
+def test_index_returns_the_relevant_page_for_each_query():
+    index = ChunkIndex(chunk_words=40, overlap_words=10)
+    for res in _fixture_results():
+        for item in res["results"]:
+            index.add_page(item)
+
+    def best_page(query):
+        chunk_id, _ = index.search(query, 1)[0]
+        return index.pages[index.chunks[chunk_id][0]]["title"]
+
+    # Words that only occur in dropped <script>/<form> blocks must not match
+    assert best_page("python interpreter lock release") == "Python 3.13 released"
+    assert best_page("espresso grind pressure") == "Espresso guide"
+    assert best_page("why do reefs bleach heatwaves") == "Coral reef bleaching"
+
+
+def test_index_caps_chunks_per_page_and_in_total():
+    page = {"title": "Long page", "url": "https://example.com/long", "raw_content": "word " * 10000}
+    index = ChunkIndex(chunk_words=100, overlap_words=0, max_page_chars=20000, max_chunks_per_page=5, max_chunks=8)
+
+    assert index.add_page(page) == 5
+    assert index.add_page(dict(page, url="https://example.com/long2")) == 3
+    assert index.add_page(dict(page, url="https://example.com/long3")) == 0
+    assert index.truncated_pages == 3
+
+
+def test_pack_chunks_covers_sub_queries_within_budget():
+    context, stats = pack_chunks("recent science and technology news", _fixture_results(), token_budget=700)
+
+    assert stats["indexed_pages"] == 3
+    # Each sub-query contributes its best chunk, grouped under numbered sources
+    assert stats["packed"] == 3
+    assert "Source 3:" in context and "Source 4:" not in context
+    assert "Excerpts:" in context
+    assert "free-threaded" in context and "nine bars" in context and "heat stress" in context
+    assert "<p>" not in context
+
+    context, stats = pack_chunks("recent science and technology news", _fixture_results(), token_budget=400)
+    assert stats["used_tokens"] <= 400
+    assert stats["dropped"] == 1
+    assert "Source 3:" not in context
+
+
+def test_pack_chunks_falls_back_to_snippets_and_skips_duplicate_urls():
+    results = [
+        {"query": "q1", "results": [{"title": "A", "url": "https://a.example/", "content": "alpha snippet"}]},
+        {"query": "q2", "results": [{"title": "A again", "url": "https://a.example", "content": "alpha snippet"}]},
+    ]
+    context, stats = pack_chunks("alpha", results, token_budget=1000)
+
+    assert stats["duplicates"] == 1
+    assert stats["indexed_chunks"] == 1
+    assert "alpha snippet" in context
@@ -0,0 +1,110 @@
+import sqlite3
+import time
+from cache import ResultCache
+from config import RetrievalConfig
+from stub_servers import FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def _client(server, cache):
+    return TavilyClient(api_key="tvly-test", base_url=server.search_url, cache=cache)
+
+
+def test_warm_cache_skips_network(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    with FakeTavilyServer() as server:
+        client = _client(server, cache)
+        first = client.search("Latest Python version")
+        second = client.search("  latest   python VERSION? ")
+
+    assert second == first
+    assert len(server.requests) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_key_includes_search_parameters(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    with FakeTavilyServer() as server:
+        client = _client(server, cache)
+        client.search("python", search_depth="basic")
+        client.search("python", search_depth="advanced")
+        client.search("python", search_depth="basic", include_domains=["python.org"])
+
+    assert len(server.requests) == 3
+
+
+def test_errors_are_not_cached(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    with FakeTavilyServer(failures={"broken": 400}) as server:
+        client = _client(server, cache)
+        client.search("broken")
+        client.search("broken")
+
+    assert len(server.requests) == 2
+
+
+def test_ttl_expiry_and_refresh(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResultCache(path, ttl=0.1)
+    cache.set("k", {"v": 1})
+    assert cache.get("k") == {"v": 1}
+    time.sleep(0.2)
+    assert cache.get("k") is None
+
+    cache.set("k", {"v": 2})
+    refreshing = ResultCache(path, ttl=60, refresh=True)
+    assert refreshing.get("k") is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), max_bytes=250)
+    cache.set("a", "x" * 98)  # 100 bytes as JSON
+    cache.set("b", "x" * 98)
+    cache.get("a")
+    cache.set("c", "x" * 98)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["bytes"] == 200 and cache.stats()["evictions"] == 1
+
+
+def test_caches_without_sizes_are_migrated(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL,"
+        " accessed_at REAL NOT NULL, label TEXT)"
+    )
+    conn.execute("INSERT INTO entries VALUES ('a', '\"héllo\"', 1, 1, NULL)")
+    conn.commit()
+    conn.close()
+
+    cache = ResultCache(path, max_bytes=100)
+    assert cache.stats()["bytes"] == 8
+    assert cache.get("a") == "héllo"
+
+
+def test_cached_page_text_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(RetrievalConfig, "MAX_PAGE_CHARS", 100)
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    with FakeTavilyServer(raw_content_size=500) as server:
+        client = _client(server, cache)
+        first = client.search("python")
+        second = client.search("python")
+
+    assert {len(item["raw_content"]) for item in first["results"]} == {500}
+    assert {len(item["raw_content"]) for item in second["results"]} == {100}
@@ -0,0 +1,109 @@
+import json
+import time
+from agent import DeepResearchAgent
+from config import AdaptiveSearchConfig, TavilyConfig
+from llm_client import OllamaClient
+from search_policy import AdaptiveSearchPolicy, term_coverage
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+STRONG = {"results": [
+    {"title": "Coral reef bleaching", "content": "Why coral reefs bleach.", "url": "https://a.example", "score": 0.9},
+    {"title": "Bleaching events", "content": "Coral bleaching in 2024.", "url": "https://b.example", "score": 0.8},
+    {"title": "Reef health", "content": "Reef monitoring.", "url": "https://c.example", "score": 0.7},
+]}
+WEAK = {"results": [
+    {"title": "Ocean facts", "content": "Unrelated trivia.", "url": "https://d.example", "score": 0.2},
+]}
+
+
+def test_weak_results_are_escalated_and_strong_ones_are_not():
+    policy = AdaptiveSearchPolicy(credit_budget=10)
+    policy.basic_kwargs()
+    strong = policy.assess("coral reef bleaching", STRONG)
+    weak = policy.assess("ocean acidification chemistry", WEAK)
+
+    assert not strong["escalated"] and strong["reasons"] == [] and strong["coverage"] == 1.0
+    assert weak["escalated"] and weak["reasons"] == ["low score", "few results", "low coverage"]
+    assert policy.credits_used == 1 + 1 + 2
+
+
+def test_escalations_stop_at_the_budgets():
+    policy = AdaptiveSearchPolicy(credit_budget=5)
+    policy.basic_kwargs()
+    decisions = [policy.assess(f"query {i}", WEAK) for i in range(3)]
+    assert [d["escalated"] for d in decisions] == [True, False, False]
+    assert [d["skipped"] for d in decisions] == [None, "credit budget", "credit budget"]
+    assert policy.credits_used == 5
+
+    policy = AdaptiveSearchPolicy(latency_budget=0.01)
+    policy.basic_kwargs()
+    time.sleep(0.02)
+    assert policy.assess("query", WEAK)["skipped"] == "latency budget"
+
+
+def test_cached_and_failed_searches_cost_no_credits():
+    policy = AdaptiveSearchPolicy()
+    policy.basic_kwargs()
+    decision = policy.assess("query", WEAK, stats={"cache_hit": True})
+    assert decision["escalated"] and policy.credits_used == 2
+
+    kept = policy.settle(decision, WEAK, {"results": [], "error": "timeout"})
+    assert kept is WEAK and decision["advanced"]["error"] == "timeout"
+    assert policy.credits_used == 0 and decision["credits"] == 0
+
+
+def test_failed_searches_are_not_escalated():
+    policy = AdaptiveSearchPolicy()
+    policy.basic_kwargs()
+    decision = policy.assess("query", {"results": [], "error": "503 Service Unavailable"})
+    assert decision["reasons"] == ["error"] and not decision["escalated"] and decision["skipped"] is None
+    assert policy.credits_used == 0
+
+
+def test_term_coverage_ignores_stopwords():
+    assert term_coverage("the causes of coral bleaching", STRONG["results"]) == 2 / 3
+    assert term_coverage("", []) == 1.0
+
+
+def test_agent_escalates_only_weak_queries_and_records_decisions():
+    queries = ["coral reef bleaching", "ocean acidification chemistry"]
+    responder = lambda payload: json.dumps(queries) if "search queries" in payload.get("system", "") else "answer"
+    with FakeOllamaServer(responder=responder) as ollama, \
+            FakeTavilyServer(responses={"ocean acidification chemistry": WEAK}) as tavily:
+        agent = DeepResearchAgent(
+            llm=OllamaClient(base_url=ollama.generate_url),
+            tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+            adaptive_search=True,
+        )
+        result = agent.run("coral reefs", search_depth="advanced")
+
+    searches = sorted((p["query"], p["search_depth"], p["max_results"]) for _, p in tavily.requests)
+    assert searches == [
+        ("coral reef bleaching", "basic", AdaptiveSearchConfig.BASIC_MAX_RESULTS),
+        ("ocean acidification chemistry", "advanced", AdaptiveSearchConfig.ADVANCED_MAX_RESULTS),
+        ("ocean acidification chemistry", "basic", AdaptiveSearchConfig.BASIC_MAX_RESULTS),
+    ]
+    policy = result["search_policy"]
+    assert policy["searched"] == 2 and policy["escalated"] == 1 and policy["credits_used"] == 4
+    decisions = {d["query"]: d for d in policy["decisions"]}
+    assert decisions["ocean acidification chemistry"]["advanced"]["num_results"] == 1
+    spans = [span for span in result["trace"]["spans"] if span["name"] == "search"]
+    assert sorted(span["depth"] for span in spans) == ["advanced", "basic", "basic"]
+    assert sum(1 for span in spans if "decision" in span) == 2
+
+
+def test_abandoned_searches_are_not_escalated(monkeypatch):
+    monkeypatch.setattr(TavilyConfig, "SEARCH_TIMEOUT", 0.5)
+    policy = AdaptiveSearchPolicy()
+    with FakeTavilyServer(trickles={"slow": 1.2}) as tavily:
+        agent = DeepResearchAgent(tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url))
+        results = agent._execute_searches(["slow", "quick"], policy=policy)
+        credits = policy.credits_used
+        # Long enough for the basic search to finish in the background
+        time.sleep(1.2)
+
+    assert results[0]["error"] == "Search timed out after 0.5s"
+    assert policy.credits_used == credits
+    assert [p["search_depth"] for _, p in tavily.requests if p["query"] == "slow"] == ["basic"]
+    assert "slow" not in [d["query"] for d in policy.decisions]
@@ -0,0 +1,117 @@
+import time
+from agent import DeepResearchAgent
+from batch_runner import BatchRunner
+from llm_client import OllamaClient
+from session_store import SessionStore
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def _agent(ollama, tavily):
+    return DeepResearchAgent(
+        llm=OllamaClient(base_url=ollama.generate_url),
+        tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+    )
+
+
+def _planning_calls(ollama):
+    return sum(1 for _, payload in ollama.requests if "search queries" in payload.get("system", ""))
+
+
+def test_runs_are_stored_and_read_back(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    with FakeOllamaServer() as ollama, FakeTavilyServer() as tavily:
+        result = _agent(ollama, tavily).run("Coral reefs")
+    session_id = store.save(result, model="stub-model", report="report.html")
+
+    session = store.latest("coral reefs?")
+    assert session["id"] == session_id
+    assert session["plan"] == ["stub query 1", "stub query 2"]
+    assert session["answer"] == result["final_answer"]
+    assert session["model"] == "stub-model" and session["duration"] > 0
+    assert [search["result"] for search in session["searches"]] == result["search_results"]
+    assert {span["name"] for span in session["trace"]["spans"]} >= {"plan", "search", "synthesize"}
+    assert store.list_sessions() == [{
+        "id": session_id, "topic": "Coral reefs", "created_at": session["created_at"],
+        "duration": session["duration"], "parent_id": None, "num_searches": 2,
+    }]
+    assert store.latest("another topic") is None
+
+
+def test_full_page_text_is_not_stored(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    with FakeOllamaServer() as ollama, FakeTavilyServer(raw_content_size=2000) as tavily:
+        result = _agent(ollama, tavily).run("Coral reefs")
+    session = store.get(store.save(result))
+
+    assert all(item.get("raw_content") for search in result["search_results"] for item in search["results"])
+    stored = [item for search in session["searches"] for item in search["result"]["results"]]
+    assert stored and not any("raw_content" in item for item in stored)
+
+
+def test_refresh_searches_only_stale_and_failed_queries(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    with FakeOllamaServer() as ollama, FakeTavilyServer(failures={"stub query 2": 500}) as tavily:
+        result = _agent(ollama, tavily).run("topic")
+        assert "error" in result["search_results"][1]
+        old = time.time() - 7200
+        store.save(dict(result, fetched_at=[old, time.time()]))
+
+        session = store.latest("topic")
+        tavily.failures = {}
+        searches_before = len(tavily.requests)
+        planning_before = _planning_calls(ollama)
+        # The first search is stale and the second one failed
+        refreshed = _agent(ollama, tavily).refresh(session, max_age=3600)
+        session_two = store.get(store.save(refreshed, parent_id=session["id"]))
+        partial = _agent(ollama, tavily).refresh(session_two, max_age=24 * 3600)
+
+    assert refreshed["refreshed"] == {"searched": 2, "reused": 0}
+    assert partial["refreshed"] == {"searched": 0, "reused": 2}
+    assert sorted(payload["query"] for _, payload in tavily.requests[searches_before:]) == ["stub query 1", "stub query 2"]
+    assert _planning_calls(ollama) == planning_before
+    assert "synthesized answer" in partial["final_answer"]
+    assert all("error" not in search for search in refreshed["search_results"])
+    assert session_two["parent_id"] == session["id"]
+    assert all(search["fetched_at"] > old for search in session_two["searches"])
+
+
+def test_refresh_keeps_fresh_results_and_their_fetch_time(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    with FakeOllamaServer() as ollama, FakeTavilyServer() as tavily:
+        result = _agent(ollama, tavily).run("topic")
+        stale, fresh = time.time() - 7200, time.time() - 60
+        session = store.get(store.save(dict(result, fetched_at=[stale, fresh])))
+        searches_before = len(tavily.requests)
+        refreshed = _agent(ollama, tavily).refresh(session, max_age=3600)
+
+    assert refreshed["refreshed"] == {"searched": 1, "reused": 1}
+    assert [payload["query"] for _, payload in tavily.requests[searches_before:]] == ["stub query 1"]
+    assert refreshed["search_results"][1] == result["search_results"][1]
+    assert refreshed["fetched_at"][1] == fresh and refreshed["fetched_at"][0] > stale
+
+
+def test_batch_refresh_rewrites_reports_without_planning(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    topics = ["topic one", "topic two"]
+    with FakeOllamaServer() as ollama, FakeTavilyServer() as tavily:
+        def runner(**kwargs):
+            return BatchRunner(
+                output_dir=str(tmp_path / "batch"),
+                llm=OllamaClient(base_url=ollama.generate_url),
+                tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+                sessions=store,
+                **kwargs
+            )
+
+        runner().run(topics)
+        planning_before = _planning_calls(ollama)
+        searches_before = len(tavily.requests)
+        summary = runner(refresh=True, pipeline=True).run(topics + ["topic three"])
+
+    assert summary["completed"] == 3 and summary["skipped"] == 0
+    # Only the new topic was planned; the stored searches are fresh enough to reuse
+    assert _planning_calls(ollama) == planning_before + 1
+    assert len(tavily.requests) == searches_before + 2
+    assert len(store.list_sessions()) == 5
+    assert all(entry["parent_id"] for entry in store.list_sessions()[:3] if entry["topic"] != "topic three")
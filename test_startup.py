@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+from bench_startup import ROOT, measure, parse_importtime
+
+
+def test_parse_importtime_keeps_top_level_modules():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _io\n"
+        "import time:       300 |       1500 | agent\n"
+        "import time:       900 |       1200 |   requests\n"
+    )
+    assert parse_importtime(stderr) == {"agent": 1500}
+
+
+def test_help_does_not_load_the_agent():
+    result = measure(["main.py", "--help"], runs=1)
+    assert result["heavy"] == []
+    # Importing the agent for --help took ~190 ms; leave room for slow machines
+    assert result["import_ms"] < 100
+
+
+def test_help_works_without_an_api_key():
+    env = {key: value for key, value in os.environ.items() if key != "TAVILY_API_KEY"}
+    completed = subprocess.run(
+        [sys.executable, "main.py", "--help"], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert completed.returncode == 0
+    assert "--batch" in completed.stdout
@@ -0,0 +1,57 @@
+import time
+from agent import DeepResearchAgent
+from llm_client import OllamaClient
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+
+
+def test_generate_stream_yields_tokens_progressively():
+    with FakeOllamaServer(
+        responder=lambda payload: "one two three four",
+        first_token_delay=0.2,
+        token_delay=0.1,
+    ) as server:
+        client = OllamaClient(base_url=server.generate_url)
+        stats = {}
+        arrivals = []
+        tokens = []
+        for token in client.generate_stream("hi", stats=stats):
+            arrivals.append(time.perf_counter())
+            tokens.append(token)
+
+    assert "".join(tokens) == "one two three four"
+    assert len(tokens) == 4
+    assert arrivals[-1] - arrivals[0] >= 0.25
+    assert 0.15 <= stats["time_to_first_token"] < stats["total_time"]
+
+
+def test_plan_research_stops_after_json_list():
+    plan = '<think>Maybe [a] or [b]?</think>\n["query a", "query b"]'
+    trailing = " filler" * 200
+    with FakeOllamaServer(responder=lambda payload: plan + trailing, token_delay=0.01) as server:
+        agent = DeepResearchAgent(llm=OllamaClient(base_url=server.generate_url), tavily=object())
+        stats = {}
+        start = time.perf_counter()
+        queries = agent._plan_research("topic", stats=stats)
+        elapsed = time.perf_counter() - start
+
+    assert queries == ["query a", "query b"]
+    assert stats["stopped_early"]
+    # Reading the whole response would take over 2 seconds
+    assert elapsed < 1.0
+
+
+def test_run_streams_final_answer():
+    with FakeOllamaServer() as ollama, FakeTavilyServer() as tavily:
+        agent = DeepResearchAgent(
+            llm=OllamaClient(base_url=ollama.generate_url),
+            tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+        )
+        streamed = []
+        result = agent.run("topic", on_token=streamed.append)
+
+    assert len(streamed) > 1
+    assert "".join(streamed) == result["final_answer"]
+    assert "synthesized answer" in result["final_answer"]
+    synthesis = [span for span in result["trace"]["spans"] if span["name"] == "synthesize"]
+    assert "time_to_first_token" in synthesis[0]
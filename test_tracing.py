@@ -0,0 +1,64 @@
+import json
+from agent import DeepResearchAgent
+from llm_client import OllamaClient
+from report_generator import generate_html_report
+from stub_servers import FakeOllamaServer, FakeTavilyServer
+from tavily_client import TavilyClient
+from tracing import Tracer, aggregate_traces, percentile
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) is None
+    assert percentile([5], 95) == 5
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile(list(range(101)), 95) == 95
+
+
+def test_run_records_stage_spans_and_ollama_counters(tmp_path):
+    with FakeOllamaServer(token_delay=0.001) as ollama, FakeTavilyServer() as tavily:
+        agent = DeepResearchAgent(
+            llm=OllamaClient(base_url=ollama.generate_url),
+            tavily=TavilyClient(api_key="tvly-test", base_url=tavily.search_url),
+        )
+        tracer = Tracer(name="topic")
+        result = agent.run("topic", tracer=tracer)
+        with tracer.span("report"):
+            report_path = generate_html_report(result, filepath=str(tmp_path / "report.html"))
+
+    spans = {}
+    for span in tracer.to_dict()["spans"]:
+        spans.setdefault(span["name"], []).append(span)
+
+    assert set(spans) == {"plan", "dedup", "search_stage", "search", "synthesize", "report"}
+    assert len(spans["search"]) == 2
+    assert all(span["bytes_sent"] > 0 and span["bytes_received"] > 0 for span in spans["search"])
+    # Planning stops reading before Ollama's final counters arrive
+    assert spans["plan"][0]["stopped_early"]
+    synthesize = spans["synthesize"][0]
+    assert synthesize["eval_count"] > 0
+    assert synthesize["prompt_eval_count"] > 0
+    assert "eval_duration" in synthesize and "load_duration" in synthesize
+
+    trace_path = tracer.write(str(tmp_path / "report.trace.json"))
+    with open(trace_path) as f:
+        assert json.load(f)["summary"]["search"]["count"] == 2
+
+    with open(report_path) as f:
+        assert "Timing Breakdown" in f.read()
+
+
+def test_aggregate_traces_over_batch():
+    traces = []
+    for duration in (1.0, 2.0, 3.0, 4.0):
+        tracer = Tracer()
+        with tracer.span("synthesize") as span:
+            span["eval_count"] = int(duration * 100)
+        trace = tracer.to_dict()
+        trace["spans"][0]["duration"] = duration
+        traces.append(trace)
+
+    aggregated = aggregate_traces(traces)
+    assert aggregated["synthesize"]["duration"]["count"] == 4
+    assert aggregated["synthesize"]["duration"]["p50"] == 2.5
+    assert aggregated["synthesize"]["eval_count"]["max"] == 400
+    assert aggregated["run"]["duration"]["count"] == 4
@@ -0,0 +1,144 @@
+import contextlib
+import datetime
+import json
+import math
+import os
+import threading
+import time
+
+# Span fields aggregated across runs by aggregate_traces()
+METRIC_FIELDS = (
+    "duration",
+    "time_to_first_token",
+    "bytes_sent",
+    "bytes_received",
+    "prompt_eval_count",
+    "eval_count",
+    "eval_duration",
+    "load_duration",
+)
+
+class Tracer:
+    """
+    Collects timing spans for one research run.
+
+    A span is a plain dict with a 'name', a 'start' offset and a 'duration' in
+    seconds. Code running inside a span can add its own fields (token counts,
+    bytes transferred, ...) by updating the dict. Spans may be recorded from
+    several threads at once.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.started_at = datetime.datetime.now().isoformat(timespec="seconds")
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """
+        Times the enclosed block and records it as a span.
+
+        Yields:
+            dict: The span, which the block may annotate with extra fields.
+        """
+        start = time.perf_counter()
+        span = {"name": name, "start": round(start - self._origin, 6)}
+        span.update(attributes)
+        try:
+            yield span
+        finally:
+            span["duration"] = round(time.perf_counter() - start, 6)
+            with self._lock:
+                self.spans.append(span)
+
+    def summary(self):
+        """
+        Totals per span name: count, total duration, tokens and bytes.
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            entry = totals.setdefault(span["name"], {"count": 0})
+            entry["count"] += 1
+            for field in METRIC_FIELDS:
+                if field == "time_to_first_token":
+                    continue
+                value = span.get(field)
+                if isinstance(value, (int, float)):
+                    entry[field] = round(entry.get(field, 0) + value, 6)
+        return totals
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_time": round(time.perf_counter() - self._origin, 6),
+            "spans": spans,
+            "summary": self.summary(),
+        }
+
+    def write(self, path):
+        """
+        Writes the trace as JSON and returns the path.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+def percentile(values, pct):
+    """
+    Returns the pct-th percentile of values using linear interpolation.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def aggregate_traces(traces):
+    """
+    Aggregates span metrics over many run traces (e.g. a batch).
+
+    Args:
+        traces (list): Trace dicts as returned by Tracer.to_dict().
+
+    Returns:
+        dict: span name -> metric -> {'count', 'mean', 'p50', 'p95', 'p99', 'max'}.
+            A 'run' entry aggregates the total time of each trace.
+    """
+    samples = {"run": {"duration": [t["total_time"] for t in traces if "total_time" in t]}}
+    for trace in traces:
+        for span in trace.get("spans", []):
+            metrics = samples.setdefault(span["name"], {})
+            for field in METRIC_FIELDS:
+                value = span.get(field)
+                if isinstance(value, (int, float)):
+                    metrics.setdefault(field, []).append(value)
+
+    aggregated = {}
+    for name, metrics in samples.items():
+        aggregated[name] = {}
+        for field, values in metrics.items():
+            if not values:
+                continue
+            aggregated[name][field] = {
+                "count": len(values),
+                "mean": round(sum(values) / len(values), 6),
+                "p50": round(percentile(values, 50), 6),
+                "p95": round(percentile(values, 95), 6),
+                "p99": round(percentile(values, 99), 6),
+                "max": round(max(values), 6),
+            }
+    return aggregated